@@ -1,13 +1,25 @@
+import atexit
+import time
+from pathlib import Path
+
 from flask import Flask, g
 from flask_cors import CORS
 
 from lib.db import Db
+from lib.json_provider import FastJSONProvider
+from lib.metrics import Metrics
+from lib.response_cache import DataVersion, ResponseCache
+from lib.sampling import SampleTables
+from lib.slow_log import SlowQueryLog
+from lib.write_queue import WriteBehindQueue
 
 import routes.words
 import routes.groups
 import routes.study_sessions
 import routes.dashboard
 import routes.study_activities
+import routes.export
+import routes.metrics
 
 def get_allowed_origins(app):
     try:
@@ -29,22 +41,76 @@ def get_allowed_origins(app):
         return ["*"]  # Fallback to allow all origins if there's an error
 
 def create_app(test_config=None):
+    start = time.perf_counter()
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
     
-    if test_config is None:
-        app.config.from_mapping(
-            DATABASE='words.db'
-        )
-    else:
+    app.config.from_mapping(
+        DATABASE='words.db',
+        DATABASE_TEMPLATE='words.template.db',  # Seeded database a new one is copied from (invoke build-template)
+        DB_POOL_SIZE=5,  # Long-lived connections kept warm per process
+        DB_POOL_TIMEOUT=10.0,  # Seconds to wait for a free connection
+        DB_HEALTH_CHECK_INTERVAL=30.0,  # Idle seconds before a connection is re-checked
+        DB_PROFILE='balanced',  # Storage profile from lib/profiles.py
+        WRITE_BEHIND=False,  # Send writes to a single group-committing writer thread
+        WRITE_BEHIND_MAX_DELAY_MS=5,  # Longest a write waits for others to share its commit
+        WRITE_BEHIND_MAX_BATCH=256,  # Writes per commit
+        WRITE_BEHIND_MAX_PENDING=1000,  # Queued writes before requests are refused with 503
+        WRITE_BEHIND_ACK_TIMEOUT=10.0,  # Seconds a request waits for its write to commit
+        RESPONSE_CACHE_MAX_BYTES=16 * 1024 * 1024,  # Cached GET response bodies per process; 0 disables the cache
+        METRICS=True,  # Time requests and their SQL; served at /metrics and in Server-Timing headers
+        SLOW_QUERY_MS=None,  # Log statements slower than this many milliseconds (needs METRICS)
+        SLOW_QUERY_LOG='slow_queries.jsonl',
+        SLOW_QUERY_LOG_MAX_BYTES=10 * 1024 * 1024,  # Size at which the log rotates
+        SLOW_QUERY_LOG_BACKUPS=5,  # Rotated logs kept
+        SAMPLE_TABLES_MAX_GROUPS=256,  # Groups whose sampling tables are kept per process
+        ASGI_MAX_WORKERS=None,  # Threads running routes under asgi.py; defaults to DB_POOL_SIZE
+        ASGI_MAX_PENDING=1000,  # Requests waiting for a thread before new ones get a 503
+        ASGI_MAX_BODY_BYTES=64 * 1024 * 1024,  # Largest request body accepted under asgi.py
+        CHANGE_POLL_INTERVAL_MS=50  # How often /changes checks for commits while clients wait
+    )
+    if test_config is not None:
         app.config.update(test_config)
     
-    # Create database connection
-    app.db = Db(database=app.config['DATABASE'])
+    # Create the database connection pool
+    app.db = Db(
+        database=app.config['DATABASE'],
+        pool_size=app.config['DB_POOL_SIZE'],
+        pool_timeout=app.config['DB_POOL_TIMEOUT'],
+        health_check_interval=app.config['DB_HEALTH_CHECK_INTERVAL'],
+        profile=app.config['DB_PROFILE']
+    )
+    atexit.register(app.db.shutdown)
+
+    # Optional write-behind mode: one writer per process instead of every
+    # request thread competing for SQLite's write lock
+    if app.config['WRITE_BEHIND']:
+        app.write_queue = WriteBehindQueue(
+            app.config['DATABASE'],
+            max_delay_ms=app.config['WRITE_BEHIND_MAX_DELAY_MS'],
+            max_batch=app.config['WRITE_BEHIND_MAX_BATCH'],
+            max_pending=app.config['WRITE_BEHIND_MAX_PENDING'],
+            ack_timeout=app.config['WRITE_BEHIND_ACK_TIMEOUT'],
+            on_connect=app.db.configure
+        )
+        atexit.register(app.write_queue.close)
     
-    # Check db existence
+    # Check db existence; a new database starts as a copy of the template
+    # when one was built, instead of running the setup SQL and seed imports
+    bootstrap = 'existing'
     if not app.db.exists():
-        print("Database does not exist, initializing...")
-        app.db.init(app)
+        template = app.config['DATABASE_TEMPLATE']
+        if template and Path(template).exists():
+            app.db.copy_template(template)
+            bootstrap = 'template'
+        else:
+            print("Database does not exist, initializing...")
+            app.db.init(app)
+            bootstrap = 'initialized'
+
+    # Apply any migrations that are still pending
+    for migration in app.db.migrate():
+        print(f"Applied migration {migration.filename}")
         
     # Get allowed origins from study_activities table
     allowed_origins = get_allowed_origins(app)
@@ -62,7 +128,35 @@ def create_app(test_config=None):
         }
     })
 
-    # Close database connection
+    # Registered before the response cache so cache hits are timed too
+    if app.config['METRICS']:
+        Metrics().init_app(app)
+        app.metrics.add_source('db_pool', app.db.pool.stats)
+        app.metrics.add_source('app', lambda: {'startup_seconds': app.startup_seconds})
+        if app.config['WRITE_BEHIND']:
+            app.metrics.add_source('write_queue', app.write_queue.stats)
+        if app.config['SLOW_QUERY_MS'] is not None:
+            app.metrics.slow_log = SlowQueryLog(
+                app.config['SLOW_QUERY_LOG'],
+                threshold_ms=app.config['SLOW_QUERY_MS'],
+                max_bytes=app.config['SLOW_QUERY_LOG_MAX_BYTES'],
+                backup_count=app.config['SLOW_QUERY_LOG_BACKUPS']
+            )
+
+    # Alias tables of GET /groups/<id>/sample, rebuilt when a group's reviews change
+    app.sample_tables = SampleTables(max_groups=app.config['SAMPLE_TABLES_MAX_GROUPS'])
+    if app.config['METRICS']:
+        app.metrics.add_source('sample_tables', app.sample_tables.stats)
+
+    # Serve repeated GETs from memory (with ETags) until the next commit
+    if app.config['RESPONSE_CACHE_MAX_BYTES']:
+        data_version = DataVersion(app.config['DATABASE'], on_connect=app.db.configure)
+        atexit.register(data_version.close)
+        ResponseCache(data_version, max_bytes=app.config['RESPONSE_CACHE_MAX_BYTES']).init_app(app)
+        if app.config['METRICS']:
+            app.metrics.add_source('response_cache', app.response_cache.stats)
+
+    # Return the request's connection to the pool
     @app.teardown_appcontext
     def close_db(exception):
         app.db.close()
@@ -73,8 +167,12 @@ def create_app(test_config=None):
     routes.study_sessions.load(app)
     routes.dashboard.load(app)
     routes.study_activities.load(app)
-    
-    
+    routes.export.load(app)
+    if app.config['METRICS']:
+        routes.metrics.load(app)
+
+    app.startup_seconds = time.perf_counter() - start
+    print(f"Started in {app.startup_seconds * 1000:.0f} ms (database: {bootstrap})")
     return app
 
 app = create_app()
@@ -0,0 +1,35 @@
+import atexit
+
+from app import app as flask_app, get_allowed_origins
+from lib.asgi import AsgiAdapter, ChangeFeed
+from lib.response_cache import DataVersion
+
+# Async serving mode: the same routes as app.py on an ASGI server, e.g.
+#
+#   uvicorn asgi:app --port 5000
+#
+# Routes run on a bounded thread pool (one thread per pooled connection by
+# default) while the event loop holds the connections, so many slow clients,
+# such as the long-polling and SSE /changes endpoints, share one process.
+
+def create_asgi_app(app):
+    # The response cache already keeps a probe connection for the data version
+    if hasattr(app, 'response_cache'):
+        data_version = app.response_cache.data_version
+    else:
+        data_version = DataVersion(app.config['DATABASE'], on_connect=app.db.configure)
+        atexit.register(data_version.close)
+
+    adapter = AsgiAdapter(
+        app,
+        max_workers=app.config['ASGI_MAX_WORKERS'] or app.config['DB_POOL_SIZE'],
+        max_pending=app.config['ASGI_MAX_PENDING'],
+        max_body_bytes=app.config['ASGI_MAX_BODY_BYTES'],
+        feed=ChangeFeed(data_version, poll_interval=app.config['CHANGE_POLL_INTERVAL_MS'] / 1000),
+        allowed_origins=get_allowed_origins(app)
+    )
+    if app.config['METRICS']:
+        app.metrics.add_source('asgi', adapter.stats)
+    return adapter
+
+app = create_asgi_app(flask_app)
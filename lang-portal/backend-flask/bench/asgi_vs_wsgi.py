@@ -0,0 +1,205 @@
+"""Compare the WSGI app with the ASGI mode (asgi.py) while slow clients download.
+
+Run from lang-portal/backend-flask:
+
+    python -m bench.asgi_vs_wsgi --threads 5 --clients 16 --slow-clients 20 --seconds 10
+
+Both modes serve the same Flask routes in-process with `--threads` server
+threads, the way a threaded WSGI server (gunicorn --threads) and the ASGI
+adapter's bounded pool would. For `--seconds`, `--clients` clients replay the
+bench.load route mix back to back while `--slow-clients` more download
+GET /export/<--slow-export>.ndjson over and over, taking `--slow-chunk-seconds`
+to receive each chunk of it, as a client on a slow connection would:
+
+- WSGI: the server thread writes each chunk and blocks until the client has
+  read it, so it is held for the whole download.
+- ASGI: the loop sends each chunk and only takes a thread to produce the next.
+
+Latency is measured from sending a request to receiving the whole response,
+including time spent waiting for a free thread. Both modes run the same
+endpoints; nothing is simulated but the speed of the slow clients' network.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.load import create_load_app, database_sizes, git_commit, percentile, plan_requests
+from bench.synthetic import build_database
+from lib.asgi import AsgiAdapter, request
+
+def summarize(latencies, elapsed, slow_served):
+  samples = [seconds * 1000 for seconds in latencies]
+  return {
+    'requests': len(samples),
+    'seconds': round(elapsed, 2),
+    'requests_per_second': round(len(samples) / elapsed, 1),
+    'p50_ms': round(percentile(samples, 0.50), 3),
+    'p95_ms': round(percentile(samples, 0.95), 3),
+    'p99_ms': round(percentile(samples, 0.99), 3),
+    'slow_requests_served': slow_served
+  }
+
+def replay(requests):
+  while True:
+    yield from requests
+
+def run_wsgi(app, plan, seconds, threads, clients, slow_clients, slow_path, chunk_seconds):
+  server = ThreadPoolExecutor(max_workers=threads)
+  local = threading.local()
+
+  def handle(method, path, body, chunk_delay=0.0):
+    if not hasattr(local, 'client'):
+      local.client = app.test_client()
+    response = local.client.open(path, method=method, json=body, buffered=False)
+    try:
+      for _ in response.response:
+        # Writing to a slow client blocks the server thread
+        time.sleep(chunk_delay)
+    finally:
+      response.close()
+    return response.status_code
+
+  done = threading.Event()
+  slow_served = [0]
+
+  def slow_client():
+    while not done.is_set():
+      server.submit(handle, 'GET', slow_path, None, chunk_seconds).result()
+      slow_served[0] += 1
+
+  latencies = []
+
+  def client(requests):
+    for _, method, path, body in replay(requests):
+      start = time.perf_counter()
+      if start >= deadline:
+        return
+      server.submit(handle, method, path, body).result()
+      latencies.append(time.perf_counter() - start)
+
+  slow = [threading.Thread(target=slow_client) for _ in range(slow_clients)]
+  for thread in slow:
+    thread.start()
+  time.sleep(0.1)  # Let the slow clients take their threads first
+  start = time.perf_counter()
+  deadline = start + seconds
+  fast = [threading.Thread(target=client, args=(plan[i::clients],)) for i in range(clients)]
+  for thread in fast:
+    thread.start()
+  for thread in fast:
+    thread.join()
+  elapsed = time.perf_counter() - start
+  done.set()
+  for thread in slow:
+    thread.join()
+  server.shutdown()
+  return summarize(latencies, elapsed, slow_served[0])
+
+def run_asgi(app, plan, seconds, threads, clients, slow_clients, slow_path, chunk_seconds):
+  adapter = AsgiAdapter(app, max_workers=threads)
+
+  async def main():
+    done = asyncio.Event()
+    slow_served = [0]
+    latencies = []
+
+    async def slow_client():
+      while not done.is_set():
+        await request(adapter, 'GET', slow_path, chunk_delay=chunk_seconds)
+        slow_served[0] += 1
+
+    async def client(requests):
+      for _, method, path, body in replay(requests):
+        start = time.perf_counter()
+        if start >= deadline:
+          return
+        await request(adapter, method, path, body if body is not None else b'')
+        latencies.append(time.perf_counter() - start)
+
+    slow = [asyncio.ensure_future(slow_client()) for _ in range(slow_clients)]
+    await asyncio.sleep(0.1)
+    start = time.perf_counter()
+    deadline = start + seconds
+    await asyncio.gather(*(client(plan[i::clients]) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await asyncio.gather(*slow)
+    return summarize(latencies, elapsed, slow_served[0])
+
+  try:
+    return asyncio.run(main())
+  finally:
+    adapter.close()
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database', help='database built by bench.synthetic; built from the size options when omitted')
+  parser.add_argument('--words', type=int, default=10000)
+  parser.add_argument('--groups', type=int, default=20)
+  parser.add_argument('--sessions', type=int, default=2000)
+  parser.add_argument('--reviews', type=int, default=50000)
+  parser.add_argument('--seconds', type=float, default=10.0, help='how long each mode runs')
+  parser.add_argument('--requests', type=int, default=5000, help='length of the replayed request sequence')
+  parser.add_argument('--threads', type=int, default=5, help='server threads (the connection pool size)')
+  parser.add_argument('--clients', type=int, default=16)
+  parser.add_argument('--slow-clients', type=int, default=20)
+  parser.add_argument('--slow-export', default='words', help='table the slow clients export')
+  parser.add_argument('--slow-chunk-seconds', type=float, default=0.5, help='time a slow client takes to receive each chunk')
+  parser.add_argument('--seed', type=int, default=42)
+  parser.add_argument('--output', help='also write the JSON report to this file')
+  args = parser.parse_args()
+
+  workdir = tempfile.mkdtemp(prefix='bench-asgi-')
+  try:
+    source = os.path.join(workdir, 'source.db')
+    if args.database:
+      shutil.copyfile(args.database, source)
+    else:
+      build_database(source, words=args.words, groups=args.groups, sessions=args.sessions, reviews=args.reviews, seed=args.seed)
+    sizes = database_sizes(source)
+    plan = plan_requests(random.Random(args.seed), sizes, args.requests)
+
+    slow_path = f'/export/{args.slow_export}.ndjson'
+    results = {}
+    for mode in ('wsgi', 'asgi'):
+      # Each mode starts from the same data; the mix writes
+      path = os.path.join(workdir, f'{mode}.db')
+      shutil.copyfile(source, path)
+      app = create_load_app(path, pool_size=args.threads)
+      try:
+        if mode == 'wsgi':
+          results[mode] = run_wsgi(app, plan, args.seconds, args.threads, args.clients, args.slow_clients, slow_path, args.slow_chunk_seconds)
+        else:
+          results[mode] = run_asgi(app, plan, args.seconds, args.threads, args.clients, args.slow_clients, slow_path, args.slow_chunk_seconds)
+      finally:
+        app.db.shutdown()
+  finally:
+    shutil.rmtree(workdir)
+
+  report = {
+    'commit': git_commit(),
+    'seed': args.seed,
+    'database': sizes,
+    'threads': args.threads,
+    'clients': args.clients,
+    'slow_clients': args.slow_clients,
+    'slow_request': f'GET {slow_path}',
+    'slow_chunk_seconds': args.slow_chunk_seconds,
+    'wsgi': results['wsgi'],
+    'asgi': results['asgi']
+  }
+  output = json.dumps(report, indent=2)
+  print(output)
+  if args.output:
+    with open(args.output, 'w') as file:
+      file.write(output + '\n')
+
+if __name__ == '__main__':
+  main()
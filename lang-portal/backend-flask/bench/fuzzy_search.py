@@ -0,0 +1,111 @@
+"""Measure GET /words/fuzzy latency on synthetic dictionaries of several sizes.
+
+Run from lang-portal/backend-flask:
+
+    python -m bench.fuzzy_search --sizes 100000 1000000 --queries 200
+
+Each query is the romaji of a random word with one typo (a character
+inserted, dropped or replaced). The trigram-index lookup is timed per query
+and reported with recall (how often the original word is among the results);
+a handful of queries are also answered by a full scan computing the edit
+distance to every word, for comparison. Results are printed as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import string
+import tempfile
+import time
+
+from bench.synthetic import build_database
+from lib.fuzzy import DEFAULT_THRESHOLD, fuzzy_search, levenshtein
+
+def with_typo(rng, text):
+  position = rng.randrange(len(text) + 1)
+  letter = rng.choice(string.ascii_lowercase)
+  edit = rng.choice(['insert', 'delete', 'replace']) if len(text) > 1 else 'insert'
+  if edit == 'insert':
+    return text[:position] + letter + text[position:]
+  position = min(position, len(text) - 1)
+  if edit == 'delete':
+    return text[:position] + text[position + 1:]
+  return text[:position] + letter + text[position + 1:]
+
+def percentile(samples, fraction):
+  ordered = sorted(samples)
+  return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def full_scan(conn, query, limit):
+  # What a search without the index has to do: compare against every word
+  rows = conn.execute('SELECT id, romaji FROM words').fetchall()
+  return sorted((levenshtein(query, romaji.lower()), word_id) for word_id, romaji in rows)[:limit]
+
+def run_size(words, args):
+  workdir = tempfile.mkdtemp(prefix=f'bench-fuzzy-{words}-')
+  path = os.path.join(workdir, 'words.db')
+  try:
+    start = time.perf_counter()
+    build_database(path, words=words, sessions=10, reviews=100, seed=args.seed)
+    build_seconds = time.perf_counter() - start
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    rng = random.Random(args.seed)
+    targets = [
+      (word_id, conn.execute('SELECT romaji FROM words WHERE id = ?', (word_id,)).fetchone()[0])
+      for word_id in (rng.randint(1, words) for _ in range(args.queries))
+    ]
+    queries = [(word_id, with_typo(rng, romaji)) for word_id, romaji in targets]
+
+    latencies = []
+    found = 0
+    for word_id, query in queries:
+      start = time.perf_counter()
+      results = fuzzy_search(conn.cursor(), query, args.threshold, args.limit)
+      latencies.append((time.perf_counter() - start) * 1000)
+      found += word_id in [word['id'] for word in results]
+
+    scan_latencies = []
+    for _, query in queries[:args.scan_queries]:
+      start = time.perf_counter()
+      full_scan(conn, query, args.limit)
+      scan_latencies.append((time.perf_counter() - start) * 1000)
+    conn.close()
+
+    return {
+      'words': words,
+      'build_seconds': round(build_seconds, 1),
+      'database_mb': round(os.path.getsize(path) / 1e6, 1),
+      'queries': len(queries),
+      'recall': round(found / len(queries), 3),
+      'p50_ms': round(percentile(latencies, 0.50), 2),
+      'p95_ms': round(percentile(latencies, 0.95), 2),
+      'p99_ms': round(percentile(latencies, 0.99), 2),
+      'mean_ms': round(sum(latencies) / len(latencies), 2),
+      'full_scan_mean_ms': round(sum(scan_latencies) / len(scan_latencies), 1) if scan_latencies else None
+    }
+  finally:
+    shutil.rmtree(workdir)
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--sizes', nargs='+', type=int, default=[100000, 1000000])
+  parser.add_argument('--queries', type=int, default=200)
+  parser.add_argument('--scan-queries', type=int, default=3, help='queries also answered by a full scan')
+  parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+  parser.add_argument('--limit', type=int, default=20)
+  parser.add_argument('--seed', type=int, default=42)
+  args = parser.parse_args()
+
+  print(json.dumps({
+    'threshold': args.threshold,
+    'limit': args.limit,
+    'seed': args.seed,
+    'results': [run_size(words, args) for words in args.sizes]
+  }, indent=2))
+
+if __name__ == '__main__':
+  main()
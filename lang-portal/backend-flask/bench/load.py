@@ -0,0 +1,235 @@
+"""Replay a weighted mix of API routes and report latency and throughput.
+
+Run from lang-portal/backend-flask, against a database built by
+bench/synthetic.py (or a fresh one of the given size):
+
+    python -m bench.synthetic /tmp/large.db --words 100000 --groups 1000 --sessions 1000000 --reviews 20000000
+    python -m bench.load --database /tmp/large.db --requests 20000 --output load.json
+
+Requests go through the Flask app in-process (routes, pool, JSON provider and,
+with --cache, the response cache), so the numbers cover the backend and not
+the network or a WSGI server. The database is copied first because the mix
+includes writes. Each endpoint reports p50/p95/p99 latency and requests per
+second; the JSON also records the git commit, seed and database sizes so runs
+of different commits can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+
+from flask import Flask
+
+import routes.dashboard
+import routes.export
+import routes.groups
+import routes.study_activities
+import routes.study_sessions
+import routes.words
+from bench.synthetic import SYLLABLES, build_database
+from lib.db import Db
+from lib.json_provider import FastJSONProvider
+from lib.response_cache import DataVersion, ResponseCache
+
+WORD_SORTS = ['kanji', 'romaji', 'english', 'correct_count', 'wrong_count', 'accuracy']
+ORDERS = ['asc', 'desc']
+
+# (endpoint, weight, method, request builder). A builder takes the random
+# generator and the database sizes and returns the path and JSON body.
+ROUTE_MIX = [
+  ('GET /words', 20, 'GET', lambda rng, n: (
+    f"/words?page={rng.randint(1, max(1, n['words'] // 50))}&sort_by={rng.choice(WORD_SORTS)}&order={rng.choice(ORDERS)}", None)),
+  ('GET /words/<id>', 10, 'GET', lambda rng, n: (f"/words/{rng.randint(1, n['words'])}", None)),
+  ('GET /words/search', 5, 'GET', lambda rng, n: (f"/words/search?q={rng.choice(SYLLABLES)}{rng.choice(SYLLABLES)}", None)),
+  ('GET /words/fuzzy', 2, 'GET', lambda rng, n: (f"/words/fuzzy?q={''.join(rng.choice(SYLLABLES) for _ in range(3))}", None)),
+  ('GET /groups', 5, 'GET', lambda rng, n: (
+    f"/groups?page={rng.randint(1, max(1, n['groups'] // 10))}&sort_by={rng.choice(['name', 'words_count'])}", None)),
+  ('GET /groups/<id>', 5, 'GET', lambda rng, n: (f"/groups/{rng.randint(1, n['groups'])}", None)),
+  ('GET /groups/<id>/words', 10, 'GET', lambda rng, n: (
+    f"/groups/{rng.randint(1, n['groups'])}/words?sort_by={rng.choice(WORD_SORTS)}&order={rng.choice(ORDERS)}", None)),
+  ('GET /groups/<id>/words/raw', 3, 'GET', lambda rng, n: (f"/groups/{rng.randint(1, n['groups'])}/words/raw", None)),
+  ('GET /groups/<id>/due', 5, 'GET', lambda rng, n: (f"/groups/{rng.randint(1, n['groups'])}/due", None)),
+  ('GET /groups/<id>/sample', 3, 'GET', lambda rng, n: (
+    f"/groups/{rng.randint(1, n['groups'])}/sample?strategy={rng.choice(['uniform', 'error_weighted'])}", None)),
+  ('GET /groups/<id>/study_sessions', 3, 'GET', lambda rng, n: (f"/groups/{rng.randint(1, n['groups'])}/study_sessions", None)),
+  ('GET /api/study-sessions', 3, 'GET', lambda rng, n: (
+    f"/api/study-sessions?page={rng.randint(1, max(1, n['sessions'] // 10))}", None)),
+  ('GET /api/study-sessions/<id>', 5, 'GET', lambda rng, n: (f"/api/study-sessions/{rng.randint(1, n['sessions'])}", None)),
+  ('GET /api/study-activities', 2, 'GET', lambda rng, n: ('/api/study-activities', None)),
+  ('GET /dashboard/stats', 5, 'GET', lambda rng, n: ('/dashboard/stats', None)),
+  ('GET /dashboard/recent-session', 5, 'GET', lambda rng, n: ('/dashboard/recent-session', None)),
+  ('POST /api/study-sessions', 2, 'POST', lambda rng, n: (
+    '/api/study-sessions', {'group_id': rng.randint(1, n['groups']), 'study_activity_id': 1})),
+  ('POST /api/study-sessions/<id>/review', 10, 'POST', lambda rng, n: (
+    f"/api/study-sessions/{rng.randint(1, n['sessions'])}/review",
+    {'word_id': rng.randint(1, n['words']), 'correct': rng.random() < 0.7}))
+]
+
+def create_load_app(database, cache=False, pool_size=5):
+  app = Flask(__name__)
+  app.json = FastJSONProvider(app)
+  app.db = Db(database=database, pool_size=pool_size)
+  for migration in app.db.migrate():
+    print(f"Applied migration {migration.filename}")
+
+  @app.teardown_appcontext
+  def close_db(exception):
+    app.db.close()
+
+  if cache:
+    ResponseCache(DataVersion(database, on_connect=app.db.configure)).init_app(app)
+  for module in (routes.words, routes.groups, routes.study_sessions, routes.dashboard, routes.study_activities, routes.export):
+    module.load(app)
+  return app
+
+def database_sizes(path):
+  conn = sqlite3.connect(path)
+  try:
+    return {
+      table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+      for table in ('words', 'groups', 'study_sessions', 'word_review_items')
+    }
+  finally:
+    conn.close()
+
+def git_commit():
+  try:
+    commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True, check=True).stdout.strip()
+    return commit + ('-dirty' if dirty else '')
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def percentile(samples, fraction):
+  ordered = sorted(samples)
+  return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def plan_requests(rng, sizes, count):
+  """The request sequence: the same seed and sizes always give the same one"""
+  n = {'words': sizes['words'], 'groups': sizes['groups'], 'sessions': sizes['study_sessions']}
+  names = [name for name, _, _, _ in ROUTE_MIX]
+  weights = [weight for _, weight, _, _ in ROUTE_MIX]
+  routes_by_name = {name: (method, build) for name, _, method, build in ROUTE_MIX}
+  plan = []
+  for name in rng.choices(names, weights=weights, k=count):
+    method, build = routes_by_name[name]
+    path, body = build(rng, n)
+    plan.append((name, method, path, body))
+  return plan
+
+def worker(app, plan, results, errors):
+  client = app.test_client()
+  for name, method, path, body in plan:
+    start = time.perf_counter()
+    response = client.open(path, method=method, json=body)
+    elapsed = time.perf_counter() - start
+    results.append((name, elapsed))
+    if response.status_code >= 500:
+      errors.append((name, path, response.status_code))
+
+def run(app, plan, threads):
+  results = []
+  errors = []
+  workers = [
+    threading.Thread(target=worker, args=(app, plan[i::threads], results, errors))
+    for i in range(threads)
+  ]
+  start = time.perf_counter()
+  for thread in workers:
+    thread.start()
+  for thread in workers:
+    thread.join()
+  return results, errors, time.perf_counter() - start
+
+def summarize(results, elapsed):
+  by_endpoint = {}
+  for name, seconds in results:
+    by_endpoint.setdefault(name, []).append(seconds * 1000)
+  endpoints = {}
+  for name, _, _, _ in ROUTE_MIX:
+    samples = by_endpoint.get(name)
+    if not samples:
+      continue
+    endpoints[name] = {
+      'requests': len(samples),
+      'p50_ms': round(percentile(samples, 0.50), 3),
+      'p95_ms': round(percentile(samples, 0.95), 3),
+      'p99_ms': round(percentile(samples, 0.99), 3),
+      'mean_ms': round(sum(samples) / len(samples), 3),
+      'requests_per_second': round(len(samples) / elapsed, 1)
+    }
+  every = [seconds * 1000 for _, seconds in results]
+  return endpoints, {
+    'requests': len(every),
+    'seconds': round(elapsed, 2),
+    'requests_per_second': round(len(every) / elapsed, 1),
+    'p50_ms': round(percentile(every, 0.50), 3),
+    'p95_ms': round(percentile(every, 0.95), 3),
+    'p99_ms': round(percentile(every, 0.99), 3)
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database', help='database built by bench.synthetic; built from the size options when omitted')
+  parser.add_argument('--words', type=int, default=10000)
+  parser.add_argument('--groups', type=int, default=20)
+  parser.add_argument('--sessions', type=int, default=2000)
+  parser.add_argument('--reviews', type=int, default=50000)
+  parser.add_argument('--requests', type=int, default=5000)
+  parser.add_argument('--warmup', type=int, default=500, help='requests replayed before timing starts')
+  parser.add_argument('--threads', type=int, default=1)
+  parser.add_argument('--cache', action='store_true', help='enable the response cache')
+  parser.add_argument('--seed', type=int, default=42)
+  parser.add_argument('--output', help='also write the JSON report to this file')
+  args = parser.parse_args()
+
+  workdir = tempfile.mkdtemp(prefix='bench-load-')
+  try:
+    path = os.path.join(workdir, 'words.db')
+    if args.database:
+      # Work on a copy: the mix writes sessions and reviews
+      shutil.copyfile(args.database, path)
+    else:
+      build_database(path, words=args.words, groups=args.groups, sessions=args.sessions, reviews=args.reviews, seed=args.seed)
+    sizes = database_sizes(path)
+
+    app = create_load_app(path, cache=args.cache)
+    rng = random.Random(args.seed)
+    warmup = plan_requests(rng, sizes, args.warmup)
+    plan = plan_requests(rng, sizes, args.requests)
+    run(app, warmup, args.threads)
+    results, errors, elapsed = run(app, plan, args.threads)
+    app.db.shutdown()
+  finally:
+    shutil.rmtree(workdir)
+
+  endpoints, overall = summarize(results, elapsed)
+  report = {
+    'commit': git_commit(),
+    'seed': args.seed,
+    'database': sizes,
+    'threads': args.threads,
+    'cache': args.cache,
+    'python': platform.python_version(),
+    'sqlite': sqlite3.sqlite_version,
+    'overall': overall,
+    'endpoints': endpoints,
+    'errors': len(errors)
+  }
+  for name, failed_path, status in errors[:10]:
+    print(f'{status} from {name}: {failed_path}')
+  output = json.dumps(report, indent=2)
+  print(output)
+  if args.output:
+    with open(args.output, 'w') as file:
+      file.write(output + '\n')
+
+if __name__ == '__main__':
+  main()
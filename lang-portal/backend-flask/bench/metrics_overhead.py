@@ -0,0 +1,104 @@
+"""Measure what request and SQL metrics add to the latency of GET /words.
+
+Run from lang-portal/backend-flask:
+
+    python -m bench.metrics_overhead --words 20000 --requests 2000
+
+The same synthetic database is served by two in-process apps, one with
+lib/metrics installed and one without (neither caches responses). Requests
+for a mix of /words pages and sort orders alternate between the apps in
+rounds; the median time per request of each and the median ratio between
+paired rounds (the overhead) are reported as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from flask import Flask
+
+import routes.words
+from bench.synthetic import build_database
+from lib.db import Db
+from lib.metrics import Metrics
+
+SORTS = ['kanji', 'romaji', 'english', 'correct_count', 'accuracy']
+
+def create_bench_app(database, metrics):
+  app = Flask(__name__)
+  app.db = Db(database=database, pool_size=1)
+
+  @app.teardown_appcontext
+  def close_db(exception):
+    app.db.close()
+
+  if metrics:
+    Metrics().init_app(app)
+  routes.words.load(app)
+  return app
+
+def run_round(client, paths):
+  start = time.perf_counter()
+  for path in paths:
+    response = client.get(path)
+    assert response.status_code == 200, response.get_data(as_text=True)
+  return time.perf_counter() - start
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--words', type=int, default=20000)
+  parser.add_argument('--requests', type=int, default=2000)
+  parser.add_argument('--round-size', type=int, default=50)
+  parser.add_argument('--repeat', type=int, default=3, help='times every round is replayed')
+  parser.add_argument('--seed', type=int, default=42)
+  args = parser.parse_args()
+
+  workdir = tempfile.mkdtemp(prefix='bench-metrics-')
+  try:
+    path = os.path.join(workdir, 'words.db')
+    build_database(path, words=args.words, sessions=200, reviews=args.words, seed=args.seed)
+    clients = {
+      'off': create_bench_app(path, metrics=False).test_client(),
+      'on': create_bench_app(path, metrics=True).test_client()
+    }
+
+    rng = random.Random(args.seed)
+    pages = args.words // 50
+    paths = [
+      f'/words?page={rng.randint(1, pages)}&sort_by={rng.choice(SORTS)}&order={rng.choice(["asc", "desc"])}'
+      for _ in range(args.requests)
+    ]
+    rounds = [paths[i:i + args.round_size] for i in range(0, len(paths), args.round_size)]
+
+    # Warm both apps' connections and page cache before timing anything
+    for client in clients.values():
+      run_round(client, rounds[0])
+
+    timings = {name: [] for name in clients}
+    for i, batch in enumerate(rounds * args.repeat):
+      # Alternate which app goes first so drift affects both the same way
+      order = ['off', 'on'] if i % 2 == 0 else ['on', 'off']
+      for name in order:
+        timings[name].append(run_round(clients[name], batch) / len(batch))
+
+    off = statistics.median(timings['off']) * 1000
+    on = statistics.median(timings['on']) * 1000
+    # Rounds of the same requests are compared pairwise, which cancels out
+    # most of the drift between rounds
+    ratio = statistics.median(b / a for a, b in zip(timings['off'], timings['on']))
+    print(json.dumps({
+      'words': args.words,
+      'requests': args.requests * args.repeat,
+      'off_ms': round(off, 3),
+      'on_ms': round(on, 3),
+      'overhead_percent': round((ratio - 1) * 100, 2)
+    }, indent=2))
+  finally:
+    shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,90 @@
+"""Measure the cost of turning query rows into a JSON response.
+
+Run from lang-portal/backend-flask:
+
+    python -m bench.serialization --rows 10000 --repeat 20
+
+Rows shaped like GET /words are read from an in-memory database and
+serialized the old way (sqlite3.Row copied field by field, Flask's default
+provider) and the new way (lib/rows.fetch_dicts, lib/json_provider). Fetching
+and encoding are timed separately; the best of `repeat` runs is reported in
+milliseconds per 10k rows as JSON.
+"""
+import argparse
+import json
+import random
+import sqlite3
+import time
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from bench.synthetic import synthetic_word
+from lib import json_provider
+from lib.json_provider import FastJSONProvider
+from lib.rows import fetch_dicts
+
+FIELDS = ['id', 'kanji', 'romaji', 'english', 'correct_count', 'wrong_count', 'accuracy']
+
+def build(rows, seed):
+  rng = random.Random(seed)
+  conn = sqlite3.connect(':memory:')
+  conn.row_factory = sqlite3.Row
+  conn.execute('CREATE TABLE words (id INTEGER PRIMARY KEY, kanji TEXT, romaji TEXT, english TEXT, correct_count INTEGER, wrong_count INTEGER, accuracy REAL)')
+  words = []
+  for _ in range(rows):
+    word = synthetic_word(rng)
+    correct, wrong = rng.randint(0, 50), rng.randint(0, 50)
+    words.append((word['kanji'], word['romaji'], word['english'], correct, wrong, correct / (correct + wrong) if correct + wrong else None))
+  conn.executemany('INSERT INTO words (kanji, romaji, english, correct_count, wrong_count, accuracy) VALUES (?, ?, ?, ?, ?, ?)', words)
+  return conn
+
+def row_dicts(cursor):
+  # What the routes did before: copy each sqlite3.Row into a dict by name
+  return [{field: row[field] for field in FIELDS} for row in cursor.fetchall()]
+
+def best_of(repeat, fn):
+  timings = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    fn()
+    timings.append(time.perf_counter() - start)
+  return min(timings)
+
+def measure(conn, provider, to_dicts, repeat, per):
+  query = f"SELECT {', '.join(FIELDS)} FROM words"
+  data = to_dicts(conn.execute(query))
+  fetch = best_of(repeat, lambda: to_dicts(conn.execute(query)))
+  encode = best_of(repeat, lambda: provider.response({'words': data, 'next_cursor': None}))
+  return {
+    'fetch_ms': round(fetch * per, 2),
+    'encode_ms': round(encode * per, 2),
+    'total_ms': round((fetch + encode) * per, 2),
+    'bytes': len(provider.response({'words': data, 'next_cursor': None}).get_data())
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--rows', type=int, default=10000)
+  parser.add_argument('--repeat', type=int, default=20)
+  parser.add_argument('--seed', type=int, default=42)
+  args = parser.parse_args()
+
+  conn = build(args.rows, args.seed)
+  app = Flask(__name__)
+  # Milliseconds per 10k rows
+  per = 1000 * 10000 / args.rows
+  before = measure(conn, DefaultJSONProvider(app), row_dicts, args.repeat, per)
+  after = measure(conn, FastJSONProvider(app), fetch_dicts, args.repeat, per)
+  conn.close()
+
+  print(json.dumps({
+    'rows': args.rows,
+    'orjson': json_provider.orjson is not None,
+    'before': before,
+    'after': after,
+    'speedup': round(before['total_ms'] / after['total_ms'], 2)
+  }, indent=2))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,142 @@
+"""Compare mixed read/write throughput of the SQLite storage profiles.
+
+Run from lang-portal/backend-flask:
+
+    python -m bench.storage_profiles --words 20000 --duration 5
+
+Reader threads replay the GET /words and /dashboard/stats query shapes while
+writer threads replay POST /api/study-sessions/<id>/review. Every profile runs
+against its own copy of the same synthetic words.db, and the results are
+printed as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from bench.synthetic import build_database
+from lib.profiles import STORAGE_PROFILES, apply_profile
+
+READ_QUERIES = [
+  ('''
+    SELECT w.id, w.kanji, w.romaji, w.english,
+        COALESCE(r.correct_count, 0) AS correct_count,
+        COALESCE(r.wrong_count, 0) AS wrong_count
+    FROM words w
+    LEFT JOIN word_reviews r ON w.id = r.word_id
+    ORDER BY kanji asc
+    LIMIT 50 OFFSET ?
+  ''', lambda rng, args: (rng.randint(0, max(0, args.words - 50)),)),
+  ('''
+    SELECT SUM(CASE WHEN correct = 1 THEN 1 ELSE 0 END) * 1.0 / COUNT(*) as success_rate
+    FROM word_review_items wri
+    JOIN study_sessions ss ON wri.study_session_id = ss.id
+  ''', lambda rng, args: ()),
+]
+
+WRITE_QUERY = '''
+  INSERT INTO word_review_items (study_session_id, word_id, correct, created_at)
+  VALUES (?, ?, ?, datetime('now'))
+'''
+
+def connect(path, profile):
+  conn = sqlite3.connect(path, check_same_thread=False)
+  apply_profile(conn, profile)
+  return conn
+
+def reader(path, profile, args, seed, stop, result):
+  rng = random.Random(seed)
+  conn = connect(path, profile)
+  while not stop.is_set():
+    sql, params = rng.choice(READ_QUERIES)
+    try:
+      conn.execute(sql, params(rng, args)).fetchall()
+      result['reads'] += 1
+    except sqlite3.OperationalError:
+      result['errors'] += 1
+  conn.close()
+
+def writer(path, profile, args, seed, stop, result):
+  rng = random.Random(seed)
+  conn = connect(path, profile)
+  while not stop.is_set():
+    try:
+      conn.execute(WRITE_QUERY, (rng.randint(1, args.sessions), rng.randint(1, args.words), rng.random() < 0.7))
+      conn.commit()
+      result['writes'] += 1
+    except sqlite3.OperationalError:
+      conn.rollback()
+      result['errors'] += 1
+  conn.close()
+
+def run_profile(base_path, profile, args):
+  workdir = tempfile.mkdtemp(prefix=f'bench-{profile}-')
+  path = os.path.join(workdir, 'words.db')
+  shutil.copyfile(base_path, path)
+  connect(path, profile).close()  # Switch the copy's journal mode before timing
+
+  stop = threading.Event()
+  results = []
+  threads = []
+  for i in range(args.readers):
+    results.append({'reads': 0, 'writes': 0, 'errors': 0})
+    threads.append(threading.Thread(target=reader, args=(path, profile, args, i, stop, results[-1])))
+  for i in range(args.writers):
+    results.append({'reads': 0, 'writes': 0, 'errors': 0})
+    threads.append(threading.Thread(target=writer, args=(path, profile, args, 1000 + i, stop, results[-1])))
+
+  start = time.perf_counter()
+  for thread in threads:
+    thread.start()
+  time.sleep(args.duration)
+  stop.set()
+  for thread in threads:
+    thread.join()
+  elapsed = time.perf_counter() - start
+  shutil.rmtree(workdir)
+
+  reads = sum(r['reads'] for r in results)
+  writes = sum(r['writes'] for r in results)
+  return {
+    'profile': profile,
+    'settings': STORAGE_PROFILES[profile],
+    'reads_per_second': round(reads / elapsed, 1),
+    'writes_per_second': round(writes / elapsed, 1),
+    'operations_per_second': round((reads + writes) / elapsed, 1),
+    'errors': sum(r['errors'] for r in results)
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--profiles', nargs='+', default=list(STORAGE_PROFILES), choices=list(STORAGE_PROFILES))
+  parser.add_argument('--words', type=int, default=20000)
+  parser.add_argument('--sessions', type=int, default=2000)
+  parser.add_argument('--reviews', type=int, default=100000)
+  parser.add_argument('--readers', type=int, default=4)
+  parser.add_argument('--writers', type=int, default=2)
+  parser.add_argument('--duration', type=float, default=5.0, help='seconds per profile')
+  args = parser.parse_args()
+
+  workdir = tempfile.mkdtemp(prefix='bench-base-')
+  base_path = os.path.join(workdir, 'words.db')
+  build_database(base_path, words=args.words, sessions=args.sessions, reviews=args.reviews)
+  try:
+    results = [run_profile(base_path, profile, args) for profile in args.profiles]
+  finally:
+    shutil.rmtree(workdir)
+
+  print(json.dumps({
+    'readers': args.readers,
+    'writers': args.writers,
+    'duration': args.duration,
+    'words': args.words,
+    'results': results
+  }, indent=2))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,147 @@
+"""Deterministic synthetic lang-portal databases for benchmarks.
+
+Run from lang-portal/backend-flask:
+
+    python -m bench.synthetic words.db --words 100000 --groups 1000 --sessions 1000000 --reviews 20000000
+
+The same sizes and seed always produce the same data.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+
+from lib.db import Db, SETUP_TABLES
+from lib.migrations import MigrationRunner
+from lib.dashboard_stats import rebuild_stats
+from lib.reviews import rebuild_session_stats, rebuild_word_reviews
+from lib.schedule import rebuild_schedule
+
+SYLLABLES = [
+  'a', 'i', 'u', 'e', 'o', 'ka', 'ki', 'ku', 'ke', 'ko', 'sa', 'shi', 'su', 'se', 'so',
+  'ta', 'chi', 'tsu', 'te', 'to', 'na', 'ni', 'nu', 'ne', 'no', 'ha', 'hi', 'fu', 'he', 'ho',
+  'ma', 'mi', 'mu', 'me', 'mo', 'ya', 'yu', 'yo', 'ra', 'ri', 'ru', 're', 'ro', 'wa', 'n',
+  'ga', 'gi', 'gu', 'ge', 'go', 'da', 'de', 'do', 'ba', 'bi', 'bu', 'be', 'bo'
+]
+
+ENGLISH = [
+  'to eat', 'to drink', 'to go', 'to come', 'to see', 'to write', 'to read', 'to pay',
+  'big', 'small', 'new', 'old', 'hot', 'cold', 'quiet', 'busy', 'red', 'blue', 'tall', 'cheap'
+]
+
+def synthetic_word(rng):
+  """Return a random word in the shape of seed/data_verbs.json"""
+  parts = []
+  for _ in range(rng.randint(1, 4)):
+    parts.append({
+      'kanji': chr(rng.randint(0x4E00, 0x9FA5)),
+      'romaji': [rng.choice(SYLLABLES) for _ in range(rng.randint(1, 2))]
+    })
+  return {
+    'kanji': ''.join(part['kanji'] for part in parts),
+    'romaji': ''.join(''.join(part['romaji']) for part in parts),
+    'english': rng.choice(ENGLISH),
+    'parts': parts
+  }
+
+def create_schema(conn):
+  db = Db()
+  for filepath in SETUP_TABLES:
+    conn.execute(db.sql(filepath))
+  conn.commit()
+  MigrationRunner(conn).migrate()
+
+def build_database(path, words=10000, groups=20, sessions=2000, reviews=50000, seed=42):
+  """Build a words.db at `path` filled with deterministic synthetic data.
+
+  Words are spread round-robin over the groups. Every session studies a
+  random group, and its review items are words of that group answered five
+  seconds apart (70% correct), so ids grow with time as in a real database.
+  """
+  rng = random.Random(seed)
+  conn = sqlite3.connect(path)
+  # Nothing here needs to survive a crash: a half-built database is rebuilt
+  conn.execute('PRAGMA journal_mode = MEMORY')
+  conn.execute('PRAGMA synchronous = OFF')
+  create_schema(conn)
+
+  conn.executemany(
+    'INSERT INTO words (id, kanji, romaji, english, parts) VALUES (?, ?, ?, ?, ?)',
+    ((i, w['kanji'], w['romaji'], w['english'], json.dumps(w['parts']))
+      for i, w in ((i, synthetic_word(rng)) for i in range(1, words + 1)))
+  )
+  conn.executemany(
+    'INSERT INTO groups (id, name) VALUES (?, ?)',
+    ((i, f'Group {i}') for i in range(1, groups + 1))
+  )
+  conn.executemany(
+    'INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)',
+    ((i, (i - 1) % groups + 1) for i in range(1, words + 1))
+  )
+  conn.execute('''
+    INSERT INTO study_activities (name, url, preview_url)
+    VALUES ('Typing Tutor', 'http://localhost:8080', '/assets/study_activities/typing-tutor.png')
+  ''')
+  session_groups = [rng.randint(1, groups) for _ in range(sessions)]
+  conn.executemany(
+    '''INSERT INTO study_sessions (id, group_id, study_activity_id, created_at)
+       VALUES (?, ?, 1, datetime('now', ?))''',
+    ((i, group_id, f'-{sessions - i} minutes') for i, group_id in enumerate(session_groups, 1))
+  )
+  conn.executemany(
+    '''INSERT INTO word_review_items (word_id, study_session_id, correct, created_at)
+       SELECT ?, id, ?, datetime(created_at, ?) FROM study_sessions WHERE id = ?''',
+    synthetic_reviews(rng, words, groups, session_groups, reviews)
+  )
+  # Review items were inserted directly, so derive the counters afterwards
+  rebuild_word_reviews(conn.cursor())
+  rebuild_session_stats(conn.cursor())
+  rebuild_schedule(conn.cursor())
+  rebuild_stats(conn.cursor())
+  conn.commit()
+  conn.close()
+
+def synthetic_reviews(rng, words, groups, session_groups, reviews):
+  """Parameters of `reviews` review items spread evenly over the sessions in
+  creation order, each on a word of the session's group"""
+  per_session, remainder = divmod(reviews, len(session_groups))
+  longer = set(rng.sample(range(1, len(session_groups) + 1), remainder))
+  for session_id, group_id in enumerate(session_groups, 1):
+    # Words of group g are g, g + groups, g + 2 * groups, ...
+    group_words = (words - group_id) // groups + 1
+    for second in range(per_session + (session_id in longer)):
+      if group_id <= words:
+        word_id = group_id + groups * rng.randrange(group_words)
+      else:
+        word_id = rng.randint(1, words)
+      yield (word_id, rng.random() < 0.7, f'+{second * 5} seconds', session_id)
+
+def main():
+  parser = argparse.ArgumentParser(description='Build a words.db filled with deterministic synthetic data')
+  parser.add_argument('path', help='database file to create')
+  parser.add_argument('--words', type=int, default=10000)
+  parser.add_argument('--groups', type=int, default=20)
+  parser.add_argument('--sessions', type=int, default=2000)
+  parser.add_argument('--reviews', type=int, default=50000)
+  parser.add_argument('--seed', type=int, default=42)
+  args = parser.parse_args()
+
+  if os.path.exists(args.path):
+    raise SystemExit(f'{args.path} already exists')
+  start = time.perf_counter()
+  build_database(args.path, words=args.words, groups=args.groups, sessions=args.sessions, reviews=args.reviews, seed=args.seed)
+  print(json.dumps({
+    'path': args.path,
+    'words': args.words,
+    'groups': args.groups,
+    'sessions': args.sessions,
+    'reviews': args.reviews,
+    'seed': args.seed,
+    'seconds': round(time.perf_counter() - start, 1),
+    'database_mb': round(os.path.getsize(args.path) / 1e6, 1)
+  }, indent=2))
+
+if __name__ == '__main__':
+  main()
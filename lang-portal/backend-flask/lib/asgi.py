@@ -0,0 +1,440 @@
+import asyncio
+import io
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+from werkzeug.exceptions import ClientDisconnected, RequestEntityTooLarge
+
+# Seconds between SSE keep-alive comments on an idle change stream
+HEARTBEAT_SECONDS = 15
+# Longest a GET /changes long poll may wait
+MAX_POLL_SECONDS = 60
+
+class ChangeFeed:
+  """Process-wide change counter fed by SQLite's data version.
+
+  While anyone is waiting, one task reads `PRAGMA data_version` (through
+  `DataVersion`, on a thread of its own) every `poll_interval` seconds and
+  bumps `version` when another connection has committed. Waiters only hold
+  an asyncio event, not a thread, so any number of clients can wait at once.
+  """
+
+  def __init__(self, data_version, poll_interval=0.05):
+    self.data_version = data_version
+    self.poll_interval = poll_interval
+    self.version = 0
+    self.listeners = 0
+    self._last = None
+    self._loop = None
+    self._event = None
+    self._task = None
+    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='asgi-changes')
+
+  async def wait(self, since, timeout):
+    """The current version, once it differs from `since` or `timeout` passed"""
+    if since != self.version:
+      return self.version
+    loop = asyncio.get_running_loop()
+    if self._loop is not loop:
+      # Events and the polling task belong to the loop that made them
+      self._loop = loop
+      self._event = asyncio.Event()
+      self._task = None
+    event = self._event
+    self.listeners += 1
+    try:
+      if self._task is None or self._task.done():
+        self._task = asyncio.ensure_future(self._poll())
+      try:
+        await asyncio.wait_for(event.wait(), timeout)
+      except asyncio.TimeoutError:
+        pass
+      return self.version
+    finally:
+      self.listeners -= 1
+
+  async def _poll(self):
+    loop = asyncio.get_running_loop()
+    while self.listeners:
+      current = await loop.run_in_executor(self._executor, self.data_version.current)
+      # The last value is kept while nobody listens, so a commit between
+      # two waits still counts when polling resumes
+      if self._last is not None and current != self._last:
+        self.version += 1
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+      self._last = current
+      await asyncio.sleep(self.poll_interval)
+
+  def close(self):
+    self._executor.shutdown(wait=False)
+
+class RequestBody(io.RawIOBase):
+  """wsgi.input that receives the request body from the client as the app reads it.
+
+  Reads happen on a worker thread and wait for the next ASGI message on the
+  event loop, so an upload is never held in memory as a whole. A client that
+  disconnects before the body is complete raises ClientDisconnected, and a
+  body over `max_bytes` raises RequestEntityTooLarge, instead of the app
+  seeing a truncated body end as if it were complete.
+  """
+
+  def __init__(self, message, receive, loop, max_bytes):
+    self._receive = receive
+    self._loop = loop
+    self._max_bytes = max_bytes
+    self._chunk = memoryview(message.get('body', b''))
+    self._size = len(self._chunk)
+    self._more = message.get('more_body', False)
+
+  def readable(self):
+    return True
+
+  def readinto(self, buffer):
+    while not self._chunk and self._more:
+      message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+      if message['type'] == 'http.disconnect':
+        self._more = False
+        raise ClientDisconnected()
+      self._chunk = memoryview(message.get('body', b''))
+      self._size += len(self._chunk)
+      self._more = message.get('more_body', False)
+      if self._size > self._max_bytes:
+        self._more = False
+        raise RequestEntityTooLarge()
+    size = min(len(buffer), len(self._chunk))
+    buffer[:size] = self._chunk[:size]
+    self._chunk = self._chunk[size:]
+    return size
+
+class AsgiAdapter:
+  """Serves a WSGI app over ASGI, with SQLite work on a bounded thread pool.
+
+  Every Flask route runs unchanged on one of `max_workers` threads; the
+  event loop only moves bytes, so slow clients cost a coroutine instead of a
+  thread. Request bodies are read as the app consumes them (RequestBody) and
+  streamed responses are pulled one chunk per pool job. At most `max_pending` more requests wait for a thread before new
+  ones get a 503. Two routes are served by the loop itself, from `feed`:
+  GET /changes?since=<version>&timeout=<s> (long poll) and
+  GET /changes/stream (server-sent events), which tell clients when to
+  re-fetch.
+  """
+
+  def __init__(self, app, max_workers=5, max_pending=1000, max_body_bytes=64 * 1024 * 1024, feed=None, allowed_origins=('*',)):
+    self.app = app
+    self.max_workers = max_workers
+    self.max_pending = max_pending
+    self.max_body_bytes = max_body_bytes
+    self.feed = feed
+    self.allowed_origins = list(allowed_origins)
+    self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='asgi-worker')
+    self._lock = threading.Lock()
+    self._stats = {'requests': 0, 'rejected': 0, 'active': 0, 'queued': 0, 'streaming': 0}
+    self.routes = {}
+    if feed is not None:
+      self.routes['/changes'] = self._long_poll
+      self.routes['/changes/stream'] = self._stream
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] == 'lifespan':
+      await self._lifespan(receive, send)
+    elif scope['type'] == 'http':
+      route = self.routes.get(scope['path'])
+      if route is not None and scope['method'] == 'GET':
+        await route(scope, receive, send)
+      else:
+        await self._wsgi(scope, receive, send)
+
+  async def _lifespan(self, receive, send):
+    while True:
+      message = await receive()
+      if message['type'] == 'lifespan.startup':
+        await send({'type': 'lifespan.startup.complete'})
+      elif message['type'] == 'lifespan.shutdown':
+        self.close()
+        await send({'type': 'lifespan.shutdown.complete'})
+        return
+
+  def close(self):
+    self.executor.shutdown(wait=True)
+    if self.feed is not None:
+      self.feed.close()
+
+  def stats(self):
+    with self._lock:
+      stats = dict(self._stats, workers=self.max_workers)
+    if self.feed is not None:
+      stats['change_listeners'] = self.feed.listeners
+      stats['change_version'] = self.feed.version
+    return stats
+
+  async def _wsgi(self, scope, receive, send):
+    with self._lock:
+      if self._stats['active'] + self._stats['queued'] >= self.max_workers + self.max_pending:
+        self._stats['rejected'] += 1
+        rejected = True
+      else:
+        self._stats['queued'] += 1
+        rejected = False
+    if rejected:
+      await _send_json(send, 503, {'error': 'server busy, try again'})
+      return
+
+    started = False
+    try:
+      message = await receive()
+      if message['type'] == 'http.disconnect':
+        # Gone before sending anything: there is nobody to answer
+        return
+      length = dict(scope['headers']).get(b'content-length')
+      if (length is not None and length.isdigit() and int(length) > self.max_body_bytes) or len(message.get('body', b'')) > self.max_body_bytes:
+        await _send_json(send, 413, {'error': 'request body too large'})
+        return
+      loop = asyncio.get_running_loop()
+      body = RequestBody(message, receive, loop, self.max_body_bytes)
+      started = True
+      response = await loop.run_in_executor(self.executor, self._start, _environ(scope, body), loop, send)
+    finally:
+      with self._lock:
+        self._stats['requests'] += 1
+        if not started:
+          self._stats['queued'] -= 1
+    await self._send_response(response, loop, send)
+
+  def _start(self, environ, loop, send):
+    # On a worker thread: call the WSGI app and pull its first chunk, which
+    # is when a generator view calls start_response. The rest of the body is
+    # pulled chunk by chunk from the loop, so a slow download holds no thread.
+    with self._lock:
+      self._stats['queued'] -= 1
+      self._stats['active'] += 1
+    response = {'sent': False}
+
+    def start_response(status, headers, exc_info=None):
+      if exc_info is not None and response['sent']:
+        raise exc_info[1].with_traceback(exc_info[2])
+      response['status'] = int(status.split(' ', 1)[0])
+      response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+      return write
+
+    def write(chunk):
+      # The legacy write() callable, only usable while the app runs here
+      if not response['sent']:
+        asyncio.run_coroutine_threadsafe(send(_response_start(response)), loop).result()
+        response['sent'] = True
+      if chunk:
+        asyncio.run_coroutine_threadsafe(send({'type': 'http.response.body', 'body': bytes(chunk), 'more_body': True}), loop).result()
+
+    try:
+      result = self.app(environ, start_response)
+      try:
+        response['result'] = result
+        response['chunks'] = iter(result)
+        response['first'] = _next_chunk(response['chunks'])
+      except BaseException:
+        if hasattr(result, 'close'):
+          result.close()
+        raise
+      return response
+    finally:
+      with self._lock:
+        self._stats['active'] -= 1
+
+  async def _send_response(self, response, loop, send):
+    result = response['result']
+    with self._lock:
+      self._stats['streaming'] += 1
+    try:
+      if not response['sent']:
+        await send(_response_start(response))
+      chunk = response['first']
+      while chunk is not None:
+        await send({'type': 'http.response.body', 'body': bytes(chunk), 'more_body': True})
+        # Each further chunk is a short job on the pool, between which the
+        # thread serves other requests
+        chunk = await loop.run_in_executor(self.executor, _next_chunk, response['chunks'])
+      await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+      with self._lock:
+        self._stats['streaming'] -= 1
+      if hasattr(result, 'close'):
+        await loop.run_in_executor(self.executor, result.close)
+
+  def _cors_headers(self, scope):
+    origin = dict(scope['headers']).get(b'origin')
+    if origin is None:
+      return []
+    if '*' in self.allowed_origins or origin.decode('latin-1') in self.allowed_origins:
+      return [(b'access-control-allow-origin', origin)]
+    return []
+
+  async def _long_poll(self, scope, receive, send):
+    query = parse_qs(scope['query_string'].decode('latin-1'))
+    try:
+      since = int(query['since'][0]) if 'since' in query else None
+      timeout = min(float(query.get('timeout', ['30'])[0]), MAX_POLL_SECONDS)
+    except ValueError:
+      await _send_json(send, 400, {'error': 'since and timeout must be numbers'}, self._cors_headers(scope))
+      return
+    if since is None:
+      # No version yet: answer at once so the client learns the current one
+      version = self.feed.version
+    else:
+      version = await _until_disconnect(receive, self.feed.wait(since, timeout))
+      if version is None:
+        return
+    await _send_json(send, 200, {'version': version, 'changed': since is not None and version != since}, self._cors_headers(scope))
+
+  async def _stream(self, scope, receive, send):
+    await send({
+      'type': 'http.response.start',
+      'status': 200,
+      'headers': [
+        (b'content-type', b'text/event-stream'),
+        (b'cache-control', b'no-cache'),
+        (b'x-accel-buffering', b'no')
+      ] + self._cors_headers(scope)
+    })
+    version = self.feed.version
+    await send({'type': 'http.response.body', 'body': _event(version), 'more_body': True})
+    disconnected = asyncio.ensure_future(_disconnect(receive))
+    try:
+      while True:
+        current = await _until_disconnect(None, self.feed.wait(version, HEARTBEAT_SECONDS), disconnected)
+        if current is None:
+          return
+        if current != version:
+          version = current
+          await send({'type': 'http.response.body', 'body': _event(version), 'more_body': True})
+        else:
+          await send({'type': 'http.response.body', 'body': b': keep-alive\n\n', 'more_body': True})
+    finally:
+      disconnected.cancel()
+
+def _next_chunk(chunks):
+  """The next non-empty chunk of a WSGI response, or None at its end"""
+  for chunk in chunks:
+    if chunk:
+      return chunk
+  return None
+
+def _response_start(response):
+  return {'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']}
+
+def _event(version):
+  return f'event: change\ndata: {json.dumps({"version": version})}\n\n'.encode()
+
+async def _disconnect(receive):
+  while (await receive())['type'] != 'http.disconnect':
+    pass
+
+async def _until_disconnect(receive, awaitable, disconnected=None):
+  """The result of `awaitable`, or None if the client went away first"""
+  task = asyncio.ensure_future(awaitable)
+  watcher = disconnected if disconnected is not None else asyncio.ensure_future(_disconnect(receive))
+  try:
+    await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    if task.done():
+      return task.result()
+    task.cancel()
+    return None
+  finally:
+    if disconnected is None:
+      watcher.cancel()
+
+async def _send_json(send, status, payload, headers=()):
+  body = json.dumps(payload).encode()
+  await send({
+    'type': 'http.response.start',
+    'status': status,
+    'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())] + list(headers)
+  })
+  await send({'type': 'http.response.body', 'body': body})
+
+def _environ(scope, body):
+  """PEP 3333 environ for an ASGI HTTP scope"""
+  server = scope.get('server') or ('localhost', 80)
+  client = scope.get('client') or ('127.0.0.1', 0)
+  environ = {
+    'REQUEST_METHOD': scope['method'],
+    'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+    'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+    'QUERY_STRING': scope['query_string'].decode('latin-1'),
+    'SERVER_NAME': str(server[0]),
+    'SERVER_PORT': str(server[1]),
+    'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+    'REMOTE_ADDR': client[0],
+    'REMOTE_PORT': str(client[1]),
+    'wsgi.version': (1, 0),
+    'wsgi.url_scheme': scope.get('scheme', 'http'),
+    'wsgi.input': io.BufferedReader(body),
+    # Read to the end of the body rather than to a Content-Length,
+    # which chunked uploads do not have
+    'wsgi.input_terminated': True,
+    'wsgi.errors': sys.stderr,
+    'wsgi.multithread': True,
+    'wsgi.multiprocess': False,
+    'wsgi.run_once': False
+  }
+  for name, value in scope['headers']:
+    name = name.decode('latin-1').upper().replace('-', '_')
+    value = value.decode('latin-1')
+    if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+      key = name
+    else:
+      key = 'HTTP_' + name
+    environ[key] = f'{environ[key]},{value}' if key in environ else value
+  return environ
+
+async def request(app, method, path, body=b'', headers=(), chunk_delay=0.0):
+  """Send one request through an ASGI app in-process; returns (status, headers, body).
+
+  The ASGI counterpart of Flask's test client, for tests and benchmarks.
+  `chunk_delay` is how long the client takes to receive each body chunk, to
+  model a slow connection.
+  """
+  path, _, query = path.partition('?')
+  if not isinstance(body, bytes):
+    body = json.dumps(body).encode()
+    headers = list(headers) + [('content-type', 'application/json')]
+  scope = {
+    'type': 'http',
+    'asgi': {'version': '3.0'},
+    'http_version': '1.1',
+    'method': method,
+    'scheme': 'http',
+    'path': path,
+    'raw_path': path.encode(),
+    'query_string': query.encode(),
+    'root_path': '',
+    'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+      + [(b'content-length', str(len(body)).encode())],
+    'client': ('127.0.0.1', 0),
+    'server': ('localhost', 80)
+  }
+  messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+  done = asyncio.Event()
+  response = {'status': None, 'headers': [], 'body': []}
+
+  async def receive():
+    if messages:
+      return messages.pop(0)
+    await done.wait()
+    return {'type': 'http.disconnect'}
+
+  async def send(message):
+    if message['type'] == 'http.response.start':
+      response['status'] = message['status']
+      response['headers'] = [(name.decode('latin-1'), value.decode('latin-1')) for name, value in message['headers']]
+    elif message['type'] == 'http.response.body':
+      response['body'].append(message.get('body', b''))
+      if chunk_delay and message.get('body'):
+        await asyncio.sleep(chunk_delay)
+      if not message.get('more_body', False):
+        done.set()
+
+  await app(scope, receive, send)
+  done.set()
+  return response['status'], response['headers'], b''.join(response['body'])
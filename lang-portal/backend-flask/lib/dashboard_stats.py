@@ -0,0 +1,140 @@
+# A word counts as mastered once it has at least 5 reviews, 80% of them correct
+MASTERED = '(({c}) + ({w}) >= 5 AND ({c}) * 1.0 / (({c}) + ({w})) >= 0.8)'
+
+SNAPSHOT_COLUMNS = [
+  'total_vocabulary', 'total_words_studied', 'mastered_words', 'total_reviews',
+  'correct_reviews', 'total_sessions', 'streak_days', 'last_study_date'
+]
+
+# The queries /dashboard/stats used to run on every request; they are the
+# reference the snapshot in dashboard_stats is rebuilt and verified from.
+LIVE_QUERIES = {
+  'total_vocabulary': 'SELECT COUNT(*) FROM words',
+  'total_words_studied': '''
+    SELECT COUNT(DISTINCT word_id)
+    FROM word_review_items wri
+    JOIN study_sessions ss ON wri.study_session_id = ss.id
+  ''',
+  'mastered_words': '''
+    SELECT COUNT(*) FROM (
+      SELECT word_id
+      FROM word_review_items wri
+      JOIN study_sessions ss ON wri.study_session_id = ss.id
+      GROUP BY word_id
+      HAVING COUNT(*) >= 5 AND SUM(correct = 1) * 1.0 / COUNT(*) >= 0.8
+    )
+  ''',
+  'total_reviews': '''
+    SELECT COUNT(*)
+    FROM word_review_items wri
+    JOIN study_sessions ss ON wri.study_session_id = ss.id
+  ''',
+  'correct_reviews': '''
+    SELECT COALESCE(SUM(correct = 1), 0)
+    FROM word_review_items wri
+    JOIN study_sessions ss ON wri.study_session_id = ss.id
+  ''',
+  'total_sessions': 'SELECT COUNT(*) FROM study_sessions'
+}
+
+# Length and last day of the most recent run of consecutive study days
+LIVE_STREAK = '''
+  WITH days AS (
+    SELECT DISTINCT date(created_at) AS study_date FROM study_sessions
+  ),
+  runs AS (
+    SELECT study_date, julianday(study_date) - ROW_NUMBER() OVER (ORDER BY study_date) AS run
+    FROM days
+  )
+  SELECT COUNT(*), MAX(study_date)
+  FROM runs
+  WHERE run = (SELECT run FROM runs ORDER BY study_date DESC LIMIT 1)
+'''
+
+def read_stats(cursor):
+  """Return the /dashboard/stats payload from the snapshot row"""
+  # The stored run only counts while it reaches today or yesterday
+  cursor.execute('''
+    SELECT *, CASE WHEN last_study_date >= date('now', '-1 day') THEN streak_days ELSE 0 END AS current_streak
+    FROM dashboard_stats WHERE id = 1
+  ''')
+  row = cursor.fetchone()
+  # Groups studied in the last 30 days, an index range on groups.last_studied_at
+  cursor.execute("SELECT COUNT(*) FROM groups WHERE last_studied_at >= date('now', '-30 days')")
+  active_groups = cursor.fetchone()[0]
+  return {
+    "total_vocabulary": row["total_vocabulary"],
+    "total_words_studied": row["total_words_studied"],
+    "mastered_words": row["mastered_words"],
+    "success_rate": row["correct_reviews"] * 1.0 / row["total_reviews"] if row["total_reviews"] else 0,
+    "total_sessions": row["total_sessions"],
+    "active_groups": active_groups,
+    "current_streak": row["current_streak"]
+  }
+
+def apply_session(cursor, session_id):
+  """Count a newly created study session and extend the streak"""
+  cursor.execute('''
+    UPDATE dashboard_stats SET
+      total_sessions = total_sessions + 1,
+      streak_days = CASE
+        WHEN last_study_date IS NULL THEN 1
+        WHEN last_study_date >= ss.study_date THEN streak_days
+        WHEN last_study_date = date(ss.study_date, '-1 day') THEN streak_days + 1
+        ELSE 1
+      END,
+      last_study_date = MAX(COALESCE(last_study_date, ''), ss.study_date)
+    FROM (SELECT date(created_at) AS study_date FROM study_sessions WHERE id = ?) ss
+    WHERE dashboard_stats.id = 1
+  ''', (session_id,))
+  cursor.execute('''
+    UPDATE groups SET last_studied_at = ss.created_at
+    FROM (SELECT group_id, created_at FROM study_sessions WHERE id = ?) ss
+    WHERE groups.id = ss.group_id AND COALESCE(groups.last_studied_at, '') < ss.created_at
+  ''', (session_id,))
+
+def reset_stats(cursor):
+  """Zero the study history part of the snapshot after it was cleared"""
+  cursor.execute('''
+    UPDATE dashboard_stats SET
+      total_words_studied = 0, mastered_words = 0, total_reviews = 0, correct_reviews = 0,
+      total_sessions = 0, streak_days = 0, last_study_date = NULL
+    WHERE id = 1
+  ''')
+  cursor.execute('UPDATE groups SET last_studied_at = NULL WHERE last_studied_at IS NOT NULL')
+
+def live_stats(cursor):
+  """Compute the snapshot columns from the underlying tables"""
+  stats = {}
+  for column, sql in LIVE_QUERIES.items():
+    cursor.execute(sql)
+    stats[column] = cursor.fetchone()[0]
+  cursor.execute(LIVE_STREAK)
+  stats['streak_days'], stats['last_study_date'] = cursor.fetchone()
+  return stats
+
+def verify_stats(cursor):
+  """Return {column: (snapshot, live)} for every column that has drifted"""
+  cursor.execute(f"SELECT {', '.join(SNAPSHOT_COLUMNS)} FROM dashboard_stats WHERE id = 1")
+  row = cursor.fetchone()
+  snapshot = dict(zip(SNAPSHOT_COLUMNS, row)) if row else {}
+  live = live_stats(cursor)
+  return {
+    column: (snapshot.get(column), live[column])
+    for column in SNAPSHOT_COLUMNS
+    if snapshot.get(column) != live[column]
+  }
+
+def rebuild_stats(cursor):
+  """Overwrite the snapshot with freshly computed values (backfill / repair)"""
+  live = live_stats(cursor)
+  cursor.execute(f'''
+    INSERT OR REPLACE INTO dashboard_stats (id, {', '.join(SNAPSHOT_COLUMNS)})
+    VALUES (1, {', '.join('?' for _ in SNAPSHOT_COLUMNS)})
+  ''', [live[column] for column in SNAPSHOT_COLUMNS])
+  cursor.execute('''
+    UPDATE groups SET last_studied_at = (
+      SELECT MAX(created_at) FROM study_sessions WHERE group_id = groups.id
+    )
+  ''')
+  return live
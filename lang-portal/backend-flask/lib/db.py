@@ -1,17 +1,54 @@
 import sqlite3
 import json
-from flask import g
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from flask import g, has_app_context
 from pathlib import Path
 
+from lib.jsonstream import batched, iter_json_array
+from lib.migrations import MigrationRunner
+from lib.pool import ConnectionPool
+from lib.profiles import DEFAULT_PROFILE, apply_profile, get_profile
+
+# Table setup scripts in sql/setup, in creation order
+SETUP_TABLES = [
+  'setup/create_table_words.sql',
+  'setup/create_table_word_reviews.sql',
+  'setup/create_table_word_review_items.sql',
+  'setup/create_table_groups.sql',
+  'setup/create_table_word_groups.sql',
+  'setup/create_table_study_activities.sql',
+  'setup/create_table_study_sessions.sql'
+]
+
+# Words inserted per executemany call when importing JSON decks
+IMPORT_BATCH_SIZE = 5000
+
 class Db:
-  def __init__(self, database='words.db'):
+  def __init__(self, database='words.db', pool_size=5, pool_timeout=10.0, health_check_interval=30.0, profile=DEFAULT_PROFILE):
     self.database = database
     self.connection = None
+    self.metrics = None  # lib.metrics.Metrics timing this process's request queries, if any
+    get_profile(profile)  # Fail fast on a misspelled profile name
+    self.profile = profile
+    self.pool = ConnectionPool(
+      database,
+      size=pool_size,
+      timeout=pool_timeout,
+      health_check_interval=health_check_interval,
+      on_connect=self.configure
+    )
+
+  def configure(self, conn):
+    # Apply the storage profile's pragmas to a freshly opened connection
+    apply_profile(conn, self.profile)
 
   def get(self):
+    # Borrow a warm connection from the pool for the lifetime of the request
     if 'db' not in g:
-      g.db = sqlite3.connect(self.database)
-      g.db.row_factory = sqlite3.Row  # Return rows as dictionaries
+      g.db = self.pool.acquire()
     return g.db
 
   def commit(self):
@@ -20,12 +57,39 @@ class Db:
   def cursor(self):
     # Ensure the connection is valid before getting a cursor
     connection = self.get()
+    if self.metrics is not None:
+      return self.metrics.cursor(connection)
     return connection.cursor()
 
   def close(self):
+    # Hand the request's connection back to the pool instead of closing it
     db = g.pop('db', None)
     if db is not None:
-      db.close()
+      self.pool.release(db)
+
+  @contextmanager
+  def borrow(self):
+    # A pooled connection that is not tied to the request, for work that
+    # outlives the view function such as streaming a response
+    conn = self.pool.acquire()
+    try:
+      yield conn
+    finally:
+      self.pool.release(conn)
+
+  def migrate(self, dry_run=False):
+    """Apply pending migrations from sql/migrations and return them"""
+    if has_app_context():
+      return MigrationRunner(self.get()).migrate(dry_run=dry_run)
+    conn = self.pool.acquire()
+    try:
+      return MigrationRunner(conn).migrate(dry_run=dry_run)
+    finally:
+      self.pool.release(conn)
+
+  def shutdown(self):
+    """Close every pooled connection, e.g. when the process exits"""
+    self.pool.close()
 
   # Function to load SQL from a file
   def sql(self, filepath):
@@ -38,103 +102,171 @@ class Db:
       return json.load(file)
 
   def setup_tables(self,cursor):
-    # Create the necessary tables
-    cursor.execute(self.sql('setup/create_table_words.sql'))
+    # Create the necessary tables in one transaction; sqlite3 would
+    # otherwise commit each CREATE TABLE on its own
+    cursor.execute('BEGIN')
+    for filepath in SETUP_TABLES:
+      cursor.execute(self.sql(filepath))
     self.get().commit()
 
-    cursor.execute(self.sql('setup/create_table_word_reviews.sql'))
-    self.get().commit()
+  def import_study_activities_json(self,cursor,data_json_path,commit=True):
+    study_actvities = self.load_json(data_json_path)
+    cursor.executemany('''
+    INSERT INTO study_activities (name,url,preview_url) VALUES (?,?,?)
+    ''', [(activity['name'],activity['url'],activity['preview_url']) for activity in study_actvities])
+    if commit:
+      self.get().commit()
 
-    cursor.execute(self.sql('setup/create_table_word_review_items.sql'))
-    self.get().commit()
+  def import_word_json(self,cursor,group_name,data_json_path,batch_size=IMPORT_BATCH_SIZE,commit=True):
+      start = time.perf_counter()
 
-    cursor.execute(self.sql('setup/create_table_groups.sql'))
-    self.get().commit()
+      # Insert a new group
+      cursor.execute('''
+        INSERT INTO groups (name) VALUES (?)
+      ''', (group_name,))
+      group_id = cursor.lastrowid
 
-    cursor.execute(self.sql('setup/create_table_word_groups.sql'))
-    self.get().commit()
+      # Stream the words from the JSON file and insert them batch by batch,
+      # all inside a single transaction
+      total = 0
+      with open(data_json_path, 'r') as file:
+        for words in batched(iter_json_array(file), batch_size):
+          self.insert_words(cursor, group_id, words)
+          total += len(words)
 
-    cursor.execute(self.sql('setup/create_table_study_activities.sql'))
-    self.get().commit()
+      # groups.words_count follows word_groups through triggers, so the
+      # import is complete once it commits
+      if commit:
+        self.get().commit()
 
-    cursor.execute(self.sql('setup/create_table_study_sessions.sql'))
-    self.get().commit()
+      elapsed = time.perf_counter() - start
+      rows_per_second = total / elapsed if elapsed > 0 else 0
+      print(f"Successfully added {total} words to the '{group_name}' group in {elapsed:.2f}s ({rows_per_second:,.0f} rows/s).")
+      return {
+        'group_id': group_id,
+        'words': total,
+        'seconds': elapsed,
+        'rows_per_second': rows_per_second
+      }
 
-  def import_study_activities_json(self,cursor,data_json_path):
-    study_actvities = self.load_json(data_json_path)
-    for activity in study_actvities:
-      cursor.execute('''
-      INSERT INTO study_activities (name,url,preview_url) VALUES (?,?,?)
-      ''', (activity['name'],activity['url'],activity['preview_url'],))
-    self.get().commit()
+  def insert_words(self,cursor,group_id,words):
+      # AUTOINCREMENT hands out ids one above the highest id ever used, and we
+      # hold the write lock, so an executemany batch gets a contiguous id range.
+      cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'words'")
+      row = cursor.fetchone()
+      last_id = row[0] if row else 0
 
-  def import_word_json(self,cursor,group_name,data_json_path):
-      # Insert a new group
-      cursor.execute('''
-        INSERT INTO groups (name) VALUES (?)
-      ''', (group_name,))
-      self.get().commit()
+      cursor.executemany('''
+        INSERT INTO words (kanji, romaji, english, parts) VALUES (?, ?, ?, ?)
+      ''', [(word['kanji'], word['romaji'], word['english'], json.dumps(word['parts'])) for word in words])
 
-      # Get the ID of the group
-      cursor.execute('SELECT id FROM groups WHERE name = ?', (group_name,))
-      core_verbs_group_id = cursor.fetchone()[0]
+      cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'words'")
+      first_id = cursor.fetchone()[0] - len(words) + 1
+      if first_id != last_id + 1:
+        raise RuntimeError('word ids were not allocated contiguously')
 
-      # Insert some sample words (verbs) from JSON file and associate with the group
-      words = self.load_json(data_json_path)
+      # Associate every inserted word with the group
+      cursor.executemany('''
+        INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)
+      ''', [(first_id + i, group_id) for i in range(len(words))])
+      return first_id
 
-      for word in words:
-        # Insert the word into the words table
-        cursor.execute('''
-          INSERT INTO words (kanji, romaji, english, parts) VALUES (?, ?, ?, ?)
-        ''', (word['kanji'], word['romaji'], word['english'], json.dumps(word['parts'])))
-        
-        # Get the last inserted word's ID
-        word_id = cursor.lastrowid
+  def upsert_words(self,cursor,group_id,words):
+      """Add words to a group, updating the words that already exist.
 
-        # Insert the word-group relationship into word_groups table
-        cursor.execute('''
-          INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)
-        ''', (word_id, core_verbs_group_id))
-      self.get().commit()
+      A word is identified by its (kanji, romaji) pair; existing words get the
+      new english and parts and are linked to the group if they were not yet.
+      Returns how many words were inserted, updated and newly linked. Run it
+      under the write lock (lib.write_queue.run_write): a lookup in a deferred
+      transaction lets two imports both insert a word neither found.
+      """
+      # The last occurrence wins when a batch repeats a word
+      unique = list({(word['kanji'], word['romaji']): word for word in words}.values())
 
-      # Update the words_count in the groups table by counting all words in the group
+      # Look up every word of the batch in one query
       cursor.execute('''
-        UPDATE groups
-        SET words_count = (
-          SELECT COUNT(*) FROM word_groups WHERE group_id = ?
-        )
-        WHERE id = ?
-      ''', (core_verbs_group_id, core_verbs_group_id))
+        SELECT (
+          SELECT MIN(w.id) FROM words w
+          WHERE w.kanji = json_extract(b.value, '$[0]') AND w.romaji = json_extract(b.value, '$[1]')
+        ) AS id
+        FROM json_each(?) b
+        ORDER BY b.key
+      ''', (json.dumps([[word['kanji'], word['romaji']] for word in unique]),))
+      ids = [row[0] for row in cursor.fetchall()]
 
-      self.get().commit()
+      existing = [(word_id, word) for word_id, word in zip(ids, unique) if word_id is not None]
+      new = [word for word_id, word in zip(ids, unique) if word_id is None]
+
+      cursor.executemany('''
+        UPDATE words SET english = ?, parts = ?
+        WHERE id = ? AND (english IS NOT ? OR parts IS NOT ?)
+      ''', [
+        (word['english'], parts, word_id, word['english'], parts)
+        for word_id, word, parts in ((word_id, word, json.dumps(word['parts'])) for word_id, word in existing)
+      ])
+      updated = max(cursor.rowcount, 0)
 
-      print(f"Successfully added {len(words)} verbs to the '{group_name}' group.")
+      cursor.executemany('''
+        INSERT INTO word_groups (word_id, group_id)
+        SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM word_groups WHERE word_id = ? AND group_id = ?)
+      ''', [(word_id, group_id, word_id, group_id) for word_id, _ in existing])
+      linked = max(cursor.rowcount, 0)
+
+      if new:
+        self.insert_words(cursor, group_id, new)
+      return {'inserted': len(new), 'updated': updated, 'linked': linked + len(new)}
 
   def exists(self):
     """Check if database file exists and has tables"""
     if not Path(self.database).exists():
       return False
-    
+
     try:
-      # Create a direct connection just for checking
-      conn = sqlite3.connect(self.database)
-      cursor = conn.cursor()
-      
-      # Check if at least one of our tables exists
-      cursor.execute("""
-          SELECT name FROM sqlite_master 
-          WHERE type='table' AND name='words'
-      """)
-      result = cursor.fetchone() is not None
-      
-      # Clean up
-      cursor.close()
-      conn.close()
-      
-      return result
+      # Check on a pooled connection, which then stays warm for the app
+      with self.borrow() as conn:
+        # Check if at least one of our tables exists
+        return conn.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type='table' AND name='words'
+        """).fetchone() is not None
     except sqlite3.Error:
       return False
 
+  def copy_template(self, template):
+    """Create the database as a copy of a template built by `invoke build-template`.
+
+    A missing database file is written next to its final path and renamed
+    into place, so a crash never leaves a half-copied database behind. A file
+    that exists without our tables (pooled connections may already be open on
+    it) is overwritten through SQLite's backup API instead, which the open
+    connections see like any other commit. Migrations added since the
+    template was built still have to be applied with migrate().
+    """
+    if not Path(self.database).exists():
+      # A journal left over from an earlier database must not be applied to the copy
+      for suffix in ('-wal', '-shm', '-journal'):
+        Path(self.database + suffix).unlink(missing_ok=True)
+      partial = f'{self.database}.partial'
+      shutil.copyfile(template, partial)
+      os.replace(partial, self.database)
+      return
+
+    source = sqlite3.connect(f'file:{Path(template).resolve()}?mode=ro', uri=True)
+    try:
+      with self.borrow() as conn:
+        source.backup(conn)
+    finally:
+      source.close()
+
+  def build_template(self, app, template):
+    """Initialize, seed and migrate this database, then write a compact copy to `template`"""
+    self.init(app)
+    self.migrate()
+    if Path(template).exists():
+      os.remove(template)
+    with self.borrow() as conn:
+      conn.execute('VACUUM INTO ?', (template,))
+
   # Initialize the database with sample data
   def init(self, app):
     with app.app_context():
@@ -143,22 +275,32 @@ class Db:
         return
         
       print(f"Initializing database {self.database}...")
-      cursor = self.cursor()
-      self.setup_tables(cursor)
-      self.import_word_json(
-        cursor=cursor,
-        group_name='Core Verbs',
-        data_json_path='seed/data_verbs.json'
-      )
-      self.import_word_json(
-        cursor=cursor,
-        group_name='Core Adjectives',
-        data_json_path='seed/data_adjectives.json'
-      )
-      self.import_study_activities_json(
-        cursor=cursor,
-        data_json_path='seed/study_activities.json'
-      )
+      try:
+        cursor = self.cursor()
+        self.setup_tables(cursor)
+        self.migrate()
+        # All seed data in one transaction
+        self.import_word_json(
+          cursor=cursor,
+          group_name='Core Verbs',
+          data_json_path='seed/data_verbs.json',
+          commit=False
+        )
+        self.import_word_json(
+          cursor=cursor,
+          group_name='Core Adjectives',
+          data_json_path='seed/data_adjectives.json',
+          commit=False
+        )
+        self.import_study_activities_json(
+          cursor=cursor,
+          data_json_path='seed/study_activities.json',
+          commit=False
+        )
+        self.commit()
+      finally:
+        # No teardown hook may be registered yet, so release explicitly
+        self.close()
 
 # Create an instance of the Db class
 db = Db()
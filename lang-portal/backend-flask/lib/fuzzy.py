@@ -0,0 +1,97 @@
+import json
+
+# Similarity (shared trigrams / all trigrams of both) a word needs to be a candidate
+DEFAULT_THRESHOLD = 0.3
+
+# Candidates fetched from the trigram index per result requested; they are
+# re-ranked by edit distance, which the index cannot compute.
+CANDIDATES_PER_RESULT = 5
+
+def trigrams(text):
+  """Distinct trigrams of `text`, padded the way sql/migrations/0007 pads romaji"""
+  padded = '  ' + text.lower() + ' '
+  return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def levenshtein(a, b):
+  """Edit distance between two strings (insertions, deletions, substitutions)"""
+  if len(a) < len(b):
+    a, b = b, a
+  previous = list(range(len(b) + 1))
+  for i, char_a in enumerate(a, 1):
+    current = [i]
+    for j, char_b in enumerate(b, 1):
+      current.append(min(
+        previous[j] + 1,
+        current[j - 1] + 1,
+        previous[j - 1] + (char_a != char_b)
+      ))
+    previous = current
+  return previous[-1]
+
+def parts_romaji(parts):
+  """The syllables in a word's `parts` JSON joined into one string"""
+  try:
+    return ''.join(''.join(part.get('romaji', [])) for part in json.loads(parts))
+  except (ValueError, TypeError, AttributeError):
+    return ''
+
+def fuzzy_search(cursor, query, threshold=DEFAULT_THRESHOLD, limit=20):
+  """Words whose romaji is similar to `query`, closest edit distance first.
+
+  Candidates come from the trigram index: words sharing enough trigrams with
+  the query that their similarity reaches `threshold`. Only those are read
+  and ranked by Levenshtein distance to the romaji or the joined parts.
+  """
+  query = query.strip().lower()
+  query_trigrams = trigrams(query)
+  cursor.execute('''
+    SELECT w.id, w.kanji, w.romaji, w.english, w.parts, c.similarity
+    FROM (
+      SELECT
+        t.word_id,
+        COUNT(*) * 1.0 / (? + n.trigram_count - COUNT(*)) AS similarity
+      FROM word_trigrams t
+      JOIN word_trigram_counts n ON n.word_id = t.word_id
+      WHERE t.trigram IN (SELECT value FROM json_each(?))
+      GROUP BY t.word_id
+      HAVING similarity >= ?
+      ORDER BY similarity DESC, t.word_id
+      LIMIT ?
+    ) c
+    JOIN words w ON w.id = c.word_id
+  ''', (len(query_trigrams), json.dumps(sorted(query_trigrams)), threshold, limit * CANDIDATES_PER_RESULT))
+
+  results = []
+  for row in cursor.fetchall():
+    forms = {row['romaji'].lower(), parts_romaji(row['parts']).lower()} - {''}
+    results.append({
+      "id": row['id'],
+      "kanji": row['kanji'],
+      "romaji": row['romaji'],
+      "english": row['english'],
+      "distance": min(levenshtein(query, form) for form in forms),
+      "similarity": round(row['similarity'], 4)
+    })
+  results.sort(key=lambda word: (word['distance'], -word['similarity'], word['id']))
+  return results[:limit]
+
+def rebuild_trigrams(cursor):
+  """Re-index every word (one-time backfill / repair); returns the number of words"""
+  cursor.execute('DELETE FROM word_trigrams')
+  cursor.execute('DELETE FROM word_trigram_counts')
+  forms = '''
+    FROM (
+      SELECT id AS word_id, '  ' || lower(romaji) || ' ' AS form FROM words
+      UNION
+      SELECT w.id, '  ' || lower(group_concat(r.value, '')) || ' '
+      FROM words w, json_each(CASE WHEN json_valid(w.parts) THEN w.parts ELSE '[]' END) part, json_each(part.value, '$.romaji') r
+      GROUP BY w.id
+    ) f
+    JOIN trigram_positions p ON p.n <= length(f.form) - 2
+  '''
+  cursor.execute('INSERT INTO word_trigrams (trigram, word_id) SELECT DISTINCT substr(f.form, p.n, 3), f.word_id' + forms)
+  cursor.execute('''
+    INSERT INTO word_trigram_counts (word_id, trigram_count)
+    SELECT word_id, COUNT(*) FROM word_trigrams GROUP BY word_id
+  ''')
+  return cursor.rowcount
@@ -0,0 +1,21 @@
+def words_count_drift(cursor):
+  """Return (group_id, words_count, actual) for every group whose counter cache is wrong"""
+  cursor.execute('''
+    SELECT g.id, g.words_count, COALESCE(c.actual, 0) AS actual
+    FROM groups g
+    LEFT JOIN (
+      SELECT group_id, COUNT(*) AS actual FROM word_groups GROUP BY group_id
+    ) c ON c.group_id = g.id
+    WHERE g.words_count IS NOT COALESCE(c.actual, 0)
+    ORDER BY g.id
+  ''')
+  return [tuple(row) for row in cursor.fetchall()]
+
+def repair_words_count(cursor):
+  """Recount the groups whose counter cache drifted; returns how many were fixed"""
+  drift = words_count_drift(cursor)
+  cursor.executemany(
+    'UPDATE groups SET words_count = ? WHERE id = ?',
+    [(actual, group_id) for group_id, _, actual in drift]
+  )
+  return len(drift)
@@ -0,0 +1,80 @@
+import json
+from itertools import islice
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+
+def iter_json_array(fp, chunk_size=CHUNK_SIZE):
+  """Yield the elements of a top-level JSON array without loading the whole document.
+
+  `fp` is a text file object; it is read `chunk_size` characters at a time and
+  only the element being decoded is kept in memory.
+  """
+  decoder = json.JSONDecoder()
+  buffer = ''
+  pos = 0
+  eof = False
+  started = False
+  expect_value = True
+  count = 0
+
+  while True:
+    while pos < len(buffer) and buffer[pos] in WHITESPACE:
+      pos += 1
+    if pos == len(buffer):
+      if eof:
+        raise ValueError('unexpected end of JSON array')
+      chunk = fp.read(chunk_size)
+      eof = not chunk
+      buffer, pos = buffer[pos:] + chunk, 0
+      continue
+
+    char = buffer[pos]
+    if not started:
+      if char != '[':
+        raise ValueError('expected a JSON array')
+      started = True
+      pos += 1
+    elif char == ']' and (count == 0 or not expect_value):
+      return
+    elif expect_value:
+      try:
+        value, end = decoder.raw_decode(buffer, pos)
+      except json.JSONDecodeError:
+        if eof:
+          raise
+        value, end = None, len(buffer)
+      # A value that runs to the end of the buffer may continue in the next chunk
+      if end == len(buffer) and not eof:
+        chunk = fp.read(chunk_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+        continue
+      yield value
+      count += 1
+      pos = end
+      expect_value = False
+    elif char == ',':
+      expect_value = True
+      pos += 1
+    else:
+      raise ValueError(f"expected ',' or ']' after array element {count}")
+
+def iter_ndjson(fp):
+  """Yield the JSON value on each non-blank line of a newline-delimited JSON stream"""
+  for number, line in enumerate(fp, 1):
+    if not line.strip():
+      continue
+    try:
+      yield json.loads(line)
+    except json.JSONDecodeError as e:
+      raise ValueError(f'line {number}: {e.msg}') from e
+
+def batched(iterable, size):
+  """Yield lists of up to `size` items"""
+  iterator = iter(iterable)
+  while True:
+    batch = list(islice(iterator, size))
+    if not batch:
+      return
+    yield batch
@@ -0,0 +1,219 @@
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from flask import g, request
+
+# Histogram bucket upper bounds
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+class Histogram:
+  """Cumulative-bucket histogram for one set of label values"""
+
+  def __init__(self, buckets):
+    self.buckets = buckets
+    self.counts = [0] * (len(buckets) + 1)
+    self.sum = 0.0
+
+  def observe(self, value):
+    self.counts[bisect_left(self.buckets, value)] += 1
+    self.sum += value
+
+class QueryTimings:
+  """SQL statements run while serving one request"""
+  __slots__ = ('durations', 'statements', 'rows')
+
+  def __init__(self):
+    self.durations = []
+    # (sql, parameters) of each duration, for the slow-query log
+    self.statements = []
+    self.rows = 0
+
+  @property
+  def seconds(self):
+    return sum(self.durations)
+
+class TimedCursor(sqlite3.Cursor):
+  """Cursor that adds the time spent executing and fetching to `timings`.
+
+  SQLite produces rows while they are fetched, so the fetch calls are timed
+  too and belong to the statement that was executed last.
+  """
+  timings = None
+
+  def execute(self, sql, parameters=()):
+    start = time.perf_counter()
+    try:
+      return super().execute(sql, parameters)
+    finally:
+      self.timings.durations.append(time.perf_counter() - start)
+      self.timings.statements.append((sql, parameters))
+      if self.rowcount > 0:
+        self.timings.rows += self.rowcount
+
+  def executemany(self, sql, seq_of_parameters):
+    start = time.perf_counter()
+    try:
+      return super().executemany(sql, seq_of_parameters)
+    finally:
+      self.timings.durations.append(time.perf_counter() - start)
+      self.timings.statements.append((sql, None))
+      if self.rowcount > 0:
+        self.timings.rows += self.rowcount
+
+  def _fetched(self, start, rows):
+    if self.timings.durations:
+      self.timings.durations[-1] += time.perf_counter() - start
+    self.timings.rows += rows
+
+  def fetchone(self):
+    start = time.perf_counter()
+    row = super().fetchone()
+    self._fetched(start, row is not None)
+    return row
+
+  def fetchmany(self, size=None):
+    start = time.perf_counter()
+    rows = super().fetchmany(self.arraysize if size is None else size)
+    self._fetched(start, len(rows))
+    return rows
+
+  def fetchall(self):
+    start = time.perf_counter()
+    rows = super().fetchall()
+    self._fetched(start, len(rows))
+    return rows
+
+class Metrics:
+  """Per-route request latency and SQL timings of one process.
+
+  Request cursors handed out by Db.cursor() are TimedCursors while a Metrics
+  is installed; after each request the statements it ran are added to the
+  histograms. `render()` returns them in the Prometheus text format, and
+  every response gets a Server-Timing header with its database and total time.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._requests = {}
+    self._queries = {}
+    self._queries_per_request = {}
+    self._rows = {}
+    self._sources = []
+    self.slow_log = None  # lib.slow_log.SlowQueryLog for statements over its threshold
+    self.db = None
+
+  def init_app(self, app):
+    app.metrics = self
+    self.db = app.db
+    app.db.metrics = self
+    app.before_request(self._before_request)
+    app.after_request(self._after_request)
+
+  def add_source(self, name, stats):
+    """Export the numbers `stats()` returns as `<name>_<key>` gauges"""
+    self._sources.append((name, stats))
+
+  def request_timings(self):
+    timings = g.get('query_timings')
+    if timings is None:
+      timings = g.query_timings = QueryTimings()
+    return timings
+
+  def cursor(self, connection):
+    cursor = connection.cursor(TimedCursor)
+    cursor.timings = self.request_timings()
+    return cursor
+
+  def _before_request(self):
+    g.request_start = time.perf_counter()
+
+  def _after_request(self, response):
+    start = g.pop('request_start', None)
+    if start is None:
+      return response
+    elapsed = time.perf_counter() - start
+    timings = g.pop('query_timings', None) or QueryTimings()
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    self.observe(request.method, route, response.status_code, elapsed, timings)
+    if self.slow_log is not None:
+      slow = [
+        (sql, parameters, seconds)
+        for (sql, parameters), seconds in zip(timings.statements, timings.durations)
+        if seconds >= self.slow_log.threshold
+      ]
+      if slow:
+        self._log_slow(route, slow)
+
+    db_ms = timings.seconds * 1000
+    response.headers.add(
+      'Server-Timing',
+      f'db;dur={db_ms:.2f};desc="{len(timings.durations)} queries, {timings.rows} rows", total;dur={elapsed * 1000:.2f}'
+    )
+    return response
+
+  def _log_slow(self, route, slow):
+    # The connections that ran the statements may be back in the pool by
+    # now (views can release theirs early), so EXPLAIN on the request's own
+    # connection while it still holds one, or else on a borrowed one
+    conn = g.get('db')
+    if conn is not None:
+      for sql, parameters, seconds in slow:
+        self.slow_log.record(conn, route, sql, parameters, seconds)
+      return
+    with self.db.borrow() as conn:
+      for sql, parameters, seconds in slow:
+        self.slow_log.record(conn, route, sql, parameters, seconds)
+
+  def observe(self, method, route, status, seconds, timings):
+    with self._lock:
+      _histogram(self._requests, (method, route, str(status)), REQUEST_BUCKETS).observe(seconds)
+      _histogram(self._queries_per_request, (route,), COUNT_BUCKETS).observe(len(timings.durations))
+      queries = _histogram(self._queries, (route,), QUERY_BUCKETS)
+      for duration in timings.durations:
+        queries.observe(duration)
+      self._rows[(route,)] = self._rows.get((route,), 0) + timings.rows
+
+  def render(self):
+    """All metrics in the Prometheus text exposition format"""
+    with self._lock:
+      lines = []
+      _render_histogram(lines, 'http_request_duration_seconds', 'Request latency by route', ('method', 'route', 'status'), self._requests)
+      _render_histogram(lines, 'db_query_duration_seconds', 'SQL statement execution and fetch time by route', ('route',), self._queries)
+      _render_histogram(lines, 'db_queries_per_request', 'SQL statements per request by route', ('route',), self._queries_per_request)
+      lines.append('# HELP db_rows_total Rows fetched or changed by route')
+      lines.append('# TYPE db_rows_total counter')
+      for labels, rows in sorted(self._rows.items()):
+        lines.append(f'db_rows_total{_labels(("route",), labels)} {rows}')
+    for name, stats in self._sources:
+      for key, value in stats().items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+          lines.append(f'# TYPE {name}_{key} gauge')
+          lines.append(f'{name}_{key} {value}')
+    return '\n'.join(lines) + '\n'
+
+def _histogram(histograms, labels, buckets):
+  histogram = histograms.get(labels)
+  if histogram is None:
+    histogram = histograms[labels] = Histogram(buckets)
+  return histogram
+
+def _labels(names, values):
+  pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+  return '{' + pairs + '}'
+
+def _escape(value):
+  return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _render_histogram(lines, name, help_text, label_names, histograms):
+  lines.append(f'# HELP {name} {help_text}')
+  lines.append(f'# TYPE {name} histogram')
+  for labels, histogram in sorted(histograms.items()):
+    cumulative = 0
+    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+      cumulative += count
+      lines.append(f'{name}_bucket{_labels(label_names + ("le",), labels + (bound,))} {cumulative}')
+    lines.append(f'{name}_sum{_labels(label_names, labels)} {histogram.sum}')
+    lines.append(f'{name}_count{_labels(label_names, labels)} {cumulative}')
@@ -0,0 +1,137 @@
+import hashlib
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+# The base schema is created from sql/setup by Db.init; files in
+# sql/migrations named <version>_<name>.sql evolve it from there.
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / 'sql' / 'migrations'
+
+MIGRATION_FILE_RE = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+class MigrationError(Exception):
+  pass
+
+class Migration:
+  def __init__(self, version, name, path):
+    self.version = version
+    self.name = name
+    self.path = path
+    self.sql = path.read_text(encoding='utf-8')
+    self.checksum = hashlib.sha256(self.sql.encode('utf-8')).hexdigest()
+
+  @property
+  def filename(self):
+    return self.path.name
+
+  def statements(self):
+    """Split the script into statements, keeping trigger bodies intact"""
+    statements = []
+    pending = ''
+    for line in self.sql.splitlines(keepends=True):
+      pending += line
+      if sqlite3.complete_statement(pending):
+        statements.append(pending.strip())
+        pending = ''
+    leftover = '\n'.join(l for l in pending.splitlines() if not l.strip().startswith('--')).strip()
+    if leftover:
+      raise MigrationError(f'{self.filename}: incomplete SQL statement at end of file')
+    return statements
+
+def discover(directory=MIGRATIONS_DIR):
+  """Return the migrations in `directory` ordered by version"""
+  migrations = {}
+  for path in sorted(Path(directory).glob('*.sql')):
+    match = MIGRATION_FILE_RE.match(path.name)
+    if not match:
+      raise MigrationError(f'{path.name}: migration files must be named <version>_<name>.sql')
+    version = int(match.group(1))
+    if version in migrations:
+      raise MigrationError(f'{path.name}: version {version} is already used by {migrations[version].filename}')
+    migrations[version] = Migration(version, match.group(2), path)
+  return [migrations[version] for version in sorted(migrations)]
+
+class MigrationRunner:
+  """Applies pending migrations, one transaction each, and records them in schema_migrations"""
+
+  def __init__(self, conn, directory=MIGRATIONS_DIR):
+    self.conn = conn
+    self.directory = directory
+
+  def ensure_table(self):
+    self.conn.execute('''
+      CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        checksum TEXT NOT NULL,
+        applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        duration_ms REAL
+      )
+    ''')
+    self.conn.commit()
+
+  def applied(self):
+    exists = self.conn.execute(
+      "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'"
+    ).fetchone()
+    if not exists:
+      return {}
+    rows = self.conn.execute('SELECT version, name, checksum FROM schema_migrations').fetchall()
+    return {row[0]: {'name': row[1], 'checksum': row[2]} for row in rows}
+
+  def pending(self):
+    """Return migrations not yet applied, after verifying the applied ones are unchanged"""
+    applied = self.applied()
+    pending = []
+    for migration in discover(self.directory):
+      record = applied.get(migration.version)
+      if record is None:
+        pending.append(migration)
+      elif record['checksum'] != migration.checksum:
+        raise MigrationError(
+          f'{migration.filename} was modified after it was applied '
+          f'(recorded checksum {record["checksum"][:12]}, file checksum {migration.checksum[:12]})'
+        )
+    return pending
+
+  def apply(self, migration):
+    """Apply one migration; returns False if another connection applied it first"""
+    start = time.perf_counter()
+    isolation_level = self.conn.isolation_level
+    self.conn.isolation_level = None  # Manage the transaction explicitly
+    try:
+      self.conn.execute('BEGIN IMMEDIATE')
+      try:
+        # pending() ran before the write lock was taken; another process
+        # starting at the same time may have applied this one since
+        if self.conn.execute('SELECT 1 FROM schema_migrations WHERE version = ?', (migration.version,)).fetchone():
+          self.conn.execute('ROLLBACK')
+          return False
+        for statement in migration.statements():
+          self.conn.execute(statement)
+        self.conn.execute(
+          'INSERT INTO schema_migrations (version, name, checksum, duration_ms) VALUES (?, ?, ?, ?)',
+          (migration.version, migration.name, migration.checksum, (time.perf_counter() - start) * 1000)
+        )
+        self.conn.execute('COMMIT')
+        return True
+      except BaseException as e:
+        if self.conn.in_transaction:
+          self.conn.execute('ROLLBACK')
+        if isinstance(e, sqlite3.Error):
+          raise MigrationError(f'{migration.filename} failed and was rolled back: {e}') from e
+        raise
+    finally:
+      self.conn.isolation_level = isolation_level
+
+  def migrate(self, dry_run=False):
+    """Apply pending migrations in order and return the ones this call applied.
+
+    With dry_run only report what would run.
+    """
+    pending = self.pending()
+    if dry_run:
+      return pending
+    self.ensure_table()
+    return [migration for migration in pending if self.apply(migration)]
@@ -0,0 +1,32 @@
+import base64
+import json
+
+class CursorError(ValueError):
+  pass
+
+def encode_cursor(sort_by, order, key):
+  """Encode the (sort value, id) key of the last row on a page as an opaque token"""
+  payload = json.dumps([sort_by, order, list(key)], ensure_ascii=False, separators=(',', ':'))
+  return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token, sort_by, order):
+  """Return the key stored in a cursor, checking it was issued for the same sort"""
+  try:
+    padded = token + '=' * (-len(token) % 4)
+    cursor_sort_by, cursor_order, key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+  except (ValueError, TypeError, UnicodeError):
+    raise CursorError('Invalid cursor')
+  if cursor_sort_by != sort_by or cursor_order != order:
+    raise CursorError('Cursor was issued for a different sort order')
+  if not isinstance(key, list) or len(key) != 2:
+    raise CursorError('Invalid cursor')
+  return key
+
+def keyset_condition(sort_column, id_column, order):
+  """SQL condition selecting rows after a (sort value, id) key in the given order"""
+  operator = '>' if order == 'asc' else '<'
+  return f'({sort_column}, {id_column}) {operator} (?, ?)'
+
+def wants_total(args):
+  """Whether a keyset request asked for the (more expensive) total count"""
+  return args.get('include_total', 'false').lower() in ('1', 'true', 'yes')
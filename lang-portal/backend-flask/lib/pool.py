@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import threading
+import time
+from queue import LifoQueue, Empty
+
+class PoolError(Exception):
+  pass
+
+class PoolTimeout(PoolError):
+  pass
+
+class ConnectionPool:
+  """A bounded pool of long-lived SQLite connections shared by request threads.
+
+  Connections are opened lazily, handed out most-recently-used first (so the
+  warmest page cache gets reused) and health checked when they have been idle
+  for longer than `health_check_interval` seconds.
+  """
+
+  def __init__(self, database, size=5, timeout=10.0, health_check_interval=30.0, on_connect=None):
+    if size < 1:
+      raise ValueError('pool size must be at least 1')
+    self.database = database
+    self.size = size
+    self.timeout = timeout
+    self.health_check_interval = health_check_interval
+    self.on_connect = on_connect
+    self._closed = False
+    self._reset()
+
+  def _reset(self):
+    # Connections inherited across a fork must never be used by the child,
+    # so a new process simply starts over with an empty pool.
+    self._pid = os.getpid()
+    self._lock = threading.Lock()
+    self._idle = LifoQueue()
+    self._slots = threading.BoundedSemaphore(self.size)
+    self._connections = set()
+
+  def _connect(self):
+    conn = sqlite3.connect(self.database, check_same_thread=False)
+    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+    if self.on_connect is not None:
+      self.on_connect(conn)
+    with self._lock:
+      self._connections.add(conn)
+    return conn
+
+  def _discard(self, conn):
+    with self._lock:
+      self._connections.discard(conn)
+    try:
+      conn.close()
+    except sqlite3.Error:
+      pass
+
+  def _healthy(self, conn):
+    try:
+      conn.execute('SELECT 1').fetchone()
+      return True
+    except sqlite3.Error:
+      return False
+
+  def acquire(self):
+    """Check a connection out of the pool, waiting up to `timeout` seconds."""
+    if self._pid != os.getpid():
+      self._reset()
+    if self._closed:
+      raise PoolError('connection pool is closed')
+    if not self._slots.acquire(timeout=self.timeout):
+      raise PoolTimeout(f'no database connection available after {self.timeout}s')
+    try:
+      while True:
+        try:
+          conn, last_used = self._idle.get_nowait()
+        except Empty:
+          return self._connect()
+        if time.monotonic() - last_used < self.health_check_interval or self._healthy(conn):
+          return conn
+        self._discard(conn)
+    except BaseException:
+      self._slots.release()
+      raise
+
+  def release(self, conn):
+    """Return a connection to the pool, rolling back anything left uncommitted."""
+    if self._pid != os.getpid():
+      # Checked out before a fork; the slot belongs to the parent's pool.
+      return
+    try:
+      if conn.in_transaction:
+        conn.rollback()
+    except sqlite3.Error:
+      self._discard(conn)
+    else:
+      if self._closed:
+        self._discard(conn)
+      else:
+        self._idle.put((conn, time.monotonic()))
+    finally:
+      self._slots.release()
+
+  def stats(self):
+    with self._lock:
+      open_connections = len(self._connections)
+    idle = self._idle.qsize()
+    return {
+      'size': self.size,
+      'open': open_connections,
+      'idle': idle,
+      'in_use': open_connections - idle
+    }
+
+  def close(self):
+    """Close idle connections now; checked-out ones are closed when released."""
+    self._closed = True
+    while True:
+      try:
+        conn, _ = self._idle.get_nowait()
+      except Empty:
+        break
+      self._discard(conn)
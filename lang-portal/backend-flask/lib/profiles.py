@@ -0,0 +1,51 @@
+# Named SQLite storage profiles applied to every connection when it opens.
+#
+# All profiles use WAL so review writers no longer block readers on /words and
+# /dashboard/stats; they differ in how much durability they trade for speed.
+#   durable    - fsync on every commit, modest caches
+#   balanced   - fsync at checkpoints only (a crash can lose the last commits
+#                but never corrupts the database), bigger caches and mmap
+#   throughput - no fsync at all, large caches; for throwaway/preview data
+STORAGE_PROFILES = {
+  'durable': {
+    'journal_mode': 'WAL',
+    'synchronous': 'FULL',
+    'cache_size': -8000,  # negative values are KiB, so ~8 MB
+    'mmap_size': 0,
+    'temp_store': 'DEFAULT',
+    'busy_timeout': 5000  # ms
+  },
+  'balanced': {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -32000,
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000
+  },
+  'throughput': {
+    'journal_mode': 'WAL',
+    'synchronous': 'OFF',
+    'cache_size': -131072,
+    'mmap_size': 1024 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 10000
+  }
+}
+
+DEFAULT_PROFILE = 'balanced'
+
+# busy_timeout goes first so the journal_mode switch can wait out other writers
+PRAGMA_ORDER = ['busy_timeout', 'journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store']
+
+def get_profile(name):
+  try:
+    return STORAGE_PROFILES[name]
+  except KeyError:
+    raise ValueError(f"Unknown storage profile '{name}', expected one of: {', '.join(STORAGE_PROFILES)}")
+
+def apply_profile(conn, name):
+  """Apply the pragmas of a storage profile to an open connection"""
+  profile = get_profile(name)
+  for pragma in PRAGMA_ORDER:
+    conn.execute(f'PRAGMA {pragma} = {profile[pragma]}')
@@ -0,0 +1,135 @@
+import os
+import re
+import shutil
+import tempfile
+
+from flask import Flask
+
+from lib.db import Db
+from lib.pagination import encode_cursor
+
+# GET routes exercised by the plan check. Ids refer to the seeded database
+# plus the study session created in `seed_activity`.
+ROUTES = [
+  '/words',
+  '/words?sort_by=romaji&order=desc',
+  '/words?sort_by=english',
+  '/words?sort_by=correct_count&order=desc',
+  '/words?sort_by=accuracy&min_accuracy=0.5',
+  '/words?sort_by=romaji&cursor=' + encode_cursor('romaji', 'asc', ['kau', 10]),
+  '/words/search?q=ta',
+  '/words/search?q=to+eat&cursor=' + encode_cursor('rank', 'asc', [-1.0, 10]),
+  '/words/fuzzy?q=taberru',
+  '/words/1',
+  '/groups',
+  '/groups?sort_by=words_count&order=desc',
+  '/groups/1',
+  '/groups/1/words',
+  '/groups/1/words?sort_by=english&order=desc',
+  '/groups/1/words?sort_by=wrong_count',
+  '/groups/1/words?order=desc&cursor=' + encode_cursor('kanji', 'desc', ['食べる', 10]),
+  '/groups/1/words/raw',
+  '/groups/1/study_sessions',
+  '/groups/1/study_sessions?sort_by=endTime',
+  '/groups/1/due',
+  '/groups/1/due?limit=100',
+  '/groups/1/sample?strategy=error_weighted',
+  '/api/study-sessions',
+  '/api/study-sessions/1',
+  '/api/study-activities',
+  '/api/study-activities/1',
+  '/api/study-activities/1/sessions',
+  '/api/study-activities/1/launch',
+  '/dashboard/recent-session',
+  '/dashboard/stats'
+]
+
+# Lookup tables that only ever hold a handful of rows; scanning them is the
+# cheapest plan and not a missing index.
+SMALL_TABLES = {'study_activities'}
+
+SCAN_RE = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+def create_check_app(database):
+  import routes.words
+  import routes.groups
+  import routes.study_sessions
+  import routes.dashboard
+  import routes.study_activities
+
+  app = Flask(__name__)
+  app.db = Db(database=database, pool_size=1)
+  app.db.init(app)
+
+  @app.teardown_appcontext
+  def close_db(exception):
+    app.db.close()
+
+  for module in (routes.words, routes.groups, routes.study_sessions, routes.dashboard, routes.study_activities):
+    module.load(app)
+  return app
+
+def seed_activity(client):
+  client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1})
+  for word_id, correct in [(1, True), (2, False), (3, True)]:
+    client.post('/api/study-sessions/1/review', json={'word_id': word_id, 'correct': correct})
+
+def collect_statements(app, paths):
+  """Run GET requests against the app and return the SQL they executed"""
+  statements = []
+  conn = app.db.pool.acquire()
+  conn.set_trace_callback(statements.append)
+  app.db.pool.release(conn)
+  client = app.test_client()
+  try:
+    for path in paths:
+      response = client.get(path)
+      if response.status_code >= 400:
+        raise RuntimeError(f'GET {path} returned {response.status_code}: {response.get_data(as_text=True)}')
+  finally:
+    conn.set_trace_callback(None)
+  return statements
+
+def full_scans(conn, sql, tables):
+  """Return the tables a statement reads without using any index"""
+  scans = []
+  for row in conn.execute('EXPLAIN QUERY PLAN ' + sql):
+    match = SCAN_RE.match(row[3])
+    if not match:
+      continue
+    # Plans name tables by alias, so resolve aliases back to the table
+    name = match.group(1)
+    table = name if name in tables else None
+    for alias in re.finditer(r'\b(\w+)\s+(?:AS\s+)?' + re.escape(name) + r'\b', sql, re.IGNORECASE):
+      if table is None and alias.group(1) in tables:
+        table = alias.group(1)
+    if table is not None and table not in SMALL_TABLES:
+      scans.append(table)
+  return scans
+
+def check(paths=ROUTES):
+  """Build a seeded database, replay the routes and return statements that full-scan a table"""
+  workdir = tempfile.mkdtemp(prefix='query-plans-')
+  try:
+    app = create_check_app(os.path.join(workdir, 'words.db'))
+    seed_activity(app.test_client())
+    statements = collect_statements(app, paths)
+
+    conn = app.db.pool.acquire()
+    try:
+      tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+      violations = []
+      seen = set()
+      for sql in statements:
+        if sql in seen or not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+          continue
+        seen.add(sql)
+        scans = full_scans(conn, sql, tables)
+        if scans:
+          violations.append({'sql': ' '.join(sql.split()), 'tables': scans})
+      return {'statements': len(seen), 'violations': violations}
+    finally:
+      app.db.pool.release(conn)
+      app.db.shutdown()
+  finally:
+    shutil.rmtree(workdir)
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, g, request
+
+def cached(view):
+  """Mark a GET view whose response the ResponseCache may store.
+
+  Apply it below @app.route so the marked function is the one registered.
+  """
+  view.cache_response = True
+  return view
+
+class DataVersion:
+  """Tells whether anything was committed to the database since the last call.
+
+  Reads `PRAGMA data_version` on a connection of its own that never writes.
+  SQLite changes the value whenever another connection - a pooled request
+  connection, the write-behind writer or another process - commits, so this
+  costs no query against the data itself.
+  """
+
+  def __init__(self, database, on_connect=None):
+    self.database = database
+    self.on_connect = on_connect
+    self._lock = threading.Lock()
+    self._pid = None
+    self._conn = None
+
+  def current(self):
+    with self._lock:
+      if self._pid != os.getpid():
+        # Never share the probe connection with a forked child
+        self._pid = os.getpid()
+        self._conn = sqlite3.connect(self.database, check_same_thread=False)
+        if self.on_connect is not None:
+          self.on_connect(self._conn)
+      # Values are only comparable within one connection, so tag them with it
+      return (id(self._conn), self._conn.execute('PRAGMA data_version').fetchone()[0])
+
+  def close(self):
+    with self._lock:
+      if self._conn is not None and self._pid == os.getpid():
+        self._conn.close()
+      self._conn = None
+      self._pid = None
+
+class ResponseCache:
+  """LRU cache of GET responses that is emptied whenever the database changes.
+
+  Responses of views marked with @cached are stored by path and query string
+  for as long as the database's data version stays the same, up to
+  `max_bytes` of response bodies. Every cached response carries a strong
+  ETag; a matching If-None-Match is answered with 304 straight from the
+  cache, without borrowing a database connection.
+  """
+
+  def __init__(self, data_version, max_bytes=16 * 1024 * 1024):
+    self.data_version = data_version
+    self.max_bytes = max_bytes
+    self._lock = threading.Lock()
+    self._entries = OrderedDict()
+    self._version = None
+    self._bytes = 0
+    self._stats = {'hits': 0, 'not_modified': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'invalidations': 0}
+
+  def init_app(self, app):
+    app.response_cache = self
+    app.before_request(self._before_request)
+    app.after_request(self._after_request)
+
+  def _cacheable(self):
+    if request.method != 'GET' or request.endpoint is None:
+      return False
+    return getattr(current_app.view_functions.get(request.endpoint), 'cache_response', False)
+
+  def _key(self):
+    # Queries comparing against date('now') change at midnight UTC without a commit
+    today = time.strftime('%Y-%m-%d', time.gmtime())
+    return (today, request.path, tuple(sorted(request.args.items(multi=True))))
+
+  def _check_version(self):
+    # Everything cached under an older version is stale
+    version = self.data_version.current()
+    with self._lock:
+      if version != self._version:
+        if self._entries:
+          self._stats['invalidations'] += 1
+        self._entries.clear()
+        self._bytes = 0
+        self._version = version
+    return version
+
+  def get(self, key, version):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None or entry[0] != version:
+        self._stats['misses'] += 1
+        return None
+      self._entries.move_to_end(key)
+      self._stats['hits'] += 1
+      return entry
+
+  def put(self, key, version, etag, body, mimetype):
+    size = len(body)
+    if size > self.max_bytes:
+      return
+    with self._lock:
+      if version != self._version:
+        return
+      previous = self._entries.pop(key, None)
+      if previous is not None:
+        self._bytes -= len(previous[2])
+      self._entries[key] = (version, etag, body, mimetype)
+      self._bytes += size
+      self._stats['stores'] += 1
+      while self._bytes > self.max_bytes:
+        _, evicted = self._entries.popitem(last=False)
+        self._bytes -= len(evicted[2])
+        self._stats['evictions'] += 1
+
+  def _before_request(self):
+    if not self._cacheable():
+      return None
+    key = self._key()
+    version = self._check_version()
+    entry = self.get(key, version)
+    if entry is None:
+      g.response_cache = (key, version)
+      return None
+    _, etag, body, mimetype = entry
+    response = current_app.response_class(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response = response.make_conditional(request)
+    if response.status_code == 304:
+      with self._lock:
+        self._stats['not_modified'] += 1
+    return response
+
+  def _after_request(self, response):
+    pending = g.pop('response_cache', None)
+    if pending is None or response.status_code != 200 or response.is_streamed:
+      return response
+    key, version = pending
+    body = response.get_data()
+    etag = hashlib.sha1(body).hexdigest()
+    # Only keep it if nothing was committed while it was being built
+    if self._check_version() == version:
+      self.put(key, version, etag, body, response.mimetype)
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self._bytes = 0
+
+  def stats(self):
+    with self._lock:
+      stats = dict(self._stats)
+      stats['entries'] = len(self._entries)
+      stats['bytes'] = self._bytes
+    stats['max_bytes'] = self.max_bytes
+    return stats
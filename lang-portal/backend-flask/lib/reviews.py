@@ -0,0 +1,212 @@
+import json
+
+from lib.dashboard_stats import MASTERED, apply_session, reset_stats
+from lib.schedule import schedule_reviews
+
+# The reviews of one submission as rows of (word_id, correct, answered_at),
+# decoded from a JSON array so every statement below is set-based.
+BATCH_CTE = '''
+  WITH batch AS (
+    SELECT
+      json_extract(value, '$.word_id') AS word_id,
+      json_extract(value, '$.correct') AS correct,
+      COALESCE(datetime(json_extract(value, '$.answered_at')), datetime('now')) AS answered_at
+    FROM json_each(?)
+  )
+'''
+
+# Largest batch accepted by POST /api/study-sessions/<id>/reviews
+MAX_REVIEW_BATCH = 1000
+
+def encode_reviews(reviews):
+  return json.dumps([{
+    'word_id': review['word_id'],
+    'correct': 1 if review['correct'] else 0,
+    'answered_at': review.get('answered_at')
+  } for review in reviews])
+
+def validate_reviews(cursor, session_id, items):
+  """Check a submitted batch of reviews, looking up the session and all words in one query.
+
+  Returns (session_found, results): one dict per item holding either the
+  normalized review (`word_id`, `correct`, `answered_at`) or an `error`.
+  """
+  results = []
+  for item in items:
+    if not isinstance(item, dict):
+      results.append({'error': 'review must be an object'})
+    elif type(item.get('word_id')) is not int:
+      results.append({'error': 'word_id must be an integer'})
+    elif not isinstance(item.get('correct'), bool):
+      results.append({'error': 'correct must be a boolean'})
+    elif not isinstance(item.get('answered_at', None), (str, type(None))):
+      results.append({'error': 'answered_at must be a timestamp string'})
+    else:
+      results.append({'word_id': item['word_id'], 'correct': item['correct'], 'answered_at': item.get('answered_at')})
+
+  cursor.execute('''
+    WITH batch AS (
+      SELECT key AS position, json_extract(value, '$.word_id') AS word_id, json_extract(value, '$.answered_at') AS answered_at
+      FROM json_each(?)
+    )
+    SELECT
+      EXISTS (SELECT 1 FROM study_sessions WHERE id = ?) AS session_found,
+      b.position,
+      w.id IS NOT NULL AS word_found,
+      datetime(b.answered_at) AS answered_at
+    FROM (SELECT 1) LEFT JOIN batch b ON true
+    LEFT JOIN words w ON w.id = b.word_id
+    ORDER BY b.position
+  ''', (json.dumps([{k: r.get(k) for k in ('word_id', 'answered_at')} for r in results]), session_id))
+  rows = cursor.fetchall()
+
+  for row in rows:
+    if row['position'] is None:
+      continue
+    result = results[row['position']]
+    if 'error' in result:
+      continue
+    if not row['word_found']:
+      results[row['position']] = {'error': f"word {result['word_id']} not found"}
+    elif result['answered_at'] is not None:
+      if row['answered_at'] is None:
+        results[row['position']] = {'error': 'answered_at is not a valid timestamp'}
+      else:
+        result['answered_at'] = row['answered_at']
+  return bool(rows[0]['session_found']), results
+
+def start_session(cursor, group_id, study_activity_id):
+  """Insert a study session and count it in the dashboard stats; returns its id.
+
+  The caller commits.
+  """
+  cursor.execute('''
+    INSERT INTO study_sessions (group_id, study_activity_id, created_at)
+    VALUES (?, ?, datetime('now'))
+  ''', (group_id, study_activity_id))
+  session_id = cursor.lastrowid
+  apply_session(cursor, session_id)
+  return session_id
+
+def record_reviews(cursor, session_id, reviews):
+  """Insert review items and update the derived counters in the caller's transaction.
+
+  `reviews` is a list of dicts with `word_id`, `correct` and an optional
+  `answered_at` timestamp (defaults to now). The caller commits.
+  """
+  batch = encode_reviews(reviews)
+
+  cursor.execute(BATCH_CTE + '''
+    INSERT INTO word_review_items (study_session_id, word_id, correct, created_at)
+    SELECT ?, word_id, correct, answered_at FROM batch
+  ''', (batch, session_id))
+
+  # Dashboard stats; newly studied and newly mastered words are derived from
+  # the per-word counters before this batch is added to them
+  before = MASTERED.format(c='COALESCE(r.correct_count, 0)', w='COALESCE(r.wrong_count, 0)')
+  after = MASTERED.format(c='COALESCE(r.correct_count, 0) + p.correct', w='COALESCE(r.wrong_count, 0) + p.wrong')
+  cursor.execute(BATCH_CTE + f''',
+    per_word AS (
+      SELECT word_id, SUM(correct) AS correct, SUM(1 - correct) AS wrong
+      FROM batch
+      GROUP BY word_id
+    ),
+    delta AS (
+      SELECT
+        COALESCE(SUM(COALESCE(r.correct_count, 0) + COALESCE(r.wrong_count, 0) = 0), 0) AS studied,
+        COALESCE(SUM({after}) - SUM({before}), 0) AS mastered
+      FROM per_word p
+      LEFT JOIN word_reviews r ON r.word_id = p.word_id
+    )
+    UPDATE dashboard_stats SET
+      total_words_studied = total_words_studied + (SELECT studied FROM delta),
+      mastered_words = mastered_words + (SELECT mastered FROM delta),
+      total_reviews = total_reviews + (SELECT COUNT(*) FROM batch),
+      correct_reviews = correct_reviews + (SELECT COALESCE(SUM(correct), 0) FROM batch)
+    WHERE id = 1
+  ''', (batch,))
+
+  # Per-session rollup
+  cursor.execute(BATCH_CTE + '''
+    UPDATE study_session_stats SET
+      review_count = review_count + (SELECT COUNT(*) FROM batch),
+      correct_count = correct_count + (SELECT COALESCE(SUM(correct), 0) FROM batch),
+      last_activity_at = MAX(COALESCE(last_activity_at, ''), (SELECT MAX(answered_at) FROM batch)),
+      end_time = MAX(COALESCE(last_activity_at, ''), (SELECT MAX(answered_at) FROM batch))
+    WHERE study_session_id = ?
+  ''', (batch, session_id))
+
+  # Per-word counters
+  cursor.execute(BATCH_CTE + '''
+    INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+    SELECT word_id, SUM(correct), SUM(1 - correct), MAX(answered_at)
+    FROM batch
+    WHERE true
+    GROUP BY word_id
+    ON CONFLICT (word_id) DO UPDATE SET
+      correct_count = correct_count + excluded.correct_count,
+      wrong_count = wrong_count + excluded.wrong_count,
+      last_reviewed = MAX(COALESCE(last_reviewed, ''), excluded.last_reviewed)
+  ''', (batch,))
+
+  # When each word is due again
+  schedule_reviews(cursor, batch)
+
+  # Groups whose sampling weights changed
+  cursor.execute(BATCH_CTE + '''
+    UPDATE groups SET review_version = review_version + 1
+    WHERE id IN (SELECT group_id FROM word_groups WHERE word_id IN (SELECT word_id FROM batch))
+  ''', (batch,))
+
+def reset_counters(cursor):
+  """Zero the derived counters after the review history was cleared"""
+  cursor.execute('UPDATE word_reviews SET correct_count = 0, wrong_count = 0, last_reviewed = NULL')
+  cursor.execute('DELETE FROM word_schedule')
+  cursor.execute('UPDATE groups SET review_version = review_version + 1')
+  reset_stats(cursor)
+
+def rebuild_word_reviews(cursor):
+  """Recompute every word's counters from word_review_items (one-time backfill / repair)"""
+  cursor.execute('DELETE FROM word_reviews WHERE word_id NOT IN (SELECT id FROM words)')
+  cursor.execute('''
+    INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+    SELECT
+      w.id,
+      COALESCE(SUM(wri.correct = 1), 0),
+      COALESCE(SUM(wri.correct = 0), 0),
+      MAX(wri.created_at)
+    FROM words w
+    LEFT JOIN word_review_items wri ON wri.word_id = w.id
+    WHERE true
+    GROUP BY w.id
+    ON CONFLICT (word_id) DO UPDATE SET
+      correct_count = excluded.correct_count,
+      wrong_count = excluded.wrong_count,
+      last_reviewed = excluded.last_reviewed
+  ''')
+  rows = cursor.rowcount
+  cursor.execute('UPDATE groups SET review_version = review_version + 1')
+  return rows
+
+def rebuild_session_stats(cursor):
+  """Recompute every session's rollup from word_review_items (one-time backfill / repair)"""
+  cursor.execute('DELETE FROM study_session_stats WHERE study_session_id NOT IN (SELECT id FROM study_sessions)')
+  cursor.execute('''
+    INSERT INTO study_session_stats (study_session_id, review_count, correct_count, last_activity_at, end_time)
+    SELECT
+      ss.id,
+      COUNT(wri.id),
+      COALESCE(SUM(wri.correct = 1), 0),
+      MAX(wri.created_at),
+      COALESCE(MAX(wri.created_at), datetime(ss.created_at, '+30 minutes'))
+    FROM study_sessions ss
+    LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
+    WHERE true
+    GROUP BY ss.id
+    ON CONFLICT (study_session_id) DO UPDATE SET
+      review_count = excluded.review_count,
+      correct_count = excluded.correct_count,
+      last_activity_at = excluded.last_activity_at,
+      end_time = excluded.end_time
+  ''')
+  return cursor.rowcount
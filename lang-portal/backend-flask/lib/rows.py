@@ -0,0 +1,34 @@
+from operator import itemgetter
+
+def fetch_dicts(cursor, fields=None):
+  """Fetch the remaining rows of an executed cursor as plain dicts.
+
+  `fields` is a list of column names, or a dict mapping output keys to
+  column names; by default every column is returned under its own name.
+  Rows are fetched as tuples and mapped through column positions worked out
+  once per query, which is much cheaper than building sqlite3.Row objects
+  and copying them field by field.
+  """
+  names = [column[0] for column in cursor.description]
+  if fields is None:
+    keys, columns = names, names
+  elif isinstance(fields, dict):
+    keys, columns = list(fields), list(fields.values())
+  else:
+    keys, columns = list(fields), list(fields)
+  positions = [names.index(column) for column in columns]
+
+  row_factory = cursor.row_factory
+  cursor.row_factory = None
+  try:
+    rows = cursor.fetchall()
+  finally:
+    cursor.row_factory = row_factory
+
+  if positions == list(range(len(names))):
+    return [dict(zip(keys, row)) for row in rows]
+  if len(positions) == 1:
+    position, key = positions[0], keys[0]
+    return [{key: row[position]} for row in rows]
+  getter = itemgetter(*positions)
+  return [dict(zip(keys, getter(row))) for row in rows]
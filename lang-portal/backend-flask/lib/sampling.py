@@ -0,0 +1,122 @@
+# Weighted random draws of a group's words for GET /groups/<id>/sample.
+#
+# Each group and strategy gets an alias table (Vose's method): built in O(n)
+# from the group's words once, then every draw is one random column and one
+# biased coin flip, O(1) however large the group is. Tables are kept per
+# process and rebuilt lazily when groups.review_version - bumped by review
+# submissions and membership changes - no longer matches the one they were
+# built from.
+
+import random
+import threading
+from collections import OrderedDict
+
+# Weight of each word per strategy. error_weighted uses the smoothed error
+# rate (wrong + 1) / (reviews + 2), so never-reviewed words weigh 0.5 and
+# every word keeps some chance of being drawn.
+STRATEGIES = {
+  'uniform': '1.0',
+  'error_weighted': '(COALESCE(wr.wrong_count, 0) + 1.0) / (COALESCE(wr.correct_count, 0) + COALESCE(wr.wrong_count, 0) + 2)'
+}
+
+# Draws per requested word before a distinct sample gives up on finding more
+DRAW_ATTEMPTS = 20
+
+class AliasTable:
+  """O(1) draws from a fixed discrete distribution (Vose's alias method)"""
+  __slots__ = ('ids', 'prob', 'alias')
+
+  def __init__(self, ids, weights):
+    n = len(ids)
+    self.ids = ids
+    self.prob = [0.0] * n
+    self.alias = [0] * n
+    total = sum(weights)
+    if not n or total <= 0:
+      self.prob = [1.0] * n
+      return
+    scaled = [w * n / total for w in weights]
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+      s, l = small.pop(), large.pop()
+      self.prob[s] = scaled[s]
+      self.alias[s] = l
+      scaled[l] = scaled[l] + scaled[s] - 1.0
+      (small if scaled[l] < 1.0 else large).append(l)
+    # Whatever is left is 1 up to rounding
+    for i in small + large:
+      self.prob[i] = 1.0
+
+  def __len__(self):
+    return len(self.ids)
+
+  def draw(self, rng=random):
+    column = int(rng.random() * len(self.ids))
+    return self.ids[column] if rng.random() < self.prob[column] else self.ids[self.alias[column]]
+
+  def sample(self, k, rng=random):
+    """Up to `k` distinct ids, each drawn in proportion to its weight"""
+    k = min(k, len(self.ids))
+    chosen = {}
+    for _ in range(k * DRAW_ATTEMPTS):
+      if len(chosen) == k:
+        break
+      chosen.setdefault(self.draw(rng), None)
+    return list(chosen)
+
+class SampleTables:
+  """Per-process LRU of alias tables keyed by (group id, strategy)"""
+
+  def __init__(self, max_groups=256):
+    self.max_groups = max_groups
+    self._lock = threading.Lock()
+    self._tables = OrderedDict()
+    self.hits = 0
+    self.builds = 0
+
+  def get(self, cursor, group_id, strategy):
+    """The table for a group, or None if the group does not exist"""
+    cursor.execute('SELECT review_version FROM groups WHERE id = ?', (group_id,))
+    row = cursor.fetchone()
+    if row is None:
+      return None
+    version = row[0]
+    key = (group_id, strategy)
+    with self._lock:
+      entry = self._tables.get(key)
+      if entry is not None and entry[0] == version:
+        self._tables.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    # Built outside the lock; the version was read first, so a table that
+    # already includes a later change is at worst rebuilt once more
+    cursor.execute(f'''
+      SELECT wg.word_id, {STRATEGIES[strategy]}
+      FROM word_groups wg
+      LEFT JOIN word_reviews wr ON wr.word_id = wg.word_id
+      WHERE wg.group_id = ?
+    ''', (group_id,))
+    rows = cursor.fetchall()
+    table = AliasTable([r[0] for r in rows], [r[1] for r in rows])
+    with self._lock:
+      self._tables[key] = (version, table)
+      self._tables.move_to_end(key)
+      while len(self._tables) > self.max_groups:
+        self._tables.popitem(last=False)
+      self.builds += 1
+    return table
+
+  def clear(self):
+    with self._lock:
+      self._tables.clear()
+
+  def stats(self):
+    with self._lock:
+      return {
+        'hits': self.hits,
+        'builds': self.builds,
+        'tables': len(self._tables),
+        'words': sum(len(table) for _, table in self._tables.values())
+      }
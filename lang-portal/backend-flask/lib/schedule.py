@@ -0,0 +1,149 @@
+# SM-2 spaced-repetition schedule kept per word in word_schedule.
+#
+# Answers are binary, so a correct one is graded as quality 4 and a wrong one
+# as quality 1. A correct answer moves the next review 1 day, then 6 days,
+# then the previous interval times the ease out; a wrong one starts the word
+# over at 1 day and lowers its ease. Triggers copy every word's `due_at` to
+# word_groups.next_due_at, whose (group_id, next_due_at, word_id) index serves
+# GET /groups/<id>/due.
+
+from lib.rows import fetch_dicts
+
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+# Longest interval between reviews, as in Anki; also keeps due dates within datetime()'s range
+MAX_INTERVAL_DAYS = 36500
+
+# SM-2 ease change 0.1 - (5 - q) * (0.08 + (5 - q) * 0.02) for q = 4 and q = 1
+EASE_CORRECT = 0.0
+EASE_WRONG = -0.54
+
+# Replays `reviews` (word_id, correct, answered_at, n = 1, 2, ... per word)
+# on top of `start` (each word's schedule before them) and stores the result.
+# Both CTEs are defined by the statement this is appended to.
+REPLAY = f'''
+  steps (word_id, n, repetitions, interval_days, ease, reviewed_at) AS (
+    SELECT word_id, 0, repetitions, interval_days, ease, reviewed_at FROM start
+    UNION ALL
+    SELECT
+      s.word_id,
+      s.n + 1,
+      CASE WHEN r.correct THEN s.repetitions + 1 ELSE 0 END,
+      CASE
+        WHEN NOT r.correct OR s.repetitions = 0 THEN 1
+        WHEN s.repetitions = 1 THEN 6
+        ELSE MIN({MAX_INTERVAL_DAYS}, MAX(1, CAST(round(s.interval_days * s.ease) AS INTEGER)))
+      END,
+      MAX({MIN_EASE}, s.ease + CASE WHEN r.correct THEN {EASE_CORRECT} ELSE {EASE_WRONG} END),
+      r.answered_at
+    FROM steps s
+    JOIN reviews r ON r.word_id = s.word_id AND r.n = s.n + 1
+  ),
+  final AS (
+    SELECT s.*
+    FROM steps s
+    JOIN (SELECT word_id, MAX(n) AS n FROM reviews GROUP BY word_id) last
+      ON last.word_id = s.word_id AND last.n = s.n
+  )
+  INSERT INTO word_schedule (word_id, repetitions, interval_days, ease, last_reviewed_at, due_at)
+  SELECT word_id, repetitions, interval_days, ease, reviewed_at, datetime(reviewed_at, '+' || interval_days || ' days')
+  FROM final
+  WHERE true
+  ON CONFLICT (word_id) DO UPDATE SET
+    repetitions = excluded.repetitions,
+    interval_days = excluded.interval_days,
+    ease = excluded.ease,
+    last_reviewed_at = excluded.last_reviewed_at,
+    due_at = excluded.due_at
+'''
+
+def schedule_reviews(cursor, batch):
+  """Advance the schedule of every word in a review batch (JSON from lib.reviews.encode_reviews)"""
+  cursor.execute(f'''
+    WITH RECURSIVE batch AS (
+      SELECT
+        key AS position,
+        json_extract(value, '$.word_id') AS word_id,
+        json_extract(value, '$.correct') AS correct,
+        COALESCE(datetime(json_extract(value, '$.answered_at')), datetime('now')) AS answered_at
+      FROM json_each(?)
+    ),
+    reviews AS (
+      SELECT word_id, correct, answered_at, ROW_NUMBER() OVER (PARTITION BY word_id ORDER BY answered_at, position) AS n
+      FROM batch
+    ),
+    start AS (
+      SELECT
+        b.word_id,
+        COALESCE(ws.repetitions, 0) AS repetitions,
+        COALESCE(ws.interval_days, 0) AS interval_days,
+        COALESCE(ws.ease, {INITIAL_EASE}) AS ease,
+        ws.last_reviewed_at AS reviewed_at
+      FROM (SELECT DISTINCT word_id FROM batch) b
+      LEFT JOIN word_schedule ws ON ws.word_id = b.word_id
+    ),
+  ''' + REPLAY, (batch,))
+
+def rebuild_schedule(cursor):
+  """Replay the whole review history into word_schedule (one-time backfill / repair)"""
+  cursor.execute('DELETE FROM word_schedule')
+  cursor.execute(f'''
+    WITH RECURSIVE reviews AS MATERIALIZED (
+      SELECT word_id, correct, created_at AS answered_at, ROW_NUMBER() OVER (PARTITION BY word_id ORDER BY created_at, id) AS n
+      FROM word_review_items
+      WHERE word_id IN (SELECT id FROM words)
+    ),
+    start AS (
+      SELECT DISTINCT word_id, 0 AS repetitions, 0 AS interval_days, {INITIAL_EASE} AS ease, NULL AS reviewed_at
+      FROM reviews
+    ),
+  ''' + REPLAY)
+  cursor.execute('SELECT COUNT(*) FROM word_schedule')
+  return cursor.fetchone()[0]
+
+def due_words(cursor, group_id, limit, include_new=True):
+  """Up to `limit` words of a group to study next: overdue ones first, longest
+  overdue first, then (with `include_new`) words that were never reviewed.
+
+  Both parts are range reads of the (group_id, next_due_at, word_id) index.
+  """
+  columns = '''
+    w.id, w.kanji, w.romaji, w.english,
+    wg.next_due_at AS due_at,
+    COALESCE(ws.repetitions, 0) AS repetitions,
+    COALESCE(ws.interval_days, 0) AS interval_days,
+    COALESCE(ws.ease, {ease}) AS ease
+  '''.format(ease=INITIAL_EASE)
+  cursor.execute(f'''
+    SELECT {columns}
+    FROM word_groups wg
+    JOIN words w ON w.id = wg.word_id
+    LEFT JOIN word_schedule ws ON ws.word_id = wg.word_id
+    WHERE wg.group_id = ? AND wg.next_due_at <= datetime('now')
+    ORDER BY wg.next_due_at, wg.word_id
+    LIMIT ?
+  ''', (group_id, limit))
+  words = fetch_dicts(cursor)
+  if include_new and len(words) < limit:
+    cursor.execute(f'''
+      SELECT {columns}
+      FROM word_groups wg
+      JOIN words w ON w.id = wg.word_id
+      LEFT JOIN word_schedule ws ON ws.word_id = wg.word_id
+      WHERE wg.group_id = ? AND wg.next_due_at IS NULL
+      ORDER BY wg.word_id
+      LIMIT ?
+    ''', (group_id, limit - len(words)))
+    words.extend(fetch_dicts(cursor))
+  return words
+
+def next_due_at(cursor, group_id):
+  """When the group's next word that is not due yet becomes due, or None"""
+  cursor.execute('''
+    SELECT next_due_at FROM word_groups
+    WHERE group_id = ? AND next_due_at > datetime('now')
+    ORDER BY next_due_at
+    LIMIT 1
+  ''', (group_id,))
+  row = cursor.fetchone()
+  return row[0] if row else None
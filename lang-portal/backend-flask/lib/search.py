@@ -0,0 +1,13 @@
+# Relative weights of the kanji, romaji and english columns in bm25 ranking
+COLUMN_WEIGHTS = (2.0, 2.0, 1.0)
+
+def match_query(text):
+  """Turn free text into an FTS5 query matching every term as a prefix.
+
+  Terms are quoted so that FTS5 syntax in user input (AND, NEAR, column
+  filters, ...) is matched literally instead of being interpreted.
+  """
+  return ' '.join('"' + term.replace('"', '""') + '"*' for term in text.split())
+
+def rank_expression():
+  return 'bm25(words_fts, {})'.format(', '.join(str(weight) for weight in COLUMN_WEIGHTS))
@@ -0,0 +1,127 @@
+import glob
+import json
+import logging
+import re
+import sqlite3
+import time
+from logging.handlers import RotatingFileHandler
+
+# Literals folded out of SQL text when grouping logged statements by shape
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+# Plan steps that usually mean an index is missing
+PLAN_WARNINGS = ('SCAN ', 'USE TEMP B-TREE')
+
+def redact(parameters):
+  """Bound parameters with strings and blobs replaced by their type and length"""
+  def hide(value):
+    if isinstance(value, str):
+      return f'<str:{len(value)}>'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+      return f'<blob:{len(value)}>'
+    return value
+  if parameters is None:
+    return None
+  if isinstance(parameters, dict):
+    return {key: hide(value) for key, value in parameters.items()}
+  return [hide(value) for value in parameters]
+
+def normalize(sql):
+  """The shape of a statement: whitespace collapsed, literals and IN lists folded to ?"""
+  sql = STRING_RE.sub('?', ' '.join(sql.split()))
+  sql = NUMBER_RE.sub('?', sql)
+  return IN_LIST_RE.sub('(?)', sql)
+
+class SlowQueryLog:
+  """Writes statements slower than `threshold_ms` to a rotating JSONL file.
+
+  Each line holds the SQL, its redacted parameters, the duration including
+  fetching the rows, the route that ran it and the statement's
+  `EXPLAIN QUERY PLAN`, taken on the connection that ran it.
+  """
+
+  def __init__(self, path, threshold_ms=100, max_bytes=10 * 1024 * 1024, backup_count=5):
+    self.path = path
+    self.threshold = threshold_ms / 1000
+    self.logger = logging.getLogger(f'{__name__}.{path}')
+    self.logger.setLevel(logging.INFO)
+    self.logger.propagate = False
+    if not self.logger.handlers:
+      handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+      handler.setFormatter(logging.Formatter('%(message)s'))
+      self.logger.addHandler(handler)
+
+  def record(self, conn, route, sql, parameters, seconds):
+    entry = {
+      'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime()),
+      'route': route,
+      'duration_ms': round(seconds * 1000, 3),
+      'sql': ' '.join(sql.split()),
+      'params': redact(parameters),
+      'plan': explain(conn, sql, parameters)
+    }
+    self.logger.info(json.dumps(entry, ensure_ascii=False, default=str))
+
+  def close(self):
+    for handler in list(self.logger.handlers):
+      handler.close()
+      self.logger.removeHandler(handler)
+
+def explain(conn, sql, parameters):
+  """The plan steps of a statement, indented by depth, or None if it has no plan"""
+  if parameters is None:
+    return None
+  try:
+    rows = conn.execute('EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+  except (sqlite3.Error, ValueError):
+    return None
+  depth = {0: -1}
+  plan = []
+  for row in rows:
+    node, parent, detail = row[0], row[1], row[3]
+    depth[node] = depth.get(parent, -1) + 1
+    plan.append('  ' * depth[node] + detail)
+  return plan
+
+def read_entries(path):
+  """Entries of the log at `path` and its rotated backups, oldest file first"""
+  # RotatingFileHandler keeps the newest backup in <path>.1
+  backups = [p for p in glob.glob(glob.escape(path) + '.*') if p[len(path) + 1:].isdigit()]
+  backups.sort(key=lambda p: int(p[len(path) + 1:]), reverse=True)
+  for filepath in backups + [path]:
+    try:
+      with open(filepath, encoding='utf-8') as file:
+        for line in file:
+          if line.strip():
+            yield json.loads(line)
+    except FileNotFoundError:
+      continue
+
+def rank(entries, top=10):
+  """Group logged statements by shape and order them by total time spent"""
+  shapes = {}
+  for entry in entries:
+    sql = normalize(entry['sql'])
+    shape = shapes.setdefault(sql, {
+      'sql': sql,
+      'count': 0,
+      'total_ms': 0.0,
+      'max_ms': 0.0,
+      'routes': set(),
+      'plan': None
+    })
+    shape['count'] += 1
+    shape['total_ms'] += entry['duration_ms']
+    shape['routes'].add(entry.get('route'))
+    if entry['duration_ms'] >= shape['max_ms']:
+      shape['max_ms'] = entry['duration_ms']
+      shape['plan'] = entry.get('plan')
+
+  ranked = sorted(shapes.values(), key=lambda shape: shape['total_ms'], reverse=True)[:top]
+  for shape in ranked:
+    shape['mean_ms'] = shape['total_ms'] / shape['count']
+    shape['routes'] = sorted(route for route in shape['routes'] if route)
+    shape['warnings'] = [step.strip() for step in shape['plan'] or [] if step.strip().startswith(PLAN_WARNINGS)]
+  return ranked
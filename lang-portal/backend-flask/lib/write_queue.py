@@ -0,0 +1,241 @@
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from queue import Queue, Empty, Full
+
+class QueueFull(Exception):
+  pass
+
+class WriteTimeout(Exception):
+  """A write was not acknowledged within `ack_timeout`.
+
+  `applied` is False when the write was cancelled before it started, so it
+  will never be stored and the request can be retried; True when the writer
+  had already started it and it may still commit.
+  """
+
+  def __init__(self, message, applied):
+    super().__init__(message)
+    self.applied = applied
+    # Nothing will happen: try again later. Or: the outcome is unknown
+    self.status = 504 if applied else 503
+
+class WriteBehindQueue:
+  """Funnels database writes through one writer thread that group-commits them.
+
+  Callers submit a function taking a cursor; the writer runs queued functions
+  back to back in a single transaction, each inside its own savepoint so one
+  failing write does not undo the others, and commits once `max_batch`
+  writes are collected or `max_delay_ms` has passed since the first one.
+  A write's future only resolves after its transaction has committed, which
+  is the caller's acknowledgment that the write is durable: the writer
+  connection commits with synchronous=FULL whatever the storage profile.
+  """
+
+  def __init__(self, database, max_delay_ms=5, max_batch=256, max_pending=1000, ack_timeout=10.0, on_connect=None):
+    if max_batch < 1 or max_pending < 1:
+      raise ValueError('max_batch and max_pending must be at least 1')
+    self.database = database
+    self.max_delay = max_delay_ms / 1000
+    self.max_batch = max_batch
+    self.max_pending = max_pending
+    self.ack_timeout = ack_timeout
+    self.on_connect = on_connect
+    self._closed = False
+    self._pid = None
+    self._start_lock = threading.Lock()
+    self._stats_lock = threading.Lock()
+    self._queue = Queue(maxsize=max_pending)
+    self._thread = None
+    self._stats = {
+      'submitted': 0,
+      'rejected': 0,
+      'committed': 0,
+      'failed': 0,
+      'commits': 0,
+      'commit_seconds_total': 0.0,
+      'commit_seconds_max': 0.0,
+      'last_commit_seconds': 0.0,
+      'last_batch_size': 0
+    }
+
+  def _ensure_started(self):
+    # The writer thread does not survive a fork, so each process starts its own
+    if self._pid == os.getpid() and self._thread.is_alive():
+      return
+    with self._start_lock:
+      if self._pid == os.getpid() and self._thread.is_alive():
+        return
+      if self._pid != os.getpid():
+        self._queue = Queue(maxsize=self.max_pending)
+      self._pid = os.getpid()
+      self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+      self._thread.start()
+
+  def submit(self, fn):
+    """Queue `fn(cursor)` and return a Future for its result.
+
+    Raises QueueFull when `max_pending` writes are already waiting.
+    """
+    if self._closed:
+      raise QueueFull('write queue is closed')
+    self._ensure_started()
+    future = Future()
+    try:
+      self._queue.put_nowait((fn, future))
+    except Full:
+      with self._stats_lock:
+        self._stats['rejected'] += 1
+      raise QueueFull(f'write queue is full ({self.max_pending} pending writes)')
+    with self._stats_lock:
+      self._stats['submitted'] += 1
+    return future
+
+  def run(self, fn):
+    """Submit `fn(cursor)` and wait until it is committed; returns its result.
+
+    Raises WriteTimeout after `ack_timeout` seconds, cancelling the write if
+    the writer has not started it yet.
+    """
+    future = self.submit(fn)
+    try:
+      return future.result(timeout=self.ack_timeout)
+    except FutureTimeout:
+      if future.cancel():
+        raise WriteTimeout(f'write not committed within {self.ack_timeout}s and cancelled; nothing was recorded, retry later', applied=False)
+      raise WriteTimeout(f'write not acknowledged within {self.ack_timeout}s; it is already running and may still be recorded, do not retry blindly', applied=True)
+
+  def _connect(self):
+    conn = sqlite3.connect(self.database, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    if self.on_connect is not None:
+      self.on_connect(conn)
+    # Acknowledged writes must survive a power failure, which the balanced
+    # (NORMAL) and throughput (OFF) profiles do not guarantee
+    conn.execute('PRAGMA synchronous=FULL')
+    return conn
+
+  def _collect(self, first):
+    # Gather more writes until the batch is full or the first one has waited long enough
+    batch = [first]
+    deadline = time.monotonic() + self.max_delay
+    while len(batch) < self.max_batch:
+      remaining = deadline - time.monotonic()
+      try:
+        batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+      except Empty:
+        break
+    return batch
+
+  def _run(self):
+    conn = self._connect()
+    try:
+      while True:
+        try:
+          first = self._queue.get(timeout=0.5)
+        except Empty:
+          if self._closed:
+            return
+          continue
+        if first is None:
+          return
+        batch = self._collect(first)
+        stop = any(item is None for item in batch)
+        self._commit(conn, [item for item in batch if item is not None])
+        if stop:
+          return
+    finally:
+      conn.close()
+
+  def _commit(self, conn, batch):
+    # Writes whose callers gave up waiting were cancelled; the rest can no
+    # longer be cancelled from here on
+    batch = [(fn, future) for fn, future in batch if future.set_running_or_notify_cancel()]
+    if not batch:
+      return
+    start = time.perf_counter()
+    outcomes = []
+    cursor = conn.cursor()
+    try:
+      cursor.execute('BEGIN IMMEDIATE')
+      for fn, future in batch:
+        cursor.execute('SAVEPOINT write')
+        try:
+          outcomes.append((future, fn(cursor), None))
+          cursor.execute('RELEASE write')
+        except Exception as e:
+          cursor.execute('ROLLBACK TO write')
+          cursor.execute('RELEASE write')
+          outcomes.append((future, None, e))
+      cursor.execute('COMMIT')
+    except Exception as e:
+      # The transaction itself failed, so none of the batch was stored
+      if conn.in_transaction:
+        conn.rollback()
+      for _, future in batch:
+        future.set_exception(e)
+      with self._stats_lock:
+        self._stats['failed'] += len(batch)
+      return
+
+    elapsed = time.perf_counter() - start
+    failed = 0
+    for future, result, error in outcomes:
+      if error is None:
+        future.set_result(result)
+      else:
+        failed += 1
+        future.set_exception(error)
+    with self._stats_lock:
+      self._stats['committed'] += len(outcomes) - failed
+      self._stats['failed'] += failed
+      self._stats['commits'] += 1
+      self._stats['commit_seconds_total'] += elapsed
+      self._stats['commit_seconds_max'] = max(self._stats['commit_seconds_max'], elapsed)
+      self._stats['last_commit_seconds'] = elapsed
+      self._stats['last_batch_size'] = len(outcomes)
+
+  def stats(self):
+    """Queue depth, throughput counters and commit latency"""
+    with self._stats_lock:
+      stats = dict(self._stats)
+    stats['depth'] = self._queue.qsize()
+    stats['max_pending'] = self.max_pending
+    stats['commit_seconds_avg'] = stats['commit_seconds_total'] / stats['commits'] if stats['commits'] else 0.0
+    return stats
+
+  def close(self, timeout=5.0):
+    """Commit what is already queued, then stop the writer thread"""
+    self._closed = True
+    thread = self._thread
+    if thread is not None and thread.is_alive() and self._pid == os.getpid():
+      try:
+        self._queue.put(None, timeout=timeout)
+      except Full:
+        pass
+      thread.join(timeout)
+
+def run_write(app, fn):
+  """Run `fn(cursor)` through the app's write queue, or on the request's connection.
+
+  Without write-behind mode the write is committed on the pooled connection
+  like any other request. Either way it runs under the write lock (BEGIN
+  IMMEDIATE), so what `fn` reads cannot change before it writes, and it has
+  been committed when this returns.
+  """
+  write_queue = getattr(app, 'write_queue', None)
+  if write_queue is not None:
+    return write_queue.run(fn)
+  conn = app.db.get()
+  cursor = app.db.cursor()
+  if not conn.in_transaction:
+    cursor.execute('BEGIN IMMEDIATE')
+  try:
+    result = fn(cursor)
+  except Exception:
+    conn.rollback()
+    raise
+  app.db.commit()
+  return result
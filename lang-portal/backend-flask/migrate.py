@@ -1,31 +1,32 @@
-import sqlite3
+import argparse
 import os
 
-def run_migrations():
-    # Connect to the database
-    db_path = os.path.join(os.path.dirname(__file__), 'words.db')
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    
+from lib.db import Db
+from lib.migrations import MigrationError
+
+def run_migrations(database=None, dry_run=False):
+    # Only migrations not yet recorded in schema_migrations are applied
+    db_path = database or os.path.join(os.path.dirname(__file__), 'words.db')
+    db = Db(database=db_path, pool_size=1)
+
     try:
-        # Get list of migration files
-        migrations_dir = os.path.join(os.path.dirname(__file__), 'sql', 'migrations')
-        migration_files = sorted([f for f in os.listdir(migrations_dir) if f.endswith('.sql')])
-        
-        # Run each migration
-        for migration_file in migration_files:
-            print(f"Running migration: {migration_file}")
-            with open(os.path.join(migrations_dir, migration_file)) as f:
-                migration_sql = f.read()
-                conn.executescript(migration_sql)
-                conn.commit()
-        
-        print("Migrations completed successfully")
-    except Exception as e:
+        pending = db.migrate(dry_run=dry_run)
+        if not pending:
+            print("Database is up to date")
+        for migration in pending:
+            if dry_run:
+                print(f"Pending migration: {migration.filename}")
+            else:
+                print(f"Applied migration: {migration.filename}")
+    except MigrationError as e:
         print(f"Error running migrations: {str(e)}")
-        conn.rollback()
+        raise SystemExit(1)
     finally:
-        conn.close()
+        db.shutdown()
 
 if __name__ == '__main__':
-    run_migrations()
+    parser = argparse.ArgumentParser(description='Apply pending migrations from sql/migrations')
+    parser.add_argument('--database', help='path to the SQLite database (default: words.db)')
+    parser.add_argument('--dry-run', action='store_true', help='list pending migrations without applying them')
+    args = parser.parse_args()
+    run_migrations(database=args.database, dry_run=args.dry_run)
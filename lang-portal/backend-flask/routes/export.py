@@ -0,0 +1,107 @@
+from flask import request, jsonify, Response
+from flask_cors import cross_origin
+import json
+import zlib
+
+# Rows fetched from SQLite per chunk while streaming an export
+EXPORT_FETCH_SIZE = 1000
+
+# Exportable tables: the columns of each NDJSON line, the key `since=<id>`
+# filters on (the rowid, so every export can resume after its last line) and
+# the timestamp `since=<datetime>` filters on, if the table has one
+EXPORTS = {
+  'words': {
+    'columns': 'id, kanji, romaji, english, parts',
+    'id': 'id',
+    'timestamp': None
+  },
+  'word_groups': {
+    'columns': 'rowid AS id, word_id, group_id',
+    'id': 'rowid',
+    'timestamp': None
+  },
+  'study_sessions': {
+    'columns': 'id, group_id, study_activity_id, created_at',
+    'id': 'id',
+    'timestamp': 'created_at'
+  },
+  'word_review_items': {
+    'columns': 'id, word_id, study_session_id, correct, created_at',
+    'id': 'id',
+    'timestamp': 'created_at'
+  }
+}
+
+def export_line(table, row):
+  record = dict(row)
+  if table == 'words':
+    record['parts'] = json.loads(record['parts'])
+  elif table == 'word_review_items':
+    record['correct'] = bool(record['correct'])
+  return json.dumps(record, ensure_ascii=False) + '\n'
+
+def load(app):
+  # Endpoint: GET /export/<table>.ndjson streams a whole table, one JSON
+  # object per line, in id order. `since` is either an id (rows after it)
+  # or, for tables with a created_at column, a timestamp (rows from then on).
+  @app.route('/export/<table>.ndjson', methods=['GET'])
+  @cross_origin()
+  def export_table(table):
+    export = EXPORTS.get(table)
+    if export is None:
+      return jsonify({"error": f"Unknown export {table}, expected one of {', '.join(EXPORTS)}"}), 404
+
+    conditions = []
+    params = []
+    since = request.args.get('since')
+    if since:
+      if since.isdigit():
+        conditions.append(f"{export['id']} > ?")
+        params.append(int(since))
+      elif export['timestamp']:
+        # Parse it the way the filter will; an unparsable timestamp would
+        # otherwise silently match nothing
+        cursor = app.db.cursor()
+        cursor.execute('SELECT datetime(?)', (since,))
+        timestamp = cursor.fetchone()[0]
+        if timestamp is None:
+          return jsonify({"error": f"since must be an id or a timestamp, got {since!r}"}), 400
+        conditions.append(f"{export['timestamp']} >= ?")
+        params.append(timestamp)
+      else:
+        return jsonify({"error": f"since must be an id for {table}"}), 400
+
+    # Honours q-values, so `gzip;q=0` turns compression off
+    gzip = request.accept_encodings['gzip'] > 0
+
+    def generate():
+      # One page of rows per chunk, each on a connection borrowed only for
+      # that query: a slow download must not hold a pooled connection while
+      # the client reads. Paging on the id keeps every row in exactly one page.
+      compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+      page_conditions, page_params = conditions, params
+      while True:
+        where = f"WHERE {' AND '.join(page_conditions)}" if page_conditions else ''
+        with app.db.borrow() as conn:
+          rows = conn.execute(
+            f"SELECT {export['columns']} FROM {table} {where} ORDER BY {export['id']} LIMIT ?",
+            page_params + [EXPORT_FETCH_SIZE]
+          ).fetchall()
+        if not rows:
+          break
+        page_conditions = conditions + [f"{export['id']} > ?"]
+        page_params = params + [rows[-1]['id']]
+        chunk = ''.join(export_line(table, row) for row in rows).encode('utf-8')
+        if compressor:
+          chunk = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield chunk
+        if len(rows) < EXPORT_FETCH_SIZE:
+          break
+      if compressor:
+        yield compressor.flush()
+
+    response = Response(generate(), mimetype='application/x-ndjson')
+    response.headers['Vary'] = 'Accept-Encoding'
+    if gzip:
+      response.headers['Content-Encoding'] = 'gzip'
+    return response
@@ -1,10 +1,57 @@
 from flask import request, jsonify, g
 from flask_cors import cross_origin
+import io
 import json
+from werkzeug.exceptions import HTTPException
+
+from lib.jsonstream import batched, iter_json_array, iter_ndjson
+from lib.pagination import CursorError, decode_cursor, encode_cursor, keyset_condition, wants_total
+from lib.response_cache import cached
+from lib.rows import fetch_dicts
+from lib.sampling import STRATEGIES, SampleTables
+from lib.schedule import due_words, next_due_at
+from lib.write_queue import QueueFull, WriteTimeout, run_write
+from routes.words import WORD_FIELDS
+
+# Sortable fields of GET /groups/:id/words and the (column, id column) pair each one sorts by
+WORD_SORT_COLUMNS = {
+  'kanji': ('w.kanji', 'w.id'),
+  'romaji': ('w.romaji', 'w.id'),
+  'english': ('w.english', 'w.id'),
+  'correct_count': ('wr.correct_count', 'wr.word_id'),
+  'wrong_count': ('wr.wrong_count', 'wr.word_id'),
+  'accuracy': ('wr.accuracy', 'wr.word_id')
+}
+
+# Words per transaction when importing through POST /groups/<id>/words:import
+IMPORT_BATCH_SIZE = 1000
+
+# Default and largest batch of GET /groups/<id>/due
+DUE_LIMIT = 20
+MAX_DUE_LIMIT = 100
+
+# Default and largest sample of GET /groups/<id>/sample
+SAMPLE_SIZE = 10
+MAX_SAMPLE_SIZE = 100
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+def validate_import_word(word, position):
+  """Check one uploaded word has the shape of seed/data_verbs.json entries"""
+  if not isinstance(word, dict):
+    raise ValueError(f'word {position}: expected an object')
+  for field in ('kanji', 'romaji', 'english'):
+    if not isinstance(word.get(field), str) or not word[field].strip():
+      raise ValueError(f'word {position}: {field} must be a non-empty string')
+  word.setdefault('parts', [])
+  if not isinstance(word['parts'], list):
+    raise ValueError(f'word {position}: parts must be an array')
+  return word
 
 def load(app):
   @app.route('/groups', methods=['GET'])
   @cross_origin()
+  @cached
   def get_groups():
     try:
       cursor = app.db.cursor()
@@ -33,22 +80,13 @@ def load(app):
         LIMIT ? OFFSET ?
       ''', (groups_per_page, offset))
 
-      groups = cursor.fetchall()
+      groups_data = fetch_dicts(cursor, {"id": "id", "group_name": "name", "word_count": "words_count"})
 
       # Query the total number of groups
       cursor.execute('SELECT COUNT(*) FROM groups')
       total_groups = cursor.fetchone()[0]
       total_pages = (total_groups + groups_per_page - 1) // groups_per_page
 
-      # Format the response
-      groups_data = []
-      for group in groups:
-        groups_data.append({
-          "id": group["id"],
-          "group_name": group["name"],
-          "word_count": group["words_count"]
-        })
-
       # Return groups and pagination metadata
       return jsonify({
         'groups': groups_data,
@@ -60,6 +98,7 @@ def load(app):
 
   @app.route('/groups/<int:id>', methods=['GET'])
   @cross_origin()
+  @cached
   def get_group(id):
     try:
       cursor = app.db.cursor()
@@ -83,27 +122,44 @@ def load(app):
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
+  # Pass `cursor` (empty for the first page) instead of `page` for keyset
+  # pagination; totals are then only counted when include_total=true.
   @app.route('/groups/<int:id>/words', methods=['GET'])
   @cross_origin()
+  @cached
   def get_group_words(id):
     try:
       cursor = app.db.cursor()
       
-      # Get pagination parameters
-      page = int(request.args.get('page', 1))
       words_per_page = 10
-      offset = (page - 1) * words_per_page
+      keyset = 'cursor' in request.args
 
       # Get sorting parameters
       sort_by = request.args.get('sort_by', 'kanji')
       order = request.args.get('order', 'asc')
 
       # Validate sort parameters
-      valid_columns = ['kanji', 'romaji', 'english', 'correct_count', 'wrong_count']
-      if sort_by not in valid_columns:
+      if sort_by not in WORD_SORT_COLUMNS:
         sort_by = 'kanji'
       if order not in ['asc', 'desc']:
         order = 'asc'
+      sort_column, id_column = WORD_SORT_COLUMNS[sort_by]
+
+      keyset_filter = ''
+      params = [id]
+      if keyset:
+        page = None
+        if request.args['cursor']:
+          try:
+            params.extend(decode_cursor(request.args['cursor'], sort_by, order))
+          except CursorError as e:
+            return jsonify({"error": str(e)}), 400
+          keyset_filter = 'AND ' + keyset_condition(sort_column, id_column, order)
+        offset = 0
+      else:
+        # Get pagination parameters
+        page = int(request.args.get('page', 1))
+        offset = (page - 1) * words_per_page
 
       # First, check if the group exists
       cursor.execute('SELECT name FROM groups WHERE id = ?', (id,))
@@ -111,53 +167,52 @@ def load(app):
       if not group:
         return jsonify({"error": "Group not found"}), 404
 
-      # Query to fetch words with pagination and sorting
+      # Query to fetch words with pagination and sorting; id breaks ties
       cursor.execute(f'''
-        SELECT w.*, 
-               COALESCE(wr.correct_count, 0) as correct_count,
-               COALESCE(wr.wrong_count, 0) as wrong_count
+        SELECT w.id, w.kanji, w.romaji, w.english,
+            wr.correct_count, wr.wrong_count, {sort_column} AS sort_value
         FROM words w
         JOIN word_groups wg ON w.id = wg.word_id
-        LEFT JOIN word_reviews wr ON w.id = wr.word_id
-        WHERE wg.group_id = ?
-        ORDER BY {sort_by} {order}
+        JOIN word_reviews wr ON w.id = wr.word_id
+        WHERE wg.group_id = ? {keyset_filter}
+        ORDER BY {sort_column} {order}, {id_column} {order}
         LIMIT ? OFFSET ?
-      ''', (id, words_per_page, offset))
+      ''', (*params, words_per_page, offset))
       
-      words = cursor.fetchall()
-
-      # Get total words count for pagination
-      cursor.execute('''
-        SELECT COUNT(*) 
-        FROM word_groups 
-        WHERE group_id = ?
-      ''', (id,))
-      total_words = cursor.fetchone()[0]
-      total_pages = (total_words + words_per_page - 1) // words_per_page
-
-      # Format the response
-      words_data = []
-      for word in words:
-        words_data.append({
-          "id": word["id"],
-          "kanji": word["kanji"],
-          "romaji": word["romaji"],
-          "english": word["english"],
-          "correct_count": word["correct_count"],
-          "wrong_count": word["wrong_count"]
-        })
+      words_data = fetch_dicts(cursor, {**WORD_FIELDS, 'sort_value': 'sort_value'})
 
-      return jsonify({
+      response = {
         'words': words_data,
-        'total_pages': total_pages,
-        'current_page': page
-      })
+        'next_cursor': None
+      }
+      if len(words_data) == words_per_page:
+        last = words_data[-1]
+        response['next_cursor'] = encode_cursor(sort_by, order, [last['sort_value'], last['id']])
+      # Same shape as GET /words: the sort value only feeds the cursor
+      for word in words_data:
+        del word['sort_value']
+
+      if not keyset or wants_total(request.args):
+        # Get total words count for pagination
+        cursor.execute('''
+          SELECT COUNT(*) 
+          FROM word_groups 
+          WHERE group_id = ?
+        ''', (id,))
+        total_words = cursor.fetchone()[0]
+        response['total_pages'] = (total_words + words_per_page - 1) // words_per_page
+        response['total_words'] = total_words
+      if not keyset:
+        response['current_page'] = page
+
+      return jsonify(response)
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
   # todo GET /groups/:id/words/raw
   @app.route('/groups/<int:id>/words/raw', methods=['GET'])
   @cross_origin()
+  @cached
   def get_group_words_raw(id):
       try:
           cursor = app.db.cursor()
@@ -176,20 +231,131 @@ def load(app):
               WHERE wg.group_id = ?
           ''', (id,))
           
-          words = cursor.fetchall()
-          words_data = [{
-              "id": word["id"],
-              "kanji": word["kanji"],
-              "romaji": word["romaji"],
-              "english": word["english"]
-          } for word in words]
+          words_data = fetch_dicts(cursor, ['id', 'kanji', 'romaji', 'english'])
 
           return jsonify(words_data)
       except Exception as e:
           return jsonify({"error": str(e)}), 500
 
+  # Endpoint: GET /groups/:id/due returns the next words to study from the
+  # review schedule: overdue ones first, then (unless include_new=false)
+  # words never reviewed. Not cached, since words fall due as time passes.
+  @app.route('/groups/<int:id>/due', methods=['GET'])
+  @cross_origin()
+  def get_group_due_words(id):
+    try:
+      try:
+        limit = int(request.args.get('limit', DUE_LIMIT))
+      except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+      limit = max(1, min(limit, MAX_DUE_LIMIT))
+      include_new = request.args.get('include_new', 'true').lower() != 'false'
+
+      cursor = app.db.cursor()
+      cursor.execute('SELECT id FROM groups WHERE id = ?', (id,))
+      if not cursor.fetchone():
+        return jsonify({"error": "Group not found"}), 404
+
+      return jsonify({
+        "group_id": id,
+        "words": due_words(cursor, id, limit, include_new=include_new),
+        "next_due_at": next_due_at(cursor, id)
+      })
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  # Endpoint: GET /groups/:id/sample returns k distinct random words of the
+  # group, drawn uniformly or in proportion to their error rate
+  # (strategy=error_weighted) from the group's alias table.
+  if not hasattr(app, 'sample_tables'):
+    app.sample_tables = SampleTables()
+
+  @app.route('/groups/<int:id>/sample', methods=['GET'])
+  @cross_origin()
+  def get_group_sample(id):
+    try:
+      try:
+        k = int(request.args.get('k', SAMPLE_SIZE))
+      except ValueError:
+        return jsonify({"error": "k must be an integer"}), 400
+      k = max(1, min(k, MAX_SAMPLE_SIZE))
+      strategy = request.args.get('strategy', 'uniform')
+      if strategy not in STRATEGIES:
+        return jsonify({"error": f"strategy must be one of {', '.join(STRATEGIES)}"}), 400
+
+      cursor = app.db.cursor()
+      table = app.sample_tables.get(cursor, id, strategy)
+      if table is None:
+        return jsonify({"error": "Group not found"}), 404
+
+      ids = table.sample(k)
+      cursor.execute(f'''
+        SELECT id, kanji, romaji, english
+        FROM words
+        WHERE id IN ({','.join('?' * len(ids))})
+      ''', ids)
+      words = {word['id']: word for word in fetch_dicts(cursor, ['id', 'kanji', 'romaji', 'english'])}
+
+      return jsonify({
+        "group_id": id,
+        "strategy": strategy,
+        "words": [words[word_id] for word_id in ids if word_id in words]
+      })
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  # Endpoint: POST /groups/:id/words:import adds vocabulary to a group from
+  # a JSON array (the shape of seed/data_verbs.json) or NDJSON body. The body
+  # is parsed as it arrives and stored IMPORT_BATCH_SIZE words per
+  # transaction; words already in the database (same kanji and romaji) are
+  # updated and linked to the group instead of duplicated.
+  @app.route('/groups/<int:id>/words:import', methods=['POST'])
+  @cross_origin()
+  def import_group_words(id):
+    totals = {'received': 0, 'inserted': 0, 'updated': 0, 'linked': 0}
+    try:
+      cursor = app.db.cursor()
+
+      cursor.execute('SELECT id FROM groups WHERE id = ?', (id,))
+      if not cursor.fetchone():
+        return jsonify({"error": "Group not found"}), 404
+
+      body = io.TextIOWrapper(io.BufferedReader(request.stream), encoding='utf-8')
+      if request.mimetype in NDJSON_TYPES:
+        words = iter_ndjson(body)
+      else:
+        words = iter_json_array(body)
+
+      try:
+        for batch in batched(words, IMPORT_BATCH_SIZE):
+          batch = [validate_import_word(word, totals['received'] + i + 1) for i, word in enumerate(batch)]
+          # Each batch is looked up and written under the write lock, so a
+          # concurrent import of the same words cannot insert them twice
+          counts = run_write(app, lambda cursor: app.db.upsert_words(cursor, id, batch))
+          totals['received'] += len(batch)
+          for key, value in counts.items():
+            totals[key] += value
+      except (ValueError, UnicodeDecodeError) as e:
+        # Earlier batches are already committed; report how far the import got
+        return jsonify({"error": f"Invalid import: {e}", **totals}), 400
+      except HTTPException as e:
+        # The body was cut off or is too large: the batch being read is dropped
+        return jsonify({"error": e.description, **totals}), e.code
+
+      # words_count was kept current by the word_groups triggers
+      cursor.execute('SELECT words_count FROM groups WHERE id = ?', (id,))
+
+      return jsonify({**totals, "words_count": cursor.fetchone()[0]}), 201
+    except QueueFull as e:
+      return jsonify({"error": str(e), **totals}), 503
+    except WriteTimeout as e:
+      return jsonify({"error": str(e), **totals}), e.status
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
   @app.route('/groups/<int:id>/study_sessions', methods=['GET'])
   @cross_origin()
+  @cached
   def get_group_study_sessions(id):
     try:
       cursor = app.db.cursor()
@@ -224,26 +390,19 @@ def load(app):
       total_sessions = cursor.fetchone()[0]
       total_pages = (total_sessions + sessions_per_page - 1) // sessions_per_page
 
-      # Get study sessions for this group with dynamic calculations
+      # Get study sessions for this group with their review rollups
       cursor.execute(f'''
         SELECT 
           s.id,
           s.group_id,
           s.study_activity_id,
           s.created_at as start_time,
-          (
-            SELECT MAX(created_at)
-            FROM word_review_items
-            WHERE study_session_id = s.id
-          ) as last_activity_time,
+          st.end_time as last_activity_time,
           a.name as activity_name,
           g.name as group_name,
-          (
-            SELECT COUNT(*)
-            FROM word_review_items
-            WHERE study_session_id = s.id
-          ) as review_count
+          st.review_count
         FROM study_sessions s
+        JOIN study_session_stats st ON st.study_session_id = s.id
         JOIN study_activities a ON s.study_activity_id = a.id
         JOIN groups g ON s.group_id = g.id
         WHERE s.group_id = ?
@@ -251,25 +410,17 @@ def load(app):
         LIMIT ? OFFSET ?
       ''', (id, sessions_per_page, offset))
       
-      sessions = cursor.fetchall()
-      sessions_data = []
-      
-      for session in sessions:
-        # If there's no last_activity_time, use start_time + 30 minutes
-        end_time = session["last_activity_time"]
-        if not end_time:
-            end_time = cursor.execute('SELECT datetime(?, "+30 minutes")', (session["start_time"],)).fetchone()[0]
-        
-        sessions_data.append({
-          "id": session["id"],
-          "group_id": session["group_id"],
-          "group_name": session["group_name"],
-          "study_activity_id": session["study_activity_id"],
-          "activity_name": session["activity_name"],
-          "start_time": session["start_time"],
-          "end_time": end_time,
-          "review_items_count": session["review_count"]
-        })
+      sessions_data = fetch_dicts(cursor, {
+        "id": "id",
+        "group_id": "group_id",
+        "group_name": "group_name",
+        "study_activity_id": "study_activity_id",
+        "activity_name": "activity_name",
+        "start_time": "start_time",
+        # Latest review, or start time + 30 minutes before the first one
+        "end_time": "last_activity_time",
+        "review_items_count": "review_count"
+      })
 
       return jsonify({
         'study_sessions': sessions_data,
@@ -0,0 +1,8 @@
+from flask import Response
+
+def load(app):
+  # Endpoint: GET /metrics - request and SQL timings of this process in the
+  # Prometheus text format (see lib/metrics.py)
+  @app.route('/metrics', methods=['GET'])
+  def get_metrics():
+    return Response(app.metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
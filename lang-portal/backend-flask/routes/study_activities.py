@@ -2,9 +2,14 @@ from flask import jsonify, request
 from flask_cors import cross_origin
 import math
 
+from lib.rows import fetch_dicts
+from lib.response_cache import cached
+from routes.study_sessions import SESSION_FIELDS
+
 def load(app):
     @app.route('/api/study-activities', methods=['GET'])
     @cross_origin()
+    @cached
     def get_study_activities():
         cursor = app.db.cursor()
         cursor.execute('SELECT id, name, url, preview_url FROM study_activities')
@@ -19,6 +24,7 @@ def load(app):
 
     @app.route('/api/study-activities/<int:id>', methods=['GET'])
     @cross_origin()
+    @cached
     def get_study_activity(id):
         cursor = app.db.cursor()
         cursor.execute('SELECT id, name, url, preview_url FROM study_activities WHERE id = ?', (id,))
@@ -36,6 +42,7 @@ def load(app):
 
     @app.route('/api/study-activities/<int:id>/sessions', methods=['GET'])
     @cross_origin()
+    @cached
     def get_study_activity_sessions(id):
         cursor = app.db.cursor()
         
@@ -67,29 +74,20 @@ def load(app):
                 sa.name as activity_name,
                 ss.created_at,
                 ss.study_activity_id as activity_id,
-                COUNT(wri.id) as review_items_count
+                st.end_time,
+                st.review_count as review_items_count
             FROM study_sessions ss
+            JOIN study_session_stats st ON st.study_session_id = ss.id
             JOIN groups g ON g.id = ss.group_id
             JOIN study_activities sa ON sa.id = ss.study_activity_id
-            LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
             WHERE ss.study_activity_id = ?
-            GROUP BY ss.id, ss.group_id, g.name, sa.name, ss.created_at, ss.study_activity_id
             ORDER BY ss.created_at DESC
             LIMIT ? OFFSET ?
         ''', (id, per_page, offset))
-        sessions = cursor.fetchall()
+        sessions = fetch_dicts(cursor, SESSION_FIELDS)
 
         return jsonify({
-            'items': [{
-                'id': session['id'],
-                'group_id': session['group_id'],
-                'group_name': session['group_name'],
-                'activity_id': session['activity_id'],
-                'activity_name': session['activity_name'],
-                'start_time': session['created_at'],
-                'end_time': session['created_at'],  # For now, just use the same time since we don't track end time
-                'review_items_count': session['review_items_count']
-            } for session in sessions],
+            'items': sessions,
             'total': total_count,
             'page': page,
             'per_page': per_page,
@@ -98,6 +96,7 @@ def load(app):
 
     @app.route('/api/study-activities/<int:id>/launch', methods=['GET'])
     @cross_origin()
+    @cached
     def get_study_activity_launch_data(id):
         cursor = app.db.cursor()
         
@@ -3,6 +3,22 @@ from flask_cors import cross_origin
 from datetime import datetime
 import math
 
+from lib.reviews import MAX_REVIEW_BATCH, record_reviews, reset_counters, start_session, validate_reviews
+from lib.rows import fetch_dicts
+from lib.write_queue import QueueFull, WriteTimeout, run_write
+
+# Fields of each session in the session listings and the columns they come from
+SESSION_FIELDS = {
+  'id': 'id',
+  'group_id': 'group_id',
+  'group_name': 'group_name',
+  'activity_id': 'activity_id',
+  'activity_name': 'activity_name',
+  'start_time': 'created_at',
+  'end_time': 'end_time',
+  'review_items_count': 'review_items_count'
+}
+
 def load(app):
   # todo /study_sessions POST
   @app.route('/api/study-sessions', methods=['POST'])
@@ -10,18 +26,12 @@ def load(app):
   def create_study_session():
     try:
       data = request.get_json()
-      cursor = app.db.cursor()
       
-      # Create new study session
-      cursor.execute('''
-        INSERT INTO study_sessions (group_id, study_activity_id, created_at)
-        VALUES (?, ?, datetime('now'))
-      ''', (data['group_id'], data['study_activity_id']))
-      
-      session_id = cursor.lastrowid
-      app.db.commit()
+      # Create new study session (and count it in the dashboard stats)
+      session_id = run_write(app, lambda cursor: start_session(cursor, data['group_id'], data['study_activity_id']))
       
       # Return the created session
+      cursor = app.db.cursor()
       cursor.execute('''
         SELECT 
           ss.id,
@@ -49,6 +59,10 @@ def load(app):
         'review_items_count': 0  # New session has no reviews yet
       }), 201
       
+    except QueueFull as e:
+      return jsonify({"error": str(e)}), 503
+    except WriteTimeout as e:
+      return jsonify({"error": str(e)}), e.status
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
@@ -66,13 +80,12 @@ def load(app):
       # Get total count
       cursor.execute('''
         SELECT COUNT(*) as count 
-        FROM study_sessions ss
-        JOIN groups g ON g.id = ss.group_id
-        JOIN study_activities sa ON sa.id = ss.study_activity_id
+        FROM study_sessions
       ''')
       total_count = cursor.fetchone()['count']
 
-      # Get paginated sessions
+      # Get paginated sessions, walking the created_at index and reading
+      # each session's review rollup
       cursor.execute('''
         SELECT 
           ss.id,
@@ -81,28 +94,19 @@ def load(app):
           sa.id as activity_id,
           sa.name as activity_name,
           ss.created_at,
-          COUNT(wri.id) as review_items_count
+          st.end_time,
+          st.review_count as review_items_count
         FROM study_sessions ss
+        JOIN study_session_stats st ON st.study_session_id = ss.id
         JOIN groups g ON g.id = ss.group_id
         JOIN study_activities sa ON sa.id = ss.study_activity_id
-        LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
-        GROUP BY ss.id
         ORDER BY ss.created_at DESC
         LIMIT ? OFFSET ?
       ''', (per_page, offset))
-      sessions = cursor.fetchall()
+      sessions = fetch_dicts(cursor, SESSION_FIELDS)
 
       return jsonify({
-        'items': [{
-          'id': session['id'],
-          'group_id': session['group_id'],
-          'group_name': session['group_name'],
-          'activity_id': session['activity_id'],
-          'activity_name': session['activity_name'],
-          'start_time': session['created_at'],
-          'end_time': session['created_at'],  # For now, just use the same time since we don't track end time
-          'review_items_count': session['review_items_count']
-        } for session in sessions],
+        'items': sessions,
         'total': total_count,
         'page': page,
         'per_page': per_page,
@@ -126,13 +130,13 @@ def load(app):
           sa.id as activity_id,
           sa.name as activity_name,
           ss.created_at,
-          COUNT(wri.id) as review_items_count
+          st.end_time,
+          st.review_count as review_items_count
         FROM study_sessions ss
+        JOIN study_session_stats st ON st.study_session_id = ss.id
         JOIN groups g ON g.id = ss.group_id
         JOIN study_activities sa ON sa.id = ss.study_activity_id
-        LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
         WHERE ss.id = ?
-        GROUP BY ss.id
       ''', (id,))
       
       session = cursor.fetchone()
@@ -158,7 +162,14 @@ def load(app):
         LIMIT ? OFFSET ?
       ''', (id, per_page, offset))
       
-      words = cursor.fetchall()
+      words = fetch_dicts(cursor, {
+        'id': 'id',
+        'kanji': 'kanji',
+        'romaji': 'romaji',
+        'english': 'english',
+        'correct_count': 'session_correct_count',
+        'wrong_count': 'session_wrong_count'
+      })
 
       # Get total count of words
       cursor.execute('''
@@ -178,17 +189,10 @@ def load(app):
           'activity_id': session['activity_id'],
           'activity_name': session['activity_name'],
           'start_time': session['created_at'],
-          'end_time': session['created_at'],  # For now, just use the same time
+          'end_time': session['end_time'],
           'review_items_count': session['review_items_count']
         },
-        'words': [{
-          'id': word['id'],
-          'kanji': word['kanji'],
-          'romaji': word['romaji'],
-          'english': word['english'],
-          'correct_count': word['session_correct_count'],
-          'wrong_count': word['session_wrong_count']
-        } for word in words],
+        'words': words,
         'total': total_count,
         'page': page,
         'per_page': per_page,
@@ -202,19 +206,65 @@ def load(app):
   @cross_origin()
   def submit_session_review(id):
     try:
-      data = request.get_json()
-      cursor = app.db.cursor()
-      
-      # Insert the review item
-      cursor.execute('''
-        INSERT INTO word_review_items (study_session_id, word_id, correct, created_at)
-        VALUES (?, ?, ?, datetime('now'))
-      ''', (id, data['word_id'], data['correct']))
-      
-      app.db.commit()
+      data = request.get_json(silent=True)
+
+      # The same checks as a batch of one: nothing is recorded for a
+      # missing session or word
+      session_found, reviews = validate_reviews(app.db.cursor(), id, [data])
+      if not session_found:
+        return jsonify({"error": "Study session not found"}), 404
+      if 'error' in reviews[0]:
+        return jsonify({"error": reviews[0]['error']}), 400
+
+      # Insert the review item and update the word's counters in one transaction
+      run_write(app, lambda cursor: record_reviews(cursor, id, reviews))
       
       return jsonify({"message": "Review submitted successfully"}), 201
       
+    except QueueFull as e:
+      return jsonify({"error": str(e)}), 503
+    except WriteTimeout as e:
+      return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  # Endpoint: POST /api/study-sessions/:id/reviews with a JSON array of
+  # {word_id, correct, answered_at} recorded together in one transaction.
+  # The batch is all-or-nothing: if any item is invalid nothing is stored.
+  @app.route('/api/study-sessions/<int:id>/reviews', methods=['POST'])
+  @cross_origin()
+  def submit_session_reviews(id):
+    try:
+      data = request.get_json(silent=True)
+      if not isinstance(data, list) or not data:
+        return jsonify({"error": "Request body must be a non-empty JSON array of reviews"}), 400
+      if len(data) > MAX_REVIEW_BATCH:
+        return jsonify({"error": f"At most {MAX_REVIEW_BATCH} reviews can be submitted at once"}), 400
+
+      cursor = app.db.cursor()
+
+      # Validate the whole batch (session and every word) in one query
+      session_found, results = validate_reviews(cursor, id, data)
+      if not session_found:
+        return jsonify({"error": "Study session not found"}), 404
+      if any('error' in result for result in results):
+        return jsonify({
+          "error": "Invalid reviews, nothing was recorded",
+          "results": [{"index": i, **result} for i, result in enumerate(results)]
+        }), 400
+
+      # Insert the batch and update the derived counters with a single commit
+      run_write(app, lambda cursor: record_reviews(cursor, id, results))
+
+      return jsonify({
+        "message": f"{len(results)} reviews submitted successfully",
+        "results": [{"index": i, "status": "recorded", **result} for i, result in enumerate(results)]
+      }), 201
+
+    except QueueFull as e:
+      return jsonify({"error": str(e)}), 503
+    except WriteTimeout as e:
+      return jsonify({"error": str(e)}), e.status
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
@@ -222,16 +272,22 @@ def load(app):
   @cross_origin()
   def reset_study_sessions():
     try:
-      cursor = app.db.cursor()
-      
-      # First delete all word review items since they have foreign key constraints
-      cursor.execute('DELETE FROM word_review_items')
-      
-      # Then delete all study sessions
-      cursor.execute('DELETE FROM study_sessions')
+      def reset(cursor):
+        # First delete all word review items since they have foreign key constraints
+        cursor.execute('DELETE FROM word_review_items')
+        
+        # Then delete all study sessions
+        cursor.execute('DELETE FROM study_sessions')
+
+        # And zero the counters derived from them
+        reset_counters(cursor)
       
-      app.db.commit()
+      run_write(app, reset)
       
       return jsonify({"message": "Study history cleared successfully"}), 200
+    except QueueFull as e:
+      return jsonify({"error": str(e)}), 503
+    except WriteTimeout as e:
+      return jsonify({"error": str(e)}), e.status
     except Exception as e:
       return jsonify({"error": str(e)}), 500
\ No newline at end of file
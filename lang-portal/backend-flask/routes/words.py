@@ -2,77 +2,216 @@ from flask import request, jsonify, g
 from flask_cors import cross_origin
 import json
 
+from lib.rows import fetch_dicts
+from lib.pagination import CursorError, decode_cursor, encode_cursor, keyset_condition, wants_total
+from lib.response_cache import cached
+from lib.fuzzy import DEFAULT_THRESHOLD, fuzzy_search
+from lib.search import match_query, rank_expression
+
+# Sortable fields of GET /words and the (column, id column) pair each one
+# sorts by, chosen so that every sort can walk an index
+SORT_COLUMNS = {
+  'kanji': ('w.kanji', 'w.id'),
+  'romaji': ('w.romaji', 'w.id'),
+  'english': ('w.english', 'w.id'),
+  'correct_count': ('r.correct_count', 'r.word_id'),
+  'wrong_count': ('r.wrong_count', 'r.word_id'),
+  'accuracy': ('r.accuracy', 'r.word_id')
+}
+
+# Keys of a word in GET /words, /words/search and /groups/<id>/words, and their columns
+WORD_FIELDS = {
+  'id': 'id',
+  'kanji': 'kanji',
+  'romaji': 'romaji',
+  'english': 'english',
+  'correct_count': 'correct_count',
+  'wrong_count': 'wrong_count'
+}
+
 def load(app):
   # Endpoint: GET /words with pagination (50 words per page)
+  # Pass `cursor` (empty for the first page) instead of `page` for keyset
+  # pagination; totals are then only counted when include_total=true.
   @app.route('/words', methods=['GET'])
   @cross_origin()
+  @cached
   def get_words():
     try:
       cursor = app.db.cursor()
 
-      # Get the current page number from query parameters (default is 1)
-      page = int(request.args.get('page', 1))
-      # Ensure page number is positive
-      page = max(1, page)
       words_per_page = 50
-      offset = (page - 1) * words_per_page
+      keyset = 'cursor' in request.args
 
       # Get sorting parameters from the query string
       sort_by = request.args.get('sort_by', 'kanji')  # Default to sorting by 'kanji'
       order = request.args.get('order', 'asc')  # Default to ascending order
 
       # Validate sort_by and order
-      valid_columns = ['kanji', 'romaji', 'english', 'correct_count', 'wrong_count']
-      if sort_by not in valid_columns:
+      if sort_by not in SORT_COLUMNS:
         sort_by = 'kanji'
       if order not in ['asc', 'desc']:
         order = 'asc'
+      sort_column, id_column = SORT_COLUMNS[sort_by]
+
+      # Optional accuracy range (share of correct answers, 0 to 1)
+      filters = []
+      filter_params = []
+      for arg, operator in (('min_accuracy', '>='), ('max_accuracy', '<=')):
+        if arg in request.args:
+          try:
+            filter_params.append(float(request.args[arg]))
+          except ValueError:
+            return jsonify({"error": f"{arg} must be a number"}), 400
+          filters.append(f'r.accuracy {operator} ?')
+
+      conditions = list(filters)
+      params = list(filter_params)
+      if keyset:
+        page = None
+        if request.args['cursor']:
+          try:
+            params.extend(decode_cursor(request.args['cursor'], sort_by, order))
+          except CursorError as e:
+            return jsonify({"error": str(e)}), 400
+          conditions.append(keyset_condition(sort_column, id_column, order))
+        offset = 0
+      else:
+        # Get the current page number from query parameters (default is 1)
+        page = int(request.args.get('page', 1))
+        # Ensure page number is positive
+        page = max(1, page)
+        offset = (page - 1) * words_per_page
+
+      where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
 
-      # Query to fetch words with sorting
+      # Query to fetch words with sorting; id breaks ties so pages are stable.
+      # Every word has a word_reviews row, so the inner join lets the planner
+      # drive the query from whichever table's index matches the sort.
       cursor.execute(f'''
-        SELECT w.id, w.kanji, w.romaji, w.english, 
-            COALESCE(r.correct_count, 0) AS correct_count,
-            COALESCE(r.wrong_count, 0) AS wrong_count
+        SELECT w.id, w.kanji, w.romaji, w.english,
+            r.correct_count, r.wrong_count, {sort_column} AS sort_value
         FROM words w
-        LEFT JOIN word_reviews r ON w.id = r.word_id
-        ORDER BY {sort_by} {order}
+        JOIN word_reviews r ON w.id = r.word_id
+        {where}
+        ORDER BY {sort_column} {order}, {id_column} {order}
         LIMIT ? OFFSET ?
-      ''', (words_per_page, offset))
+      ''', (*params, words_per_page, offset))
+
+      words_data = fetch_dicts(cursor, {**WORD_FIELDS, 'sort_value': 'sort_value'})
+
+      response = {
+        "words": words_data,
+        "next_cursor": None
+      }
+      if len(words_data) == words_per_page:
+        last = words_data[-1]
+        response["next_cursor"] = encode_cursor(sort_by, order, [last["sort_value"], last["id"]])
+      # The sort value only feeds the cursor (accuracy is not part of a word)
+      for word in words_data:
+        del word["sort_value"]
 
-      words = cursor.fetchall()
+      if not keyset or wants_total(request.args):
+        # Query the total number of words matching the filters
+        if filters:
+          cursor.execute(f"SELECT COUNT(*) FROM word_reviews r WHERE {' AND '.join(filters)}", filter_params)
+        else:
+          cursor.execute('SELECT COUNT(*) FROM words')
+        total_words = cursor.fetchone()[0]
+        response["total_pages"] = (total_words + words_per_page - 1) // words_per_page
+        response["total_words"] = total_words
+      if not keyset:
+        response["current_page"] = page
+
+      return jsonify(response)
+
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+    finally:
+      app.db.close()
+
+  # Endpoint: GET /words/search?q= full-text search over kanji, romaji and
+  # english. Every term matches as a prefix; results are ordered by bm25
+  # relevance and paged with `cursor` like GET /words.
+  @app.route('/words/search', methods=['GET'])
+  @cross_origin()
+  def search_words():
+    try:
+      words_per_page = 50
+      query = match_query(request.args.get('q', ''))
+      if not query:
+        return jsonify({"error": "q is required"}), 400
 
-      # Query the total number of words
-      cursor.execute('SELECT COUNT(*) FROM words')
-      total_words = cursor.fetchone()[0]
-      total_pages = (total_words + words_per_page - 1) // words_per_page
+      conditions = []
+      params = [query]
+      if request.args.get('cursor'):
+        try:
+          params.extend(decode_cursor(request.args['cursor'], 'rank', 'asc'))
+        except CursorError as e:
+          return jsonify({"error": str(e)}), 400
+        conditions.append(keyset_condition('m.rank', 'm.id', 'asc'))
+      where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
 
-      # Format the response
-      words_data = []
+      cursor = app.db.cursor()
+      cursor.execute(f'''
+        SELECT w.id, w.kanji, w.romaji, w.english,
+            r.correct_count, r.wrong_count, m.rank
+        FROM (
+          SELECT rowid AS id, {rank_expression()} AS rank
+          FROM words_fts
+          WHERE words_fts MATCH ?
+        ) m
+        JOIN words w ON w.id = m.id
+        JOIN word_reviews r ON r.word_id = m.id
+        {where}
+        ORDER BY m.rank, m.id
+        LIMIT ?
+      ''', (*params, words_per_page))
+      words = fetch_dicts(cursor, {**WORD_FIELDS, 'rank': 'rank'})
+
+      next_cursor = None
+      if len(words) == words_per_page:
+        next_cursor = encode_cursor('rank', 'asc', [words[-1]["rank"], words[-1]["id"]])
       for word in words:
-        words_data.append({
-          "id": word["id"],
-          "kanji": word["kanji"],
-          "romaji": word["romaji"],
-          "english": word["english"],
-          "correct_count": word["correct_count"],
-          "wrong_count": word["wrong_count"]
-        })
+        del word["rank"]
 
       return jsonify({
-        "words": words_data,
-        "total_pages": total_pages,
-        "current_page": page,
-        "total_words": total_words
+        "words": words,
+        "next_cursor": next_cursor
       })
 
     except Exception as e:
       return jsonify({"error": str(e)}), 500
-    finally:
-      app.db.close()
+
+  # Endpoint: GET /words/fuzzy?q= typo-tolerant romaji lookup. Candidates
+  # come from the trigram index (similarity >= threshold, 0 to 1) and are
+  # ranked by edit distance to the query.
+  @app.route('/words/fuzzy', methods=['GET'])
+  @cross_origin()
+  def fuzzy_words():
+    try:
+      query = request.args.get('q', '').strip()
+      if not query:
+        return jsonify({"error": "q is required"}), 400
+      try:
+        threshold = float(request.args.get('threshold', DEFAULT_THRESHOLD))
+        limit = int(request.args.get('limit', 20))
+      except ValueError:
+        return jsonify({"error": "threshold must be a number and limit an integer"}), 400
+      if not 0 < threshold <= 1:
+        return jsonify({"error": "threshold must be between 0 and 1"}), 400
+      limit = max(1, min(limit, 100))
+
+      cursor = app.db.cursor()
+      return jsonify({"words": fuzzy_search(cursor, query, threshold, limit)})
+
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
 
   # Endpoint: GET /words/:id to get a single word with its details
   @app.route('/words/<int:word_id>', methods=['GET'])
   @cross_origin()
+  @cached
   def get_word(word_id):
     try:
       cursor = app.db.cursor()
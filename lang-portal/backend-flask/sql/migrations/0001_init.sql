@@ -1,51 +0,0 @@
--- Create words table
-CREATE TABLE IF NOT EXISTS words (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    japanese TEXT NOT NULL,
-    romaji TEXT NOT NULL,
-    english TEXT NOT NULL
-);
-
--- Create groups table
-CREATE TABLE IF NOT EXISTS groups (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL UNIQUE
-);
-
--- Create words_groups table
-CREATE TABLE IF NOT EXISTS words_groups (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    word_id INTEGER NOT NULL,
-    group_id INTEGER NOT NULL,
-    FOREIGN KEY (word_id) REFERENCES words(id),
-    FOREIGN KEY (group_id) REFERENCES groups(id)
-);
-
--- Create study_sessions table
-CREATE TABLE IF NOT EXISTS study_sessions (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    group_id INTEGER NOT NULL,
-    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    study_activity_id INTEGER NOT NULL,
-    FOREIGN KEY (group_id) REFERENCES groups(id)
-);
-
--- Create study_activities table
-CREATE TABLE IF NOT EXISTS study_activities (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    thumbnail_url TEXT,
-    description TEXT,
-    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
-);
-
--- Create word_review_items table
-CREATE TABLE IF NOT EXISTS word_review_items (
-    word_id INTEGER NOT NULL,
-    study_session_id INTEGER NOT NULL,
-    correct BOOLEAN NOT NULL,
-    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    PRIMARY KEY (word_id, study_session_id),
-    FOREIGN KEY (word_id) REFERENCES words(id),
-    FOREIGN KEY (study_session_id) REFERENCES study_sessions(id)
-);
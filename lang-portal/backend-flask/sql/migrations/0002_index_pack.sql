@@ -0,0 +1,29 @@
+-- Secondary indexes for the join and filter columns used by the routes.
+-- Trailing columns make the indexes covering for the common query shapes.
+
+-- GET /groups/:id/words, /groups/:id/words/raw (group -> words)
+CREATE INDEX IF NOT EXISTS idx_word_groups_group_id ON word_groups (group_id, word_id);
+-- GET /words/:id (word -> groups)
+CREATE INDEX IF NOT EXISTS idx_word_groups_word_id ON word_groups (word_id, group_id);
+
+-- Session listings: review counts, last activity and correct/wrong per session
+CREATE INDEX IF NOT EXISTS idx_word_review_items_study_session_id ON word_review_items (study_session_id, created_at, correct);
+-- Dashboard per-word stats and session word listings
+CREATE INDEX IF NOT EXISTS idx_word_review_items_word_id ON word_review_items (word_id, study_session_id, correct);
+
+-- Recent sessions, active groups and streaks
+CREATE INDEX IF NOT EXISTS idx_study_sessions_created_at ON study_sessions (created_at, group_id);
+-- GET /groups/:id/study_sessions
+CREATE INDEX IF NOT EXISTS idx_study_sessions_group_id ON study_sessions (group_id, created_at);
+-- GET /api/study-activities/:id/sessions
+CREATE INDEX IF NOT EXISTS idx_study_sessions_study_activity_id ON study_sessions (study_activity_id, created_at);
+
+-- LEFT JOIN word_reviews r ON w.id = r.word_id
+CREATE INDEX IF NOT EXISTS idx_word_reviews_word_id ON word_reviews (word_id, correct_count, wrong_count);
+
+-- Sortable columns of GET /words and GET /groups
+CREATE INDEX IF NOT EXISTS idx_words_kanji ON words (kanji);
+CREATE INDEX IF NOT EXISTS idx_words_romaji ON words (romaji);
+CREATE INDEX IF NOT EXISTS idx_words_english ON words (english);
+CREATE INDEX IF NOT EXISTS idx_groups_name ON groups (name);
+CREATE INDEX IF NOT EXISTS idx_groups_words_count ON groups (words_count);
@@ -0,0 +1,40 @@
+-- Per-word review counters in word_reviews, kept current by review
+-- submissions (lib/reviews.py) instead of aggregating word_review_items.
+
+-- Every word gets exactly one counter row, rebuilt here from the review history
+DELETE FROM word_reviews;
+INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+SELECT
+  w.id,
+  COALESCE(SUM(wri.correct = 1), 0),
+  COALESCE(SUM(wri.correct = 0), 0),
+  MAX(wri.created_at)
+FROM words w
+LEFT JOIN word_review_items wri ON wri.word_id = w.id
+GROUP BY w.id;
+
+DROP INDEX IF EXISTS idx_word_reviews_word_id;
+CREATE UNIQUE INDEX idx_word_reviews_word_id ON word_reviews (word_id);
+
+-- Share of correct answers; 0 for words that were never reviewed
+ALTER TABLE word_reviews ADD COLUMN accuracy REAL GENERATED ALWAYS AS (
+  CASE WHEN correct_count + wrong_count > 0
+    THEN correct_count * 1.0 / (correct_count + wrong_count)
+    ELSE 0
+  END
+) VIRTUAL;
+
+-- Sort and filter GET /words and /groups/:id/words by the counters
+CREATE INDEX idx_word_reviews_correct_count ON word_reviews (correct_count, word_id);
+CREATE INDEX idx_word_reviews_wrong_count ON word_reviews (wrong_count, word_id);
+CREATE INDEX idx_word_reviews_accuracy ON word_reviews (accuracy, word_id);
+
+-- New words start with zeroed counters; deleted words take theirs along
+CREATE TRIGGER word_reviews_words_insert AFTER INSERT ON words BEGIN
+  INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+  VALUES (NEW.id, 0, 0, NULL);
+END;
+
+CREATE TRIGGER word_reviews_words_delete AFTER DELETE ON words BEGIN
+  DELETE FROM word_reviews WHERE word_id = OLD.id;
+END;
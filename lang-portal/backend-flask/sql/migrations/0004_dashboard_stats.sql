@@ -0,0 +1,64 @@
+-- Snapshot of the /dashboard/stats counters, updated incrementally by
+-- session and review writes (lib/dashboard_stats.py) instead of scanning
+-- the review history on every request.
+CREATE TABLE dashboard_stats (
+  id INTEGER PRIMARY KEY CHECK (id = 1),  -- Single row
+  total_vocabulary INTEGER NOT NULL DEFAULT 0,
+  total_words_studied INTEGER NOT NULL DEFAULT 0,  -- Words with at least one review
+  mastered_words INTEGER NOT NULL DEFAULT 0,  -- >= 5 reviews and >= 80% correct
+  total_reviews INTEGER NOT NULL DEFAULT 0,
+  correct_reviews INTEGER NOT NULL DEFAULT 0,
+  total_sessions INTEGER NOT NULL DEFAULT 0,
+  streak_days INTEGER NOT NULL DEFAULT 0,  -- Consecutive study days ending on last_study_date
+  last_study_date DATE
+);
+
+-- Active groups are counted from an index range over the last 30 days
+ALTER TABLE groups ADD COLUMN last_studied_at DATETIME;
+UPDATE groups SET last_studied_at = (
+  SELECT MAX(created_at) FROM study_sessions WHERE group_id = groups.id
+);
+CREATE INDEX idx_groups_last_studied_at ON groups (last_studied_at);
+
+INSERT INTO dashboard_stats (
+  id, total_vocabulary, total_words_studied, mastered_words,
+  total_reviews, correct_reviews, total_sessions, streak_days, last_study_date
+)
+SELECT
+  1,
+  (SELECT COUNT(*) FROM words),
+  (SELECT COUNT(DISTINCT word_id)
+    FROM word_review_items wri JOIN study_sessions ss ON wri.study_session_id = ss.id),
+  (SELECT COUNT(*) FROM (
+    SELECT word_id
+    FROM word_review_items wri JOIN study_sessions ss ON wri.study_session_id = ss.id
+    GROUP BY word_id
+    HAVING COUNT(*) >= 5 AND SUM(correct = 1) * 1.0 / COUNT(*) >= 0.8
+  )),
+  (SELECT COUNT(*)
+    FROM word_review_items wri JOIN study_sessions ss ON wri.study_session_id = ss.id),
+  (SELECT COALESCE(SUM(correct = 1), 0)
+    FROM word_review_items wri JOIN study_sessions ss ON wri.study_session_id = ss.id),
+  (SELECT COUNT(*) FROM study_sessions),
+  streak.days,
+  streak.last_date
+FROM (
+  WITH days AS (
+    SELECT DISTINCT date(created_at) AS study_date FROM study_sessions
+  ),
+  runs AS (
+    SELECT study_date, julianday(study_date) - ROW_NUMBER() OVER (ORDER BY study_date) AS run
+    FROM days
+  )
+  SELECT COUNT(*) AS days, MAX(study_date) AS last_date
+  FROM runs
+  WHERE run = (SELECT run FROM runs ORDER BY study_date DESC LIMIT 1)
+) streak;
+
+CREATE TRIGGER dashboard_stats_words_insert AFTER INSERT ON words BEGIN
+  UPDATE dashboard_stats SET total_vocabulary = total_vocabulary + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER dashboard_stats_words_delete AFTER DELETE ON words BEGIN
+  UPDATE dashboard_stats SET total_vocabulary = total_vocabulary - 1 WHERE id = 1;
+END;
@@ -0,0 +1,31 @@
+-- Per-session rollup of word_review_items, kept current by review writes
+-- (lib/reviews.py) so session listings no longer aggregate the review history.
+CREATE TABLE study_session_stats (
+  study_session_id INTEGER PRIMARY KEY,
+  review_count INTEGER NOT NULL DEFAULT 0,
+  correct_count INTEGER NOT NULL DEFAULT 0,
+  last_activity_at DATETIME,  -- Time of the latest review
+  end_time DATETIME NOT NULL,  -- last_activity_at, or 30 minutes after the start until the first review
+  FOREIGN KEY (study_session_id) REFERENCES study_sessions(id)
+);
+
+INSERT INTO study_session_stats (study_session_id, review_count, correct_count, last_activity_at, end_time)
+SELECT
+  ss.id,
+  COUNT(wri.id),
+  COALESCE(SUM(wri.correct = 1), 0),
+  MAX(wri.created_at),
+  COALESCE(MAX(wri.created_at), datetime(ss.created_at, '+30 minutes'))
+FROM study_sessions ss
+LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
+GROUP BY ss.id;
+
+-- Every session has a rollup row from the moment it is created
+CREATE TRIGGER study_session_stats_sessions_insert AFTER INSERT ON study_sessions BEGIN
+  INSERT INTO study_session_stats (study_session_id, end_time)
+  VALUES (NEW.id, datetime(NEW.created_at, '+30 minutes'));
+END;
+
+CREATE TRIGGER study_session_stats_sessions_delete AFTER DELETE ON study_sessions BEGIN
+  DELETE FROM study_session_stats WHERE study_session_id = OLD.id;
+END;
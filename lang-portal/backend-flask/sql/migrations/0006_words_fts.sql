@@ -0,0 +1,31 @@
+-- Full-text index over the words table for GET /words/search. It is an
+-- external content table: the text lives in `words` only and the triggers
+-- below keep the index in step with every insert, update and delete.
+CREATE VIRTUAL TABLE words_fts USING fts5(
+  kanji,
+  romaji,
+  english,
+  content = 'words',
+  content_rowid = 'id',
+  tokenize = 'unicode61 remove_diacritics 2',
+  prefix = '2 3'  -- Extra prefix indexes make short "term*" queries cheap
+);
+
+INSERT INTO words_fts (words_fts) VALUES ('rebuild');
+
+CREATE TRIGGER words_fts_insert AFTER INSERT ON words BEGIN
+  INSERT INTO words_fts (rowid, kanji, romaji, english)
+  VALUES (NEW.id, NEW.kanji, NEW.romaji, NEW.english);
+END;
+
+CREATE TRIGGER words_fts_delete AFTER DELETE ON words BEGIN
+  INSERT INTO words_fts (words_fts, rowid, kanji, romaji, english)
+  VALUES ('delete', OLD.id, OLD.kanji, OLD.romaji, OLD.english);
+END;
+
+CREATE TRIGGER words_fts_update AFTER UPDATE OF kanji, romaji, english ON words BEGIN
+  INSERT INTO words_fts (words_fts, rowid, kanji, romaji, english)
+  VALUES ('delete', OLD.id, OLD.kanji, OLD.romaji, OLD.english);
+  INSERT INTO words_fts (rowid, kanji, romaji, english)
+  VALUES (NEW.id, NEW.kanji, NEW.romaji, NEW.english);
+END;
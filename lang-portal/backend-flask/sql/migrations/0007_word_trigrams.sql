@@ -0,0 +1,90 @@
+-- Trigram index behind GET /words/fuzzy. Each word is indexed under the
+-- trigrams of its romaji and of the syllables in `parts` joined together,
+-- padded like '  taberu ' so that word starts and ends weigh in.
+CREATE TABLE word_trigrams (
+  trigram TEXT NOT NULL,
+  word_id INTEGER NOT NULL,
+  PRIMARY KEY (trigram, word_id)
+) WITHOUT ROWID;
+
+-- Number of distinct trigrams per word, the denominator of the similarity
+CREATE TABLE word_trigram_counts (
+  word_id INTEGER PRIMARY KEY,
+  trigram_count INTEGER NOT NULL
+);
+
+-- Character positions to cut trigrams at; triggers cannot use recursive CTEs
+CREATE TABLE trigram_positions (n INTEGER PRIMARY KEY);
+
+INSERT INTO trigram_positions (n)
+WITH RECURSIVE positions (n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM positions WHERE n < 256)
+SELECT n FROM positions;
+
+INSERT INTO word_trigrams (trigram, word_id)
+SELECT DISTINCT substr(f.form, p.n, 3), f.word_id
+FROM (
+  SELECT id AS word_id, '  ' || lower(romaji) || ' ' AS form FROM words
+  UNION
+  SELECT w.id, '  ' || lower(group_concat(r.value, '')) || ' '
+  FROM words w, json_each(CASE WHEN json_valid(w.parts) THEN w.parts ELSE '[]' END) part, json_each(part.value, '$.romaji') r
+  GROUP BY w.id
+) f
+JOIN trigram_positions p ON p.n <= length(f.form) - 2;
+
+INSERT INTO word_trigram_counts (word_id, trigram_count)
+SELECT word_id, COUNT(*) FROM word_trigrams GROUP BY word_id;
+
+CREATE TRIGGER word_trigrams_words_insert AFTER INSERT ON words BEGIN
+  INSERT OR IGNORE INTO word_trigrams (trigram, word_id)
+  SELECT substr(f.form, p.n, 3), NEW.id
+  FROM (
+    SELECT '  ' || lower(NEW.romaji) || ' ' AS form
+    UNION
+    SELECT '  ' || lower(group_concat(r.value, '')) || ' '
+    FROM json_each(CASE WHEN json_valid(NEW.parts) THEN NEW.parts ELSE '[]' END) part, json_each(part.value, '$.romaji') r
+  ) f
+  JOIN trigram_positions p ON p.n <= length(f.form) - 2;
+  -- changes() is the number of trigrams the statement above inserted
+  INSERT OR REPLACE INTO word_trigram_counts (word_id, trigram_count) VALUES (NEW.id, changes());
+END;
+
+CREATE TRIGGER word_trigrams_words_delete AFTER DELETE ON words BEGIN
+  DELETE FROM word_trigrams
+  WHERE word_id = OLD.id AND trigram IN (
+    SELECT substr(f.form, p.n, 3)
+    FROM (
+      SELECT '  ' || lower(OLD.romaji) || ' ' AS form
+      UNION
+      SELECT '  ' || lower(group_concat(r.value, '')) || ' '
+      FROM json_each(CASE WHEN json_valid(OLD.parts) THEN OLD.parts ELSE '[]' END) part, json_each(part.value, '$.romaji') r
+    ) f
+    JOIN trigram_positions p ON p.n <= length(f.form) - 2
+  );
+  DELETE FROM word_trigram_counts WHERE word_id = OLD.id;
+END;
+
+CREATE TRIGGER word_trigrams_words_update AFTER UPDATE OF romaji, parts ON words BEGIN
+  DELETE FROM word_trigrams
+  WHERE word_id = OLD.id AND trigram IN (
+    SELECT substr(f.form, p.n, 3)
+    FROM (
+      SELECT '  ' || lower(OLD.romaji) || ' ' AS form
+      UNION
+      SELECT '  ' || lower(group_concat(r.value, '')) || ' '
+      FROM json_each(CASE WHEN json_valid(OLD.parts) THEN OLD.parts ELSE '[]' END) part, json_each(part.value, '$.romaji') r
+    ) f
+    JOIN trigram_positions p ON p.n <= length(f.form) - 2
+  );
+  DELETE FROM word_trigram_counts WHERE word_id = OLD.id;
+  INSERT OR IGNORE INTO word_trigrams (trigram, word_id)
+  SELECT substr(f.form, p.n, 3), NEW.id
+  FROM (
+    SELECT '  ' || lower(NEW.romaji) || ' ' AS form
+    UNION
+    SELECT '  ' || lower(group_concat(r.value, '')) || ' '
+    FROM json_each(CASE WHEN json_valid(NEW.parts) THEN NEW.parts ELSE '[]' END) part, json_each(part.value, '$.romaji') r
+  ) f
+  JOIN trigram_positions p ON p.n <= length(f.form) - 2;
+  -- changes() is the number of trigrams the statement above inserted
+  INSERT OR REPLACE INTO word_trigram_counts (word_id, trigram_count) VALUES (NEW.id, changes());
+END;
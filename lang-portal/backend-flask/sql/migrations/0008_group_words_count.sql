@@ -0,0 +1,19 @@
+-- Keep the groups.words_count counter cache in step with word_groups on
+-- every insert, delete and move, instead of recounting after imports.
+UPDATE groups SET words_count = (
+  SELECT COUNT(*) FROM word_groups WHERE group_id = groups.id
+);
+
+CREATE TRIGGER groups_words_count_insert AFTER INSERT ON word_groups BEGIN
+  UPDATE groups SET words_count = words_count + 1 WHERE id = NEW.group_id;
+END;
+
+CREATE TRIGGER groups_words_count_delete AFTER DELETE ON word_groups BEGIN
+  UPDATE groups SET words_count = words_count - 1 WHERE id = OLD.group_id;
+END;
+
+CREATE TRIGGER groups_words_count_update AFTER UPDATE OF group_id ON word_groups
+WHEN NEW.group_id IS NOT OLD.group_id BEGIN
+  UPDATE groups SET words_count = words_count - 1 WHERE id = OLD.group_id;
+  UPDATE groups SET words_count = words_count + 1 WHERE id = NEW.group_id;
+END;
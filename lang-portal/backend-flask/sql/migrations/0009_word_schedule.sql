@@ -0,0 +1,41 @@
+-- SM-2 review schedule per word (lib/schedule.py), advanced by review
+-- submissions, and the due time copied onto every group membership so
+-- GET /groups/<id>/due reads the next words from one index range.
+CREATE TABLE word_schedule (
+  word_id INTEGER PRIMARY KEY,
+  repetitions INTEGER NOT NULL DEFAULT 0,  -- Correct answers in a row
+  interval_days INTEGER NOT NULL DEFAULT 0,
+  ease REAL NOT NULL DEFAULT 2.5,
+  last_reviewed_at DATETIME,
+  due_at DATETIME NOT NULL,
+  FOREIGN KEY (word_id) REFERENCES words(id)
+);
+
+-- NULL until the word is first reviewed
+ALTER TABLE word_groups ADD COLUMN next_due_at DATETIME;
+
+CREATE INDEX idx_word_groups_due ON word_groups (group_id, next_due_at, word_id);
+
+CREATE TRIGGER word_schedule_insert AFTER INSERT ON word_schedule BEGIN
+  UPDATE word_groups SET next_due_at = NEW.due_at WHERE word_id = NEW.word_id;
+END;
+
+CREATE TRIGGER word_schedule_update AFTER UPDATE OF due_at ON word_schedule
+WHEN NEW.due_at IS NOT OLD.due_at BEGIN
+  UPDATE word_groups SET next_due_at = NEW.due_at WHERE word_id = NEW.word_id;
+END;
+
+CREATE TRIGGER word_schedule_delete AFTER DELETE ON word_schedule BEGIN
+  UPDATE word_groups SET next_due_at = NULL WHERE word_id = OLD.word_id;
+END;
+
+-- A word added to another group brings its schedule along
+CREATE TRIGGER word_groups_next_due_insert AFTER INSERT ON word_groups
+WHEN EXISTS (SELECT 1 FROM word_schedule WHERE word_id = NEW.word_id) BEGIN
+  UPDATE word_groups SET next_due_at = (SELECT due_at FROM word_schedule WHERE word_id = NEW.word_id)
+  WHERE rowid = NEW.rowid;
+END;
+
+CREATE TRIGGER word_schedule_words_delete AFTER DELETE ON words BEGIN
+  DELETE FROM word_schedule WHERE word_id = OLD.id;
+END;
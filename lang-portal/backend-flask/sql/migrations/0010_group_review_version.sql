@@ -0,0 +1,17 @@
+-- Version of each group's words and their review counters, bumped by review
+-- submissions (lib/reviews.py) and by membership changes below, so the
+-- per-group sampling tables of GET /groups/<id>/sample (lib/sampling.py)
+-- know when to rebuild.
+ALTER TABLE groups ADD COLUMN review_version INTEGER NOT NULL DEFAULT 0;
+
+CREATE TRIGGER groups_review_version_insert AFTER INSERT ON word_groups BEGIN
+  UPDATE groups SET review_version = review_version + 1 WHERE id = NEW.group_id;
+END;
+
+CREATE TRIGGER groups_review_version_delete AFTER DELETE ON word_groups BEGIN
+  UPDATE groups SET review_version = review_version + 1 WHERE id = OLD.group_id;
+END;
+
+CREATE TRIGGER groups_review_version_update AFTER UPDATE OF word_id, group_id ON word_groups BEGIN
+  UPDATE groups SET review_version = review_version + 1 WHERE id IN (OLD.group_id, NEW.group_id);
+END;
@@ -0,0 +1,41 @@
+-- Builds word_schedule (0009) from the existing review history, the same
+-- replay as lib.schedule.rebuild_schedule with its constants inlined
+-- (ease 2.5, at least 1.3, -0.54 per wrong answer, intervals up to 36500
+-- days), so words reviewed before 0009 are no longer listed as new by
+-- GET /groups/<id>/due. The insert trigger copies due_at to word_groups.
+DELETE FROM word_schedule;
+WITH RECURSIVE reviews AS MATERIALIZED (
+  SELECT word_id, correct, created_at AS answered_at, ROW_NUMBER() OVER (PARTITION BY word_id ORDER BY created_at, id) AS n
+  FROM word_review_items
+  WHERE word_id IN (SELECT id FROM words)
+),
+start AS (
+  SELECT DISTINCT word_id, 0 AS repetitions, 0 AS interval_days, 2.5 AS ease, NULL AS reviewed_at
+  FROM reviews
+),
+steps (word_id, n, repetitions, interval_days, ease, reviewed_at) AS (
+  SELECT word_id, 0, repetitions, interval_days, ease, reviewed_at FROM start
+  UNION ALL
+  SELECT
+    s.word_id,
+    s.n + 1,
+    CASE WHEN r.correct THEN s.repetitions + 1 ELSE 0 END,
+    CASE
+      WHEN NOT r.correct OR s.repetitions = 0 THEN 1
+      WHEN s.repetitions = 1 THEN 6
+      ELSE MIN(36500, MAX(1, CAST(round(s.interval_days * s.ease) AS INTEGER)))
+    END,
+    MAX(1.3, s.ease + CASE WHEN r.correct THEN 0.0 ELSE -0.54 END),
+    r.answered_at
+  FROM steps s
+  JOIN reviews r ON r.word_id = s.word_id AND r.n = s.n + 1
+),
+final AS (
+  SELECT s.*
+  FROM steps s
+  JOIN (SELECT word_id, MAX(n) AS n FROM reviews GROUP BY word_id) last
+    ON last.word_id = s.word_id AND last.n = s.n
+)
+INSERT INTO word_schedule (word_id, repetitions, interval_days, ease, last_reviewed_at, due_at)
+SELECT word_id, repetitions, interval_days, ease, reviewed_at, datetime(reviewed_at, '+' || interval_days || ' days')
+FROM final;
@@ -11,6 +11,103 @@ def init_db(c):
     db.init(app)
     print("Database initialized successfully.")
 
+@task
+def build_template(c, path='words.template.db'):
+    """Build a seeded, fully migrated database that new instances start as a copy of"""
+    import tempfile
+    import time
+    from flask import Flask
+    from lib.db import Db
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        template_db = Db(database=os.path.join(tmp, 'words.db'))
+        try:
+            template_db.build_template(app, path)
+        finally:
+            template_db.shutdown()
+    print(f"Built {path} ({os.path.getsize(path):,} bytes) in {time.perf_counter() - start:.2f}s.")
+
+@task
+def import_words(c, group, path):
+    """Bulk import a JSON array of words (seed/data_verbs.json format) into a new group"""
+    from flask import Flask
+    app = Flask(__name__)
+    with app.app_context():
+        try:
+            db.import_word_json(cursor=db.cursor(), group_name=group, data_json_path=path)
+        finally:
+            db.close()
+
+@task
+def backfill_word_reviews(c):
+    """Recompute the per-word counters, per-session rollups and review schedule from the full review history"""
+    import sqlite3
+    from lib.reviews import rebuild_session_stats, rebuild_word_reviews
+    from lib.schedule import rebuild_schedule
+    conn = sqlite3.connect('words.db')
+    rows = rebuild_word_reviews(conn.cursor())
+    sessions = rebuild_session_stats(conn.cursor())
+    scheduled = rebuild_schedule(conn.cursor())
+    conn.commit()
+    conn.close()
+    print(f"Rebuilt review counters for {rows} words, rollups for {sessions} sessions and the schedule of {scheduled} reviewed words.")
+
+@task
+def rebuild_dashboard_stats(c, verify_only=False):
+    """Check the dashboard stats snapshot against the live queries and rebuild it"""
+    import sqlite3
+    from lib.dashboard_stats import rebuild_stats, verify_stats
+    conn = sqlite3.connect('words.db')
+    drift = verify_stats(conn.cursor())
+    for column, (snapshot, live) in drift.items():
+        print(f"{column}: snapshot {snapshot}, live {live}")
+    if not drift:
+        print("Dashboard stats match the live queries.")
+    elif not verify_only:
+        rebuild_stats(conn.cursor())
+        conn.commit()
+        print(f"Rebuilt dashboard stats ({len(drift)} columns had drifted).")
+    conn.close()
+    if drift and verify_only:
+        raise SystemExit(1)
+
+@task
+def verify_words_count(c, repair=False):
+    """Compare groups.words_count with word_groups (--repair fixes drifted groups)"""
+    import sqlite3
+    from lib.group_counts import repair_words_count, words_count_drift
+    conn = sqlite3.connect('words.db')
+    drift = words_count_drift(conn.cursor())
+    for group_id, words_count, actual in drift:
+        print(f"Group {group_id}: words_count {words_count}, actual {actual}")
+    if not drift:
+        print("Every group's words_count is correct.")
+    elif repair:
+        repair_words_count(conn.cursor())
+        conn.commit()
+        print(f"Repaired words_count for {len(drift)} groups.")
+    conn.close()
+    if drift and not repair:
+        raise SystemExit(1)
+
+@task
+def rebuild_trigrams(c):
+    """Re-index every word for fuzzy search (GET /words/fuzzy)"""
+    import sqlite3
+    from lib.fuzzy import rebuild_trigrams as rebuild
+    conn = sqlite3.connect('words.db')
+    words = rebuild(conn.cursor())
+    conn.commit()
+    conn.close()
+    print(f"Rebuilt the trigram index for {words} words.")
+
+@task
+def migrate(c, dry_run=False):
+    """Apply pending migrations (--dry-run only lists them)"""
+    from migrate import run_migrations
+    run_migrations(database='words.db', dry_run=dry_run)
+
 @task
 def rm_db(c):
     """Remove the database file"""
@@ -25,4 +122,30 @@ def reset_db(c):
     """Remove and reinitialize the database"""
     rm_db(c)
     init_db(c)
-    print("Database reset complete.")
\ No newline at end of file
+    print("Database reset complete.")
+
+@task
+def check_query_plans(c):
+    """Replay the GET routes and fail if any query full-scans a table"""
+    from lib.query_plans import check
+    result = check()
+    for violation in result['violations']:
+        print(f"Full scan of {', '.join(violation['tables'])}:\n  {violation['sql']}")
+    if result['violations']:
+        raise SystemExit(f"{len(result['violations'])} of {result['statements']} statements full-scan a table.")
+    print(f"All {result['statements']} statements use an index.")
+
+@task
+def slow_queries(c, path='slow_queries.jsonl', top=10):
+    """Rank the statement shapes in the slow-query log by total time"""
+    from lib.slow_log import rank, read_entries
+    ranked = rank(read_entries(path), top=int(top))
+    if not ranked:
+        print(f"No slow queries logged in {path}.")
+        return
+    for i, shape in enumerate(ranked, 1):
+        print(f"{i}. {shape['total_ms']:.1f} ms total, {shape['count']} calls, "
+              f"mean {shape['mean_ms']:.1f} ms, max {shape['max_ms']:.1f} ms ({', '.join(shape['routes'])})")
+        print(f"   {shape['sql']}")
+        for warning in shape['warnings']:
+            print(f"   ! {warning}")
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+from flask import Flask
+from lib.db import Db
+
+def create_test_app(database, routes=(), setup=None):
+    """A Flask app on `database`, initialized with the seed data, serving `routes`.
+
+    `routes` are the `load` functions of route modules. `setup(app)` runs
+    before they are loaded, for extensions that hook into the app.
+    """
+    app = Flask(__name__)
+    app.db = Db(database=database)
+    app.db.init(app)
+
+    @app.teardown_appcontext
+    def close_db(exception):
+        app.db.close()
+
+    if setup is not None:
+        setup(app)
+    for load in routes:
+        load(app)
+    return app
+
+class AppTestCase(unittest.TestCase):
+    """Gives every test a freshly seeded database and an app serving `routes`.
+
+    Sets self.database, self.app and self.client; override setup_app to set
+    up extensions before the routes are loaded.
+    """
+    routes = ()
+
+    def setup_app(self, app):
+        pass
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tmp.name, 'words.db')
+        self.app = create_test_app(self.database, self.routes, self.setup_app)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.app.db.shutdown()
+        self.tmp.cleanup()
+
+    def query(self, sql, params=()):
+        with self.app.app_context():
+            return [tuple(row) for row in self.app.db.cursor().execute(sql, params).fetchall()]
+
+class SharedAppTestCase(unittest.TestCase):
+    """Like AppTestCase, but one database and app are shared by all tests of the class"""
+    routes = ()
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.database = os.path.join(cls.tmp.name, 'words.db')
+        cls.app = create_test_app(cls.database, cls.routes)
+        cls.client = cls.app.test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app.db.shutdown()
+        cls.tmp.cleanup()
@@ -0,0 +1,230 @@
+import asyncio
+import json
+import sqlite3
+import unittest
+from lib.asgi import AsgiAdapter, ChangeFeed, request
+from lib.response_cache import DataVersion
+from routes.export import load as load_export
+from routes.groups import load as load_groups
+from routes.study_sessions import load as load_study_sessions
+from tests.support import AppTestCase
+
+class TestAsgiAdapter(AppTestCase):
+    routes = (load_groups, load_study_sessions, load_export)
+
+    def setUp(self):
+        super().setUp()
+        self.data_version = DataVersion(self.database)
+        self.feed = ChangeFeed(self.data_version, poll_interval=0.01)
+        self.adapter = AsgiAdapter(self.app, max_workers=2, feed=self.feed)
+
+    def tearDown(self):
+        self.adapter.close()
+        self.data_version.close()
+        super().tearDown()
+
+    def run_async(self, coroutine):
+        return asyncio.run(asyncio.wait_for(coroutine, 10))
+
+    def commit_elsewhere(self):
+        conn = sqlite3.connect(self.database)
+        conn.execute("INSERT INTO groups (name) VALUES ('Elsewhere')")
+        conn.commit()
+        conn.close()
+
+    def test_routes_match_wsgi(self):
+        status, headers, body = self.run_async(request(self.adapter, 'GET', '/groups?sort_by=words_count&order=desc'))
+        expected = self.app.test_client().get('/groups?sort_by=words_count&order=desc')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), expected.get_json())
+        self.assertIn(('content-type', 'application/json'), headers)
+
+        status, _, body = self.run_async(request(self.adapter, 'GET', '/groups/42'))
+        self.assertEqual(status, 404)
+
+    def test_post_body(self):
+        status, _, body = self.run_async(request(self.adapter, 'POST', '/api/study-sessions', {'group_id': 1, 'study_activity_id': 1}))
+        self.assertEqual(status, 201)
+        session_id = json.loads(body)['id']
+        status, _, _ = self.run_async(request(self.adapter, 'POST', f'/api/study-sessions/{session_id}/review', {'word_id': 1, 'correct': True}))
+        self.assertEqual(status, 201)
+        self.assertEqual(self.adapter.stats()['requests'], 2)
+        self.assertEqual(self.adapter.stats()['active'], 0)
+
+    def send_raw(self, method, path, messages, headers=()):
+        # Feed the adapter the given ASGI messages, then a disconnect
+        async def exchange():
+            incoming = list(messages)
+            sent = []
+
+            async def receive():
+                if incoming:
+                    return incoming.pop(0)
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'headers': list(headers)}
+            await self.adapter(scope, receive, send)
+            return sent
+        return self.run_async(exchange())
+
+    def words(self):
+        conn = sqlite3.connect(self.database)
+        try:
+            return conn.execute('SELECT COUNT(*) FROM words').fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_disconnect_before_body_does_not_call_app(self):
+        before = self.words()
+        self.assertEqual(self.send_raw('POST', '/groups/1/words:import', []), [])
+        self.assertEqual(self.adapter.stats()['queued'], 0)
+        self.assertEqual(self.words(), before)
+
+    def test_truncated_upload_is_not_imported(self):
+        before = self.words()
+        lines = [json.dumps({'kanji': f'語{i}', 'romaji': f'go{i}', 'english': 'word', 'parts': []}) for i in range(10)]
+        half = ('\n'.join(lines[:5]) + '\n').encode()
+        sent = self.send_raw('POST', '/groups/1/words:import', [{'type': 'http.request', 'body': half, 'more_body': True}],
+            headers=[(b'content-type', b'application/x-ndjson')])
+        self.assertEqual(sent[0]['status'], 400)
+        self.assertEqual(self.words(), before)
+
+    def test_upload_is_streamed(self):
+        lines = [json.dumps({'kanji': f'語{i}', 'romaji': f'go{i}', 'english': 'word', 'parts': []}) for i in range(3000)]
+        body = ('\n'.join(lines) + '\n').encode()
+        chunks = [body[i:i + 4096] for i in range(0, len(body), 4096)]
+        messages = [{'type': 'http.request', 'body': chunk, 'more_body': True} for chunk in chunks]
+        messages.append({'type': 'http.request', 'body': b'', 'more_body': False})
+        self.adapter.max_body_bytes = len(body)
+        sent = self.send_raw('POST', '/groups/1/words:import', messages, headers=[(b'content-type', b'application/x-ndjson')])
+        self.assertEqual(sent[0]['status'], 201)
+        self.assertEqual(json.loads(sent[1]['body'])['inserted'], 3000)
+
+        # Over the limit without a Content-Length: cut off while reading
+        self.adapter.max_body_bytes = len(body) - 1
+        sent = self.send_raw('POST', '/groups/2/words:import', messages, headers=[(b'content-type', b'application/x-ndjson')])
+        self.assertEqual(sent[0]['status'], 413)
+        # With one: rejected before the app runs
+        sent = self.send_raw('POST', '/groups/2/words:import', messages, headers=[(b'content-length', str(len(body)).encode())])
+        self.assertEqual(sent[0]['status'], 413)
+
+    def test_streamed_response_holds_no_thread(self):
+        async def download():
+            chunks = []
+            progress = asyncio.Event()
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.body':
+                    chunks.append(message['body'])
+                    if len(chunks) == 1:
+                        # A slow reader: between chunks no worker is busy
+                        await asyncio.sleep(0.05)
+                        progress.set()
+
+            scope = {'type': 'http', 'method': 'GET', 'path': '/export/words.ndjson', 'query_string': b'', 'headers': []}
+            task = asyncio.ensure_future(self.adapter(scope, receive, send))
+            await progress.wait()
+            stats = self.adapter.stats()
+            await task
+            return stats, chunks
+
+        stats, chunks = self.run_async(download())
+        self.assertEqual(stats['active'], 0)
+        self.assertEqual(stats['streaming'], 1)
+        self.assertEqual(len(b''.join(chunks).splitlines()), self.words())
+        self.assertEqual(self.adapter.stats()['streaming'], 0)
+
+    def test_concurrent_requests_share_the_pool(self):
+        async def many():
+            return await asyncio.gather(*(request(self.adapter, 'GET', f'/groups/{1 + i % 2}/words') for i in range(20)))
+        self.assertEqual({status for status, _, _ in self.run_async(many())}, {200})
+
+    def test_rejects_when_full(self):
+        adapter = AsgiAdapter(self.app, max_workers=1, max_pending=0)
+        try:
+            async def two():
+                return await asyncio.gather(request(adapter, 'GET', '/groups'), request(adapter, 'GET', '/groups'))
+            self.assertEqual(sorted(status for status, _, _ in self.run_async(two())), [200, 503])
+            self.assertEqual(adapter.stats()['rejected'], 1)
+        finally:
+            adapter.close()
+
+    def test_long_poll(self):
+        status, _, body = self.run_async(request(self.adapter, 'GET', '/changes'))
+        self.assertEqual(json.loads(body), {'version': 0, 'changed': False})
+
+        status, _, body = self.run_async(request(self.adapter, 'GET', '/changes?since=0&timeout=0.05'))
+        self.assertEqual(json.loads(body), {'version': 0, 'changed': False})
+
+        async def poll_then_commit():
+            waiting = asyncio.ensure_future(request(self.adapter, 'GET', '/changes?since=0&timeout=5'))
+            while not self.feed.listeners or self.feed._last is None:
+                await asyncio.sleep(0.01)
+            await asyncio.get_running_loop().run_in_executor(None, self.commit_elsewhere)
+            return await waiting
+        status, _, body = self.run_async(poll_then_commit())
+        self.assertEqual(json.loads(body), {'version': 1, 'changed': True})
+        self.assertEqual(self.feed.listeners, 0)
+
+        status, _, _ = self.run_async(request(self.adapter, 'GET', '/changes?since=x'))
+        self.assertEqual(status, 400)
+
+    def test_event_stream(self):
+        async def stream():
+            messages = asyncio.Queue()
+            disconnect = asyncio.Event()
+            sent = []
+
+            async def receive():
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+                await messages.put(message)
+
+            scope = {
+                'type': 'http', 'method': 'GET', 'path': '/changes/stream', 'query_string': b'',
+                'headers': [(b'origin', b'http://localhost:8080')]
+            }
+            task = asyncio.ensure_future(self.adapter(scope, receive, send))
+            start = await messages.get()
+            first = await messages.get()
+            while self.feed._last is None:
+                await asyncio.sleep(0.01)
+            await asyncio.get_running_loop().run_in_executor(None, self.commit_elsewhere)
+            second = await messages.get()
+            disconnect.set()
+            await task
+            return start, first, second
+
+        start, first, second = self.run_async(stream())
+        self.assertIn((b'content-type', b'text/event-stream'), start['headers'])
+        self.assertIn((b'access-control-allow-origin', b'http://localhost:8080'), start['headers'])
+        self.assertEqual(first['body'], b'event: change\ndata: {"version": 0}\n\n')
+        self.assertEqual(second['body'], b'event: change\ndata: {"version": 1}\n\n')
+        self.assertEqual(self.feed.listeners, 0)
+
+    def test_lifespan(self):
+        async def lifespan():
+            incoming = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+            sent = []
+
+            async def receive():
+                return incoming.pop(0)
+
+            async def send(message):
+                sent.append(message['type'])
+
+            await self.adapter({'type': 'lifespan'}, receive, send)
+            return sent
+        self.assertEqual(self.run_async(lifespan()), ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from flask import Flask
+from lib.db import Db
+
+class TestTemplateBootstrap(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.template = os.path.join(self.tmp.name, 'words.template.db')
+        builder = Db(database=os.path.join(self.tmp.name, 'build.db'))
+        try:
+            builder.build_template(Flask(__name__), self.template)
+        finally:
+            builder.shutdown()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def contents(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            return {
+                'schema': conn.execute("SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' ORDER BY name").fetchall(),
+                'words': conn.execute('SELECT * FROM words ORDER BY id').fetchall(),
+                'groups': conn.execute('SELECT * FROM groups ORDER BY id').fetchall(),
+                'word_groups': conn.execute('SELECT * FROM word_groups ORDER BY word_id, group_id').fetchall(),
+                'study_activities': conn.execute('SELECT * FROM study_activities ORDER BY id').fetchall(),
+                'dashboard_stats': conn.execute('SELECT * FROM dashboard_stats').fetchall(),
+                'migrations': conn.execute('SELECT version FROM schema_migrations ORDER BY version').fetchall()
+            }
+        finally:
+            conn.close()
+
+    def test_copy_matches_initialized_database(self):
+        copy = Db(database=os.path.join(self.tmp.name, 'copy.db'))
+        initialized = Db(database=os.path.join(self.tmp.name, 'init.db'))
+        try:
+            self.assertFalse(copy.exists())
+            copy.copy_template(self.template)
+            self.assertTrue(copy.exists())
+            self.assertEqual(copy.migrate(), [])
+            self.assertFalse(os.path.exists(copy.database + '.partial'))
+
+            initialized.init(Flask(__name__))
+        finally:
+            copy.shutdown()
+            initialized.shutdown()
+        self.assertEqual(self.contents(copy.database), self.contents(initialized.database))
+        self.assertEqual(len(self.contents(copy.database)['words']), 124)
+
+    def test_copy_over_empty_file_with_open_pool(self):
+        path = os.path.join(self.tmp.name, 'empty.db')
+        open(path, 'wb').close()
+        db = Db(database=path)
+        try:
+            # exists() leaves a pooled connection open on the empty file
+            self.assertFalse(db.exists())
+            self.assertEqual(db.pool.stats()['open'], 1)
+            db.copy_template(self.template)
+            self.assertTrue(db.exists())
+            self.assertEqual(db.migrate(), [])
+            with db.borrow() as conn:
+                self.assertEqual(conn.execute('SELECT COUNT(*) FROM words').fetchone()[0], 124)
+        finally:
+            db.shutdown()
+
+    def test_stale_journal_is_removed(self):
+        path = os.path.join(self.tmp.name, 'fresh.db')
+        with open(path + '-wal', 'wb') as file:
+            file.write(b'stale')
+        db = Db(database=path)
+        try:
+            db.copy_template(self.template)
+            self.assertFalse(os.path.exists(path + '-wal'))
+            self.assertEqual(db.migrate(), [])
+        finally:
+            db.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from lib.dashboard_stats import live_stats, rebuild_stats, verify_stats
+from routes.dashboard import load as load_dashboard
+from routes.study_sessions import load as load_study_sessions
+from tests.support import AppTestCase
+
+class TestDashboardStats(AppTestCase):
+    routes = (load_dashboard, load_study_sessions)
+
+    def verify(self):
+        with self.app.app_context():
+            return verify_stats(self.app.db.cursor())
+
+    def review(self, session_id, word_id, correct):
+        response = self.client.post(f'/api/study-sessions/{session_id}/review', json={'word_id': word_id, 'correct': correct})
+        self.assertEqual(response.status_code, 201)
+
+    def test_snapshot_follows_writes(self):
+        stats = self.client.get('/dashboard/stats').get_json()
+        self.assertEqual(stats['total_sessions'], 0)
+        self.assertEqual(stats['success_rate'], 0)
+        self.assertGreater(stats['total_vocabulary'], 0)
+
+        self.client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1})
+        self.client.post('/api/study-sessions', json={'group_id': 2, 'study_activity_id': 1})
+        for _ in range(4):
+            self.review(1, 3, True)
+        self.review(2, 3, True)  # Fifth correct review masters word 3
+        self.review(2, 4, False)
+
+        stats = self.client.get('/dashboard/stats').get_json()
+        self.assertEqual(stats['total_sessions'], 2)
+        self.assertEqual(stats['total_words_studied'], 2)
+        self.assertEqual(stats['mastered_words'], 1)
+        self.assertAlmostEqual(stats['success_rate'], 5 / 6)
+        self.assertEqual(stats['active_groups'], 2)
+        self.assertEqual(stats['current_streak'], 1)
+        self.assertEqual(self.verify(), {})
+
+        # A wrong answer drops word 3 back below 80%
+        self.review(2, 3, False)
+        self.review(2, 3, False)
+        self.assertEqual(self.client.get('/dashboard/stats').get_json()['mastered_words'], 0)
+        self.assertEqual(self.verify(), {})
+
+        self.client.post('/api/study-sessions/reset')
+        stats = self.client.get('/dashboard/stats').get_json()
+        self.assertEqual((stats['total_sessions'], stats['active_groups'], stats['current_streak']), (0, 0, 0))
+        self.assertEqual(self.verify(), {})
+
+    def test_vocabulary_follows_word_inserts(self):
+        before = self.client.get('/dashboard/stats').get_json()['total_vocabulary']
+        with self.app.app_context():
+            cursor = self.app.db.cursor()
+            cursor.execute("INSERT INTO words (kanji, romaji, english, parts) VALUES ('猫', 'neko', 'cat', '[]')")
+            self.app.db.commit()
+        self.assertEqual(self.client.get('/dashboard/stats').get_json()['total_vocabulary'], before + 1)
+
+    def test_streak_counts_latest_run_of_days(self):
+        with self.app.app_context():
+            cursor = self.app.db.cursor()
+            for days_ago in (9, 8, 2, 1, 0, 0):
+                cursor.execute(
+                    "INSERT INTO study_sessions (group_id, study_activity_id, created_at) VALUES (1, 1, datetime('now', ?))",
+                    (f'-{days_ago} days',)
+                )
+            self.assertEqual(set(verify_stats(cursor)), {'total_sessions', 'streak_days', 'last_study_date'})
+            rebuild_stats(cursor)
+            self.app.db.commit()
+            self.assertEqual(live_stats(cursor)['streak_days'], 3)
+        self.assertEqual(self.verify(), {})
+        self.assertEqual(self.client.get('/dashboard/stats').get_json()['current_streak'], 3)
+
+    def test_streak_lapses_after_a_missed_day(self):
+        with self.app.app_context():
+            cursor = self.app.db.cursor()
+            for days_ago in (3, 2):
+                cursor.execute(
+                    "INSERT INTO study_sessions (group_id, study_activity_id, created_at) VALUES (1, 1, datetime('now', ?))",
+                    (f'-{days_ago} days',)
+                )
+            rebuild_stats(cursor)
+            self.app.db.commit()
+            self.assertEqual(live_stats(cursor)['streak_days'], 2)
+        # Nothing studied yesterday or today: the run is over
+        self.assertEqual(self.client.get('/dashboard/stats').get_json()['current_streak'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from flask import Flask
+from lib.db import Db
+from lib.pool import ConnectionPool, PoolError, PoolTimeout
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_connections_are_reused(self):
+        pool = ConnectionPool(self.path, size=2)
+        conn = pool.acquire()
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        self.assertEqual(pool.stats()['open'], 1)
+        pool.close()
+
+    def test_pool_size_is_bounded(self):
+        pool = ConnectionPool(self.path, size=1, timeout=0.05)
+        conn = pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        pool.release(conn)
+        pool.release(pool.acquire())
+        pool.close()
+
+    def test_release_rolls_back_open_transaction(self):
+        pool = ConnectionPool(self.path, size=1)
+        conn = pool.acquire()
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.commit()
+        conn.execute('INSERT INTO t VALUES (1)')
+        pool.release(conn)
+        conn = pool.acquire()
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM t').fetchone()[0], 0)
+        pool.release(conn)
+        pool.close()
+
+    def test_unhealthy_connection_is_replaced(self):
+        pool = ConnectionPool(self.path, size=1, health_check_interval=0)
+        conn = pool.acquire()
+        pool.release(conn)
+        conn.close()
+        fresh = pool.acquire()
+        self.assertIsNot(fresh, conn)
+        self.assertEqual(fresh.execute('SELECT 1').fetchone()[0], 1)
+        pool.release(fresh)
+        pool.close()
+
+    def test_shutdown_closes_connections(self):
+        pool = ConnectionPool(self.path, size=2)
+        idle = pool.acquire()
+        busy = pool.acquire()
+        pool.release(idle)
+        pool.close()
+        self.assertEqual(pool.stats()['open'], 1)
+        pool.release(busy)
+        self.assertEqual(pool.stats()['open'], 0)
+        with self.assertRaises(PoolError):
+            pool.acquire()
+
+    def test_db_keeps_connection_across_requests(self):
+        app = Flask(__name__)
+        app.db = Db(database=self.path, pool_size=1)
+
+        @app.teardown_appcontext
+        def close_db(exception):
+            app.db.close()
+
+        with app.app_context():
+            first = app.db.get()
+            self.assertIs(app.db.get(), first)
+        with app.app_context():
+            self.assertIs(app.db.get(), first)
+        app.db.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
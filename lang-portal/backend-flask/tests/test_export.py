@@ -0,0 +1,60 @@
+import gzip
+import json
+import unittest
+from routes.export import load as load_export
+from routes.study_sessions import load as load_study_sessions
+from tests.support import SharedAppTestCase
+
+class TestExport(SharedAppTestCase):
+    routes = (load_export, load_study_sessions)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1})
+        cls.client.post('/api/study-sessions/1/reviews', json=[
+            {'word_id': 1, 'correct': True, 'answered_at': '2025-01-01 10:00:00'},
+            {'word_id': 2, 'correct': False, 'answered_at': '2025-02-01 10:00:00'}
+        ])
+
+    def export(self, path, **headers):
+        response = self.client.get(path, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        body = response.get_data()
+        if response.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return [json.loads(line) for line in body.decode('utf-8').splitlines()]
+
+    def test_words(self):
+        words = self.export('/export/words.ndjson')
+        self.assertEqual(len(words), 124)
+        self.assertEqual([word['id'] for word in words], sorted(word['id'] for word in words))
+        self.assertIsInstance(words[0]['parts'], list)
+
+        after = self.export(f"/export/words.ndjson?since={words[99]['id']}")
+        self.assertEqual(after, words[100:])
+
+    def test_gzip(self):
+        plain = self.export('/export/word_groups.ndjson')
+        response = self.client.get('/export/word_groups.ndjson', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(self.export('/export/word_groups.ndjson', **{'Accept-Encoding': 'gzip, deflate'}), plain)
+        refused = self.client.get('/export/word_groups.ndjson', headers={'Accept-Encoding': 'gzip;q=0, identity'})
+        self.assertNotIn('Content-Encoding', refused.headers)
+        self.assertEqual(len(plain), 124)
+
+    def test_since_timestamp(self):
+        reviews = self.export('/export/word_review_items.ndjson')
+        self.assertEqual([review['correct'] for review in reviews], [True, False])
+        recent = self.export('/export/word_review_items.ndjson?since=2025-01-15')
+        self.assertEqual([review['word_id'] for review in recent], [2])
+        self.assertEqual(len(self.export('/export/study_sessions.ndjson')), 1)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get('/export/groups.ndjson').status_code, 404)
+        self.assertEqual(self.client.get('/export/words.ndjson?since=yesterday').status_code, 400)
+        self.assertEqual(self.client.get('/export/word_review_items.ndjson?since=last-tuesday').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
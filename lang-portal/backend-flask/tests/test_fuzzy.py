@@ -0,0 +1,80 @@
+import unittest
+from lib.fuzzy import levenshtein, rebuild_trigrams, trigrams
+from routes.words import load as load_words
+from tests.support import AppTestCase
+
+class TestFuzzyHelpers(unittest.TestCase):
+    def test_levenshtein(self):
+        self.assertEqual(levenshtein('taberu', 'taberu'), 0)
+        self.assertEqual(levenshtein('taberru', 'taberu'), 1)
+        self.assertEqual(levenshtein('hrau', 'harau'), 1)
+        self.assertEqual(levenshtein('kitten', 'sitting'), 3)
+        self.assertEqual(levenshtein('', 'abc'), 3)
+
+    def test_trigrams_are_padded(self):
+        self.assertEqual(trigrams('Iku'), {'  i', ' ik', 'iku', 'ku '})
+
+class TestFuzzySearch(AppTestCase):
+    routes = (load_words,)
+
+    def fuzzy(self, query, **args):
+        response = self.client.get('/words/fuzzy', query_string={'q': query, **args})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()['words']
+
+    def execute(self, sql, params=()):
+        with self.app.app_context():
+            cursor = self.app.db.cursor()
+            cursor.execute(sql, params)
+            self.app.db.commit()
+            return cursor.lastrowid
+
+    def index(self):
+        with self.app.app_context():
+            cursor = self.app.db.cursor()
+            return (
+                cursor.execute('SELECT trigram, word_id FROM word_trigrams ORDER BY 1, 2').fetchall(),
+                cursor.execute('SELECT word_id, trigram_count FROM word_trigram_counts ORDER BY 1').fetchall()
+            )
+
+    def test_typos_rank_by_edit_distance(self):
+        words = self.fuzzy('taberru')
+        self.assertEqual(words[0]['romaji'], 'taberu')
+        self.assertEqual(words[0]['distance'], 1)
+        self.assertEqual(self.fuzzy('hrau')[0]['romaji'], 'harau')
+        distances = [word['distance'] for word in self.fuzzy('undosuru', threshold=0.2)]
+        self.assertEqual(distances, sorted(distances))
+        self.assertEqual(self.fuzzy('zzzzzz'), [])
+
+    def test_parts_romaji_are_indexed(self):
+        word_id = self.execute(
+            "INSERT INTO words (kanji, romaji, english, parts) VALUES ('猫', 'x', 'cat', ?)",
+            ('[{"kanji": "猫", "romaji": ["ne", "ko"]}]',)
+        )
+        self.assertEqual([word['id'] for word in self.fuzzy('neko')], [word_id])
+        self.assertEqual(self.fuzzy('neko')[0]['distance'], 0)
+
+    def test_index_follows_word_changes(self):
+        word_id = self.execute("INSERT INTO words (kanji, romaji, english, parts) VALUES ('猫', 'neko', 'cat', '[]')")
+        self.assertIn(word_id, [word['id'] for word in self.fuzzy('nekko')])
+
+        self.execute("UPDATE words SET romaji = 'inu' WHERE id = ?", (word_id,))
+        self.assertNotIn(word_id, [word['id'] for word in self.fuzzy('nekko')])
+        self.assertIn(word_id, [word['id'] for word in self.fuzzy('innu')])
+
+        incremental = self.index()
+        with self.app.app_context():
+            rebuild_trigrams(self.app.db.cursor())
+            self.app.db.commit()
+        self.assertEqual(self.index(), incremental)
+
+        self.execute('DELETE FROM words WHERE id = ?', (word_id,))
+        self.assertEqual(self.index()[0], [row for row in incremental[0] if row[1] != word_id])
+
+    def test_validates_arguments(self):
+        self.assertEqual(self.client.get('/words/fuzzy').status_code, 400)
+        self.assertEqual(self.client.get('/words/fuzzy?q=iku&threshold=2').status_code, 400)
+        self.assertEqual(self.client.get('/words/fuzzy?q=iku&limit=many').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
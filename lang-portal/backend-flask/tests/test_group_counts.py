@@ -0,0 +1,48 @@
+import unittest
+from lib.group_counts import repair_words_count, words_count_drift
+from routes.groups import load as load_groups
+from tests.support import AppTestCase
+
+class TestGroupWordsCount(AppTestCase):
+    routes = (load_groups,)
+
+    def execute(self, sql, params=()):
+        with self.app.app_context():
+            cursor = self.app.db.cursor()
+            cursor.execute(sql, params)
+            self.app.db.commit()
+
+    def counts(self):
+        groups = self.client.get('/groups?sort_by=words_count&order=desc').get_json()['groups']
+        return [(group['id'], group['word_count']) for group in groups]
+
+    def drift(self):
+        with self.app.app_context():
+            return words_count_drift(self.app.db.cursor())
+
+    def test_seeded_counts(self):
+        self.assertEqual(self.counts(), [(2, 64), (1, 60)])
+        self.assertEqual(self.drift(), [])
+
+    def test_triggers_follow_word_groups(self):
+        self.execute('INSERT INTO word_groups (word_id, group_id) SELECT word_id, 1 FROM word_groups WHERE group_id = 2 LIMIT 10')
+        self.assertEqual(self.counts(), [(1, 70), (2, 64)])
+
+        self.execute('UPDATE word_groups SET group_id = 2 WHERE group_id = 1 AND word_id <= 5')
+        self.assertEqual(self.counts(), [(2, 69), (1, 65)])
+
+        self.execute('DELETE FROM word_groups WHERE group_id = 2')
+        self.assertEqual(self.counts(), [(1, 65), (2, 0)])
+        self.assertEqual(self.drift(), [])
+
+    def test_repair(self):
+        self.execute('UPDATE groups SET words_count = 3 WHERE id = 1')
+        self.assertEqual(self.drift(), [(1, 3, 60)])
+        with self.app.app_context():
+            self.assertEqual(repair_words_count(self.app.db.cursor()), 1)
+            self.app.db.commit()
+        self.assertEqual(self.drift(), [])
+        self.assertEqual(self.counts(), [(2, 64), (1, 60)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,13 +17,19 @@ class TestGroupsRoutes(unittest.TestCase):
                 pass
             
         class MockCursor:
+            row_factory = None
+
             def __init__(self):
                 self.last_query = None
                 self.last_params = None
+                self.description = None
                 
             def execute(self, query, params=None):
                 self.last_query = query
                 self.last_params = params
+                if "SELECT w.*" in query:
+                    # Like sqlite3: one 7-tuple per column, name first
+                    self.description = [(name,) + (None,) * 6 for name in ('id', 'kanji', 'romaji', 'english', 'parts')]
                 
             def fetchone(self):
                 if "SELECT name FROM groups" in self.last_query:
@@ -38,18 +44,8 @@ class TestGroupsRoutes(unittest.TestCase):
                     # Check params instead of SQL string
                     if self.last_params and self.last_params[0] == 1:
                         return [
-                            {
-                                "id": 1,
-                                "kanji": "日本語",
-                                "romaji": "nihongo",
-                                "english": "Japanese language"
-                            },
-                            {
-                                "id": 2,
-                                "kanji": "漢字",
-                                "romaji": "kanji",
-                                "english": "Chinese characters"
-                            }
+                            (1, "日本語", "nihongo", "Japanese language", "[]"),
+                            (2, "漢字", "kanji", "Chinese characters", "[]")
                         ]
                 return []
                 
@@ -0,0 +1,71 @@
+import json
+import sqlite3
+import unittest
+from datetime import datetime
+from flask import Flask, jsonify
+from lib.json_provider import FastJSONProvider
+from lib.rows import fetch_dicts
+
+class TestFetchDicts(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('CREATE TABLE words (id INTEGER PRIMARY KEY, kanji TEXT, romaji TEXT)')
+        self.conn.executemany('INSERT INTO words VALUES (?, ?, ?)', [(1, '食べる', 'taberu'), (2, '飲む', 'nomu')])
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_all_columns(self):
+        cursor = self.conn.execute('SELECT * FROM words ORDER BY id')
+        self.assertEqual(fetch_dicts(cursor), [
+            {'id': 1, 'kanji': '食べる', 'romaji': 'taberu'},
+            {'id': 2, 'kanji': '飲む', 'romaji': 'nomu'}
+        ])
+
+    def test_selected_and_renamed_columns(self):
+        cursor = self.conn.execute('SELECT * FROM words ORDER BY id')
+        self.assertEqual(fetch_dicts(cursor, ['romaji', 'id']), [
+            {'romaji': 'taberu', 'id': 1},
+            {'romaji': 'nomu', 'id': 2}
+        ])
+        cursor = self.conn.execute('SELECT * FROM words ORDER BY id')
+        self.assertEqual(fetch_dicts(cursor, {'word': 'kanji'}), [{'word': '食べる'}, {'word': '飲む'}])
+
+    def test_restores_row_factory(self):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT * FROM words')
+        fetch_dicts(cursor)
+        self.assertIsInstance(cursor.execute('SELECT * FROM words').fetchone(), sqlite3.Row)
+
+    def test_unknown_column(self):
+        cursor = self.conn.execute('SELECT * FROM words')
+        with self.assertRaises(ValueError):
+            fetch_dicts(cursor, ['missing'])
+
+class TestFastJSONProvider(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.json = FastJSONProvider(self.app)
+
+        @self.app.route('/payload')
+        def payload():
+            return jsonify({'z': 1, 'kanji': '食べる', 'at': datetime(2025, 1, 2, 3, 4, 5)})
+
+        self.client = self.app.test_client()
+
+    def test_response(self):
+        response = self.client.get('/payload')
+        self.assertEqual(response.mimetype, 'application/json')
+        body = response.get_data(as_text=True)
+        # Keys keep their order, kanji are not escaped and the output is compact
+        self.assertTrue(body.startswith('{"z":1,"kanji":"食べる",'))
+        self.assertEqual(json.loads(body)['at'], 'Thu, 02 Jan 2025 03:04:05 GMT')
+
+    def test_round_trip(self):
+        data = {'words': [{'id': 1, 'english': 'to eat'}], 'next_cursor': None}
+        self.assertEqual(self.app.json.loads(self.app.json.dumps(data)), data)
+        self.assertEqual(self.app.json.dumps({'a': 1}, indent=2), '{\n  "a": 1\n}')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import io
+import json
+import unittest
+from lib.jsonstream import batched, iter_json_array
+
+class TestIterJsonArray(unittest.TestCase):
+    def parse(self, text, chunk_size=3):
+        return list(iter_json_array(io.StringIO(text), chunk_size=chunk_size))
+
+    def test_matches_json_load_across_chunk_boundaries(self):
+        data = [{"kanji": "払う", "romaji": "harau", "parts": [{"romaji": ["ha", "ra"]}]}, 12345, "a,]", [], None]
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+        for chunk_size in (1, 2, 7, 64):
+            self.assertEqual(self.parse(text, chunk_size), data)
+
+    def test_empty_array(self):
+        self.assertEqual(self.parse(' [ ] '), [])
+
+    def test_invalid_documents(self):
+        for text in ('{"a": 1}', '[1, 2', '[1,]', '[1 2]'):
+            with self.assertRaises(ValueError):
+                self.parse(text)
+
+    def test_batched(self):
+        self.assertEqual(list(batched(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import re
+import unittest
+from lib.metrics import Metrics, TimedCursor
+from routes.groups import load as load_groups
+from routes.metrics import load as load_metrics
+from routes.words import load as load_words
+from tests.support import AppTestCase
+
+class TestMetrics(AppTestCase):
+    routes = (load_groups, load_words, load_metrics)
+
+    def setup_app(self, app):
+        Metrics().init_app(app)
+        app.metrics.add_source('db_pool', app.db.pool.stats)
+
+    def server_timing(self, response):
+        match = re.match(r'db;dur=([\d.]+);desc="(\d+) queries, (\d+) rows", total;dur=([\d.]+)$', response.headers['Server-Timing'])
+        self.assertIsNotNone(match, response.headers['Server-Timing'])
+        return float(match.group(1)), int(match.group(2)), int(match.group(3)), float(match.group(4))
+
+    def test_server_timing(self):
+        response = self.client.get('/groups/1/words/raw')
+        db_ms, queries, rows, total_ms = self.server_timing(response)
+        # The group lookup and the word list
+        self.assertEqual(queries, 2)
+        self.assertEqual(rows, 1 + len(response.json))
+        self.assertLessEqual(db_ms, total_ms)
+
+        response = self.client.get('/groups/999')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.server_timing(response)[1:3], (1, 0))
+
+    def test_cursor_is_timed(self):
+        with self.app.test_request_context('/'):
+            self.assertIsInstance(self.app.db.cursor(), TimedCursor)
+
+    def test_prometheus_text(self):
+        self.client.get('/words')
+        self.client.get('/words?page=2')
+        self.client.get('/groups/1')
+        body = self.client.get('/metrics').get_data(as_text=True)
+
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/words",status="200"} 2', body)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="/groups/<int:id>",status="200",le="+Inf"} 1', body)
+        self.assertIn('db_queries_per_request_count{route="/words"} 2', body)
+        # Two queries per /words page: the words and the total count
+        self.assertIn('db_query_duration_seconds_count{route="/words"} 4', body)
+        self.assertRegex(body, r'db_rows_total\{route="/words"\} \d+')
+        self.assertRegex(body, r'db_pool_size \d+')
+
+        # Buckets are cumulative
+        counts = [int(n) for n in re.findall(r'http_request_duration_seconds_bucket\{method="GET",route="/words",status="200",le="[^"]+"\} (\d+)', body)]
+        self.assertEqual(counts, sorted(counts))
+        self.assertEqual(counts[-1], 2)
+
+if __name__ == '__main__':
+    unittest.main()
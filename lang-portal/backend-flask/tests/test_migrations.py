@@ -0,0 +1,93 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from lib.migrations import MigrationError, MigrationRunner, discover
+
+class TestMigrationRunner(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.conn = sqlite3.connect(':memory:')
+        self.write('0001_create_items.sql', 'CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT);')
+        self.write('0002_add_trigger.sql', '''
+            -- Keep a log of inserted items
+            CREATE TABLE item_log (item_id INTEGER);
+            CREATE TRIGGER items_log AFTER INSERT ON items BEGIN
+              INSERT INTO item_log (item_id) VALUES (NEW.id);
+            END;
+        ''')
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def write(self, filename, sql):
+        (self.dir / filename).write_text(sql)
+
+    def runner(self):
+        return MigrationRunner(self.conn, directory=self.dir)
+
+    def test_applies_only_pending_migrations(self):
+        applied = self.runner().migrate()
+        self.assertEqual([m.version for m in applied], [1, 2])
+        self.assertEqual(self.runner().migrate(), [])
+
+        self.conn.execute("INSERT INTO items (name) VALUES ('a')")
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM item_log').fetchone()[0], 1)
+
+        self.write('0003_add_index.sql', 'CREATE INDEX idx_items_name ON items (name);')
+        self.assertEqual([m.version for m in self.runner().migrate()], [3])
+
+    def test_dry_run_does_not_apply(self):
+        pending = self.runner().migrate(dry_run=True)
+        self.assertEqual([m.filename for m in pending], ['0001_create_items.sql', '0002_add_trigger.sql'])
+        tables = self.conn.execute("SELECT name FROM sqlite_master WHERE name = 'items'").fetchall()
+        self.assertEqual(tables, [])
+
+    def test_failed_migration_is_rolled_back(self):
+        self.write('0003_broken.sql', 'CREATE TABLE extra (id INTEGER);\nINSERT INTO missing VALUES (1);')
+        with self.assertRaises(MigrationError):
+            self.runner().migrate()
+        versions = [row[0] for row in self.conn.execute('SELECT version FROM schema_migrations')]
+        self.assertEqual(versions, [1, 2])
+        tables = self.conn.execute("SELECT name FROM sqlite_master WHERE name = 'extra'").fetchall()
+        self.assertEqual(tables, [])
+
+    def test_modified_migration_is_rejected(self):
+        self.runner().migrate()
+        self.write('0001_create_items.sql', 'CREATE TABLE items (id INTEGER PRIMARY KEY);')
+        with self.assertRaises(MigrationError):
+            self.runner().migrate()
+
+    def test_duplicate_versions_are_rejected(self):
+        self.write('002_other.sql', 'SELECT 1;')
+        with self.assertRaises(MigrationError):
+            discover(self.dir)
+
+    def test_concurrent_runners_apply_each_migration_once(self):
+        path = str(self.dir / 'words.db')
+        first, second = sqlite3.connect(path), sqlite3.connect(path)
+        try:
+            # Both processes computed the pending list before either took the write lock
+            stale = MigrationRunner(second, directory=self.dir).pending()
+            self.assertEqual([m.version for m in MigrationRunner(first, directory=self.dir).migrate()], [1, 2])
+
+            runner = MigrationRunner(second, directory=self.dir)
+            runner.pending = lambda: stale
+            self.assertEqual(runner.migrate(), [])
+            self.assertFalse(second.in_transaction)
+            self.assertEqual(second.execute('SELECT COUNT(*) FROM schema_migrations').fetchone()[0], 2)
+        finally:
+            first.close()
+            second.close()
+
+    def test_incomplete_migration_leaves_no_transaction_open(self):
+        self.write('0003_broken.sql', 'CREATE TABLE broken (id INTEGER')
+        with self.assertRaises(MigrationError):
+            self.runner().migrate()
+        self.assertFalse(self.conn.in_transaction)
+        self.assertEqual([m.version for m in self.runner().pending()], [3])
+
+if __name__ == '__main__':
+    unittest.main()
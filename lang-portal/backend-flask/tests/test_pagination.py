@@ -0,0 +1,55 @@
+import unittest
+from lib.pagination import encode_cursor
+from routes.words import load as load_words
+from routes.groups import load as load_groups
+from tests.support import SharedAppTestCase
+
+class TestKeysetPagination(SharedAppTestCase):
+    routes = (load_words, load_groups)
+
+    def collect(self, path, key):
+        ids, token = [], ''
+        while token is not None:
+            data = self.client.get(f'{path}&cursor={token}').get_json()
+            self.assertNotIn('total_pages', data)
+            ids.extend(item['id'] for item in data[key])
+            token = data['next_cursor']
+        return ids
+
+    def pages(self, path, key):
+        ids, page = [], 1
+        while True:
+            data = self.client.get(f'{path}&page={page}').get_json()
+            ids.extend(item['id'] for item in data[key])
+            if page >= data['total_pages']:
+                return ids
+            page += 1
+
+    def test_cursor_pages_match_offset_pages(self):
+        for sort_by in ('kanji', 'romaji', 'english', 'correct_count', 'wrong_count', 'accuracy'):
+            for order in ('asc', 'desc'):
+                for path in ('/words', '/groups/1/words'):
+                    url = f'{path}?sort_by={sort_by}&order={order}'
+                    with self.subTest(url=url):
+                        ids = self.collect(url, 'words')
+                        self.assertEqual(ids, self.pages(url, 'words'))
+                        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_word_listings_share_one_shape(self):
+        fields = {'id', 'kanji', 'romaji', 'english', 'correct_count', 'wrong_count'}
+        for path in ('/words?sort_by=accuracy&cursor=', '/groups/1/words?sort_by=accuracy&cursor='):
+            with self.subTest(path=path):
+                self.assertEqual(set(self.client.get(path).get_json()['words'][0]), fields)
+
+    def test_total_is_optional(self):
+        data = self.client.get('/words?cursor=&include_total=true').get_json()
+        self.assertEqual(data['total_words'], 124)
+        self.assertNotIn('current_page', data)
+
+    def test_invalid_cursors_are_rejected(self):
+        self.assertEqual(self.client.get('/words?cursor=not-a-cursor').status_code, 400)
+        token = encode_cursor('kanji', 'asc', ['a', 1])
+        self.assertEqual(self.client.get(f'/words?sort_by=romaji&cursor={token}').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
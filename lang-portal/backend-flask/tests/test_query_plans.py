@@ -0,0 +1,11 @@
+import unittest
+from lib.query_plans import check
+
+class TestQueryPlans(unittest.TestCase):
+    def test_route_queries_use_indexes(self):
+        result = check()
+        self.assertGreater(result['statements'], 0)
+        self.assertEqual(result['violations'], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from unittest import mock
+from lib.response_cache import DataVersion, ResponseCache
+from routes.dashboard import load as load_dashboard
+from routes.groups import load as load_groups
+from routes.study_sessions import load as load_study_sessions
+from tests.support import AppTestCase
+
+class TestResponseCache(AppTestCase):
+    routes = (load_dashboard, load_groups, load_study_sessions)
+
+    def setup_app(self, app):
+        self.data_version = DataVersion(self.database)
+        self.cache = ResponseCache(self.data_version)
+        self.cache.init_app(app)
+
+    def tearDown(self):
+        self.data_version.close()
+        super().tearDown()
+
+    def test_hit_and_etag(self):
+        first = self.client.get('/groups/1/words/raw')
+        self.assertEqual(first.status_code, 200)
+        self.assertIsNotNone(first.headers.get('ETag'))
+
+        with mock.patch.object(self.app.db, 'cursor', side_effect=AssertionError('queried the database')):
+            second = self.client.get('/groups/1/words/raw')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.get_data(), first.get_data())
+        self.assertEqual(second.headers['ETag'], first.headers['ETag'])
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_if_none_match(self):
+        etag = self.client.get('/dashboard/stats').headers['ETag']
+        with mock.patch.object(self.app.db, 'cursor', side_effect=AssertionError('queried the database')):
+            response = self.client.get('/dashboard/stats', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_data(), b'')
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertEqual(self.cache.stats()['not_modified'], 1)
+
+        # A freshly built response is conditional too: ?page=1 is another
+        # cache entry with the same body and so the same ETag
+        response = self.client.get('/groups', headers={'If-None-Match': '"other"'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/groups?page=1', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.cache.stats()['entries'], 3)
+
+    def test_writes_invalidate(self):
+        before = self.client.get('/dashboard/stats')
+        self.client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1})
+        after = self.client.get('/dashboard/stats', headers={'If-None-Match': before.headers['ETag']})
+        self.assertEqual(after.status_code, 200)
+        self.assertEqual(after.json['total_sessions'], before.json['total_sessions'] + 1)
+        self.assertNotEqual(after.headers['ETag'], before.headers['ETag'])
+        self.assertEqual(self.cache.stats()['invalidations'], 1)
+
+    def test_keyed_on_arguments(self):
+        self.client.get('/groups?sort_by=name')
+        response = self.client.get('/groups?sort_by=words_count&order=desc')
+        self.assertEqual(self.cache.stats()['hits'], 0)
+        self.assertEqual(self.cache.stats()['entries'], 2)
+        self.assertEqual(self.client.get('/groups?order=desc&sort_by=words_count').get_data(), response.get_data())
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_lru_eviction(self):
+        self.cache.max_bytes = len(self.client.get('/groups/1').get_data()) * 2
+        self.cache.clear()
+        self.client.get('/groups/1?v=a')
+        self.client.get('/groups/1?v=b')
+        self.client.get('/groups/1?v=a')
+        self.client.get('/groups/1?v=c')
+        stats = self.cache.stats()
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['entries'], 2)
+        self.assertLessEqual(stats['bytes'], self.cache.max_bytes)
+        # v=b was the least recently used
+        self.client.get('/groups/1?v=a')
+        self.assertEqual(self.cache.stats()['hits'], 2)
+        self.client.get('/groups/1?v=b')
+        self.assertEqual(self.cache.stats()['hits'], 2)
+
+    def test_uncached_routes(self):
+        self.client.get('/groups/999')
+        self.client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1})
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+from lib.reviews import rebuild_session_stats, rebuild_word_reviews
+from routes.groups import load as load_groups
+from routes.study_sessions import load as load_study_sessions
+from routes.words import load as load_words
+from tests.support import AppTestCase
+
+class TestReviewCounters(AppTestCase):
+    routes = (load_study_sessions, load_words, load_groups)
+
+    def setUp(self):
+        super().setUp()
+        self.client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1})
+
+    def review(self, word_id, correct):
+        response = self.client.post('/api/study-sessions/1/review', json={'word_id': word_id, 'correct': correct})
+        self.assertEqual(response.status_code, 201)
+
+    def test_counters_follow_review_submissions(self):
+        for correct in (True, True, False):
+            self.review(3, correct)
+        self.review(5, False)
+
+        counters = self.query('SELECT word_id, correct_count, wrong_count FROM word_reviews WHERE word_id IN (3, 5) ORDER BY word_id')
+        self.assertEqual(counters, [(3, 2, 1), (5, 0, 1)])
+        self.assertIsNotNone(self.query('SELECT last_reviewed FROM word_reviews WHERE word_id = 3')[0][0])
+
+        data = self.client.get('/words?sort_by=correct_count&order=desc').get_json()
+        self.assertEqual(data['words'][0]['id'], 3)
+        self.assertEqual(set(data['words'][0]), {'id', 'kanji', 'romaji', 'english', 'correct_count', 'wrong_count'})
+
+        data = self.client.get('/words?sort_by=accuracy&min_accuracy=0.5').get_json()
+        self.assertEqual([w['id'] for w in data['words']], [3])
+        self.assertEqual(data['total_words'], 1)
+
+    def test_invalid_single_review_records_nothing(self):
+        before = self.query('SELECT * FROM dashboard_stats')
+        self.assertEqual(self.client.post('/api/study-sessions/42/review', json={'word_id': 1, 'correct': True}).status_code, 404)
+        self.assertEqual(self.client.post('/api/study-sessions/1/review', json={'word_id': 9999, 'correct': True}).status_code, 400)
+        self.assertEqual(self.client.post('/api/study-sessions/1/review', json={'word_id': 1, 'correct': 'yes'}).status_code, 400)
+        self.assertEqual(self.client.post('/api/study-sessions/1/review', data='nope').status_code, 400)
+        self.assertEqual(self.query('SELECT COUNT(*) FROM word_review_items'), [(0,)])
+        self.assertEqual(self.query('SELECT SUM(correct_count + wrong_count) FROM word_reviews'), [(0,)])
+        self.assertEqual(self.query('SELECT * FROM dashboard_stats'), before)
+
+    def test_new_words_get_counter_rows(self):
+        with self.app.app_context():
+            cursor = self.app.db.cursor()
+            cursor.execute("INSERT INTO words (kanji, romaji, english, parts) VALUES ('猫', 'neko', 'cat', '[]')")
+            word_id = cursor.lastrowid
+            self.app.db.commit()
+        self.assertEqual(self.query('SELECT correct_count, wrong_count FROM word_reviews WHERE word_id = ?', (word_id,)), [(0, 0)])
+
+    def test_rebuild_matches_incremental_counters(self):
+        for word_id, correct in [(1, True), (1, False), (2, True), (1, True)]:
+            self.review(word_id, correct)
+        before = self.query('SELECT word_id, correct_count, wrong_count, last_reviewed FROM word_reviews ORDER BY word_id')
+        with self.app.app_context():
+            rebuild_word_reviews(self.app.db.cursor())
+            self.app.db.commit()
+        after = self.query('SELECT word_id, correct_count, wrong_count, last_reviewed FROM word_reviews ORDER BY word_id')
+        self.assertEqual(before, after)
+
+    def test_reset_zeroes_counters(self):
+        self.review(1, True)
+        self.client.post('/api/study-sessions/reset')
+        self.assertEqual(self.query('SELECT SUM(correct_count + wrong_count) FROM word_reviews'), [(0,)])
+
+    def test_session_rollup_follows_reviews(self):
+        session = self.client.get('/groups/1/study_sessions').get_json()['study_sessions'][0]
+        self.assertEqual(session['review_items_count'], 0)
+        start, end_time = self.query('SELECT created_at, end_time FROM study_sessions JOIN study_session_stats ON study_session_id = id')[0]
+        self.assertEqual(session['end_time'], end_time)
+        self.assertEqual(self.query("SELECT datetime(?, '+30 minutes')", (start,)), [(end_time,)])
+
+        for word_id, correct in [(1, True), (2, False), (3, True)]:
+            self.review(word_id, correct)
+        last_review = self.query('SELECT MAX(created_at) FROM word_review_items')[0][0]
+
+        session = self.client.get('/groups/1/study_sessions').get_json()['study_sessions'][0]
+        self.assertEqual((session['review_items_count'], session['end_time']), (3, last_review))
+        detail = self.client.get('/api/study-sessions/1').get_json()['session']
+        self.assertEqual((detail['review_items_count'], detail['end_time']), (3, last_review))
+        listed = self.client.get('/api/study-sessions').get_json()['items'][0]
+        self.assertEqual(listed['review_items_count'], 3)
+
+        before = self.query('SELECT * FROM study_session_stats')
+        with self.app.app_context():
+            rebuild_session_stats(self.app.db.cursor())
+            self.app.db.commit()
+        self.assertEqual(self.query('SELECT * FROM study_session_stats'), before)
+
+        self.client.post('/api/study-sessions/reset')
+        self.assertEqual(self.query('SELECT COUNT(*) FROM study_session_stats'), [(0,)])
+
+    def test_batch_submission(self):
+        batch = [
+            {'word_id': 1, 'correct': True, 'answered_at': '2025-01-02T03:04:05'},
+            {'word_id': 1, 'correct': False},
+            {'word_id': 2, 'correct': True}
+        ]
+        response = self.client.post('/api/study-sessions/1/reviews', json=batch)
+        self.assertEqual(response.status_code, 201)
+        results = response.get_json()['results']
+        self.assertEqual([r['status'] for r in results], ['recorded'] * 3)
+        self.assertEqual(results[0]['answered_at'], '2025-01-02 03:04:05')
+
+        self.assertEqual(self.query('SELECT COUNT(*) FROM word_review_items'), [(3,)])
+        counters = self.query('SELECT word_id, correct_count, wrong_count FROM word_reviews WHERE word_id IN (1, 2) ORDER BY word_id')
+        self.assertEqual(counters, [(1, 1, 1), (2, 1, 0)])
+        self.assertEqual(self.query('SELECT review_count, correct_count FROM study_session_stats WHERE study_session_id = 1'), [(3, 2)])
+
+    def test_invalid_batch_records_nothing(self):
+        batch = [
+            {'word_id': 1, 'correct': True},
+            {'word_id': 999999, 'correct': True},
+            {'word_id': 2, 'correct': 'yes'},
+            {'word_id': 3, 'correct': False, 'answered_at': 'yesterday'}
+        ]
+        response = self.client.post('/api/study-sessions/1/reviews', json=batch)
+        self.assertEqual(response.status_code, 400)
+        results = response.get_json()['results']
+        self.assertNotIn('error', results[0])
+        self.assertEqual(results[1]['error'], 'word 999999 not found')
+        self.assertEqual(results[2]['error'], 'correct must be a boolean')
+        self.assertEqual(results[3]['error'], 'answered_at is not a valid timestamp')
+        self.assertEqual(self.query('SELECT COUNT(*) FROM word_review_items'), [(0,)])
+
+        self.assertEqual(self.client.post('/api/study-sessions/42/reviews', json=batch[:1]).status_code, 404)
+        self.assertEqual(self.client.post('/api/study-sessions/1/reviews', json=[]).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import random
+import unittest
+from collections import Counter
+from lib.sampling import AliasTable
+from routes.groups import load as load_groups
+from routes.study_sessions import load as load_study_sessions
+from tests.support import AppTestCase
+
+class TestAliasTable(unittest.TestCase):
+    def test_draws_follow_weights(self):
+        table = AliasTable(['a', 'b', 'c', 'd'], [1, 2, 3, 4])
+        rng = random.Random(7)
+        counts = Counter(table.draw(rng) for _ in range(100000))
+        for word, weight in zip('abcd', (1, 2, 3, 4)):
+            self.assertAlmostEqual(counts[word] / 100000, weight / 10, delta=0.01)
+
+    def test_zero_weight_is_never_drawn(self):
+        table = AliasTable([1, 2, 3], [0, 1, 1])
+        rng = random.Random(1)
+        self.assertNotIn(1, {table.draw(rng) for _ in range(10000)})
+
+    def test_sample_is_distinct(self):
+        table = AliasTable(list(range(5)), [100, 1, 1, 1, 1])
+        self.assertEqual(sorted(table.sample(10, random.Random(3))), [0, 1, 2, 3, 4])
+        self.assertEqual(AliasTable([], []).sample(3), [])
+
+class TestSampleRoute(AppTestCase):
+    routes = (load_study_sessions, load_groups)
+
+    def setUp(self):
+        super().setUp()
+        self.client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1})
+
+    def test_sample(self):
+        data = self.client.get('/groups/1/sample?k=5').get_json()
+        self.assertEqual(data['strategy'], 'uniform')
+        ids = [w['id'] for w in data['words']]
+        self.assertEqual(len(set(ids)), 5)
+        self.assertEqual(set(data['words'][0]), {'id', 'kanji', 'romaji', 'english'})
+
+        # The group has 60 words
+        self.assertEqual(len(self.client.get('/groups/1/sample?k=1000').get_json()['words']), 60)
+
+    def test_errors(self):
+        self.assertEqual(self.client.get('/groups/42/sample').status_code, 404)
+        self.assertEqual(self.client.get('/groups/1/sample?k=x').status_code, 400)
+        self.assertEqual(self.client.get('/groups/1/sample?strategy=hardest').status_code, 400)
+
+    def test_error_weighted_follows_reviews(self):
+        self.client.get('/groups/1/sample?strategy=error_weighted')
+        self.assertEqual(self.app.sample_tables.stats()['builds'], 1)
+        self.client.get('/groups/1/sample?strategy=error_weighted')
+        self.assertEqual(self.app.sample_tables.stats()['hits'], 1)
+
+        # Every word but 1 answered correctly many times
+        reviews = [{'word_id': w, 'correct': True} for w in range(2, 61) for _ in range(20)]
+        reviews += [{'word_id': 1, 'correct': False} for _ in range(20)]
+        self.assertEqual(self.client.post('/api/study-sessions/1/reviews', json=reviews[:1000]).status_code, 201)
+        self.assertEqual(self.client.post('/api/study-sessions/1/reviews', json=reviews[1000:]).status_code, 201)
+
+        self.assertEqual(self.client.get('/groups/1/sample?k=1&strategy=error_weighted').status_code, 200)
+        self.assertEqual(self.app.sample_tables.stats()['builds'], 2)
+
+        # Word 1 weighs 21/22 and the other 59 words 1/22 each
+        with self.app.app_context():
+            table = self.app.sample_tables.get(self.app.db.cursor(), 1, 'error_weighted')
+        rng = random.Random(5)
+        share = sum(table.draw(rng) == 1 for _ in range(20000)) / 20000
+        self.assertAlmostEqual(share, 21 / 80, delta=0.02)
+
+    def test_membership_change_rebuilds(self):
+        self.client.get('/groups/2/sample')
+        with self.app.app_context():
+            cursor = self.app.db.cursor()
+            cursor.execute('INSERT INTO word_groups (word_id, group_id) VALUES (1, 2)')
+            self.app.db.commit()
+        ids = {w['id'] for w in self.client.get('/groups/2/sample?k=100').get_json()['words']}
+        self.assertIn(1, ids)
+        self.assertEqual(len(ids), 65)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+from lib.schedule import rebuild_schedule
+from routes.groups import load as load_groups
+from routes.study_sessions import load as load_study_sessions
+from tests.support import AppTestCase
+
+class TestSchedule(AppTestCase):
+    routes = (load_study_sessions, load_groups)
+
+    def setUp(self):
+        super().setUp()
+        self.client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1})
+
+    def submit(self, reviews):
+        response = self.client.post('/api/study-sessions/1/reviews', json=reviews)
+        self.assertEqual(response.status_code, 201)
+
+    def test_sm2_intervals(self):
+        self.submit([
+            {'word_id': 1, 'correct': True, 'answered_at': '2025-01-01 10:00:00'},
+            {'word_id': 1, 'correct': True, 'answered_at': '2025-01-02 10:00:00'},
+            {'word_id': 1, 'correct': True, 'answered_at': '2025-01-08 10:00:00'}
+        ])
+        self.assertEqual(
+            self.query('SELECT repetitions, interval_days, ease, due_at FROM word_schedule WHERE word_id = 1'),
+            [(3, 15, 2.5, '2025-01-23 10:00:00')]
+        )
+
+        # A wrong answer starts the word over and lowers its ease
+        self.submit([{'word_id': 1, 'correct': False, 'answered_at': '2025-01-23 10:00:00'}])
+        self.assertEqual(
+            self.query('SELECT repetitions, interval_days, due_at FROM word_schedule WHERE word_id = 1'),
+            [(0, 1, '2025-01-24 10:00:00')]
+        )
+        self.assertAlmostEqual(self.query('SELECT ease FROM word_schedule WHERE word_id = 1')[0][0], 1.96)
+        self.assertEqual(self.query('SELECT next_due_at FROM word_groups WHERE word_id = 1'), [('2025-01-24 10:00:00',)])
+
+    def test_rebuild_matches_incremental_schedule(self):
+        self.submit([
+            {'word_id': 1, 'correct': True, 'answered_at': '2025-01-01 10:00:00'},
+            {'word_id': 2, 'correct': False, 'answered_at': '2025-01-01 10:00:05'}
+        ])
+        for correct in (True, False, True):
+            response = self.client.post('/api/study-sessions/1/review', json={'word_id': 1, 'correct': correct})
+            self.assertEqual(response.status_code, 201)
+
+        sql = 'SELECT word_id, repetitions, interval_days, ease, last_reviewed_at, due_at FROM word_schedule ORDER BY word_id'
+        before = self.query(sql)
+        with self.app.app_context():
+            self.assertEqual(rebuild_schedule(self.app.db.cursor()), 2)
+            self.app.db.commit()
+        self.assertEqual(self.query(sql), before)
+
+    def test_due_queue(self):
+        self.submit([
+            {'word_id': 3, 'correct': True, 'answered_at': '2025-01-02 10:00:00'},
+            {'word_id': 2, 'correct': True, 'answered_at': '2025-01-01 10:00:00'},
+            {'word_id': 4, 'correct': True}
+        ])
+
+        data = self.client.get('/groups/1/due?limit=4').get_json()
+        self.assertEqual(data['group_id'], 1)
+        # Overdue words, longest overdue first, then words never reviewed; word 4 is due tomorrow
+        self.assertEqual([w['id'] for w in data['words']], [2, 3, 1, 5])
+        self.assertEqual(data['words'][0]['due_at'], '2025-01-02 10:00:00')
+        self.assertIsNone(data['words'][2]['due_at'])
+        self.assertEqual(data['next_due_at'], self.query('SELECT due_at FROM word_schedule WHERE word_id = 4')[0][0])
+
+        data = self.client.get('/groups/1/due?include_new=false').get_json()
+        self.assertEqual([w['id'] for w in data['words']], [2, 3])
+
+    def test_due_errors(self):
+        self.assertEqual(self.client.get('/groups/42/due').status_code, 404)
+        self.assertEqual(self.client.get('/groups/1/due?limit=x').status_code, 400)
+        self.assertEqual(len(self.client.get('/groups/1/due').get_json()['words']), 20)
+        # Capped at MAX_DUE_LIMIT; the group has 60 words
+        self.assertEqual(len(self.client.get('/groups/1/due?limit=1000').get_json()['words']), 60)
+
+    def test_word_added_to_another_group_keeps_schedule(self):
+        self.submit([{'word_id': 1, 'correct': True, 'answered_at': '2025-01-01 10:00:00'}])
+        with self.app.app_context():
+            cursor = self.app.db.cursor()
+            cursor.execute("INSERT INTO groups (name) VALUES ('Review')")
+            cursor.execute('INSERT INTO word_groups (word_id, group_id) VALUES (1, ?)', (cursor.lastrowid,))
+            self.app.db.commit()
+        self.assertEqual(self.query('SELECT DISTINCT next_due_at FROM word_groups WHERE word_id = 1'), [('2025-01-02 10:00:00',)])
+
+        with self.app.app_context():
+            self.app.db.cursor().execute('DELETE FROM word_schedule')
+            self.app.db.commit()
+        self.assertEqual(self.query('SELECT COUNT(*) FROM word_groups WHERE next_due_at IS NOT NULL'), [(0,)])
+
+    def test_migration_backfills_existing_reviews(self):
+        self.submit([
+            {'word_id': 2, 'correct': True, 'answered_at': '2025-01-01 10:00:00'},
+            {'word_id': 2, 'correct': False, 'answered_at': '2025-01-02 10:00:00'},
+            {'word_id': 3, 'correct': True, 'answered_at': '2025-01-03 10:00:00'}
+        ])
+        sql = 'SELECT word_id, repetitions, interval_days, ease, last_reviewed_at, due_at FROM word_schedule ORDER BY word_id'
+        before = self.query(sql)
+
+        # A database whose reviews predate word_schedule
+        with self.app.app_context():
+            cursor = self.app.db.cursor()
+            cursor.execute('DELETE FROM word_schedule')
+            cursor.execute('DELETE FROM schema_migrations WHERE version = 11')
+            self.app.db.commit()
+            self.assertEqual([m.version for m in self.app.db.migrate()], [11])
+        self.assertEqual(self.query(sql), before)
+
+        data = self.client.get('/groups/1/due?limit=3').get_json()
+        self.assertEqual([w['id'] for w in data['words']], [2, 3, 1])
+        self.assertEqual(data['words'][0]['due_at'], '2025-01-03 10:00:00')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from lib.search import match_query
+from routes.words import load as load_words
+from tests.support import SharedAppTestCase
+
+class TestWordSearch(SharedAppTestCase):
+    routes = (load_words,)
+
+    def search(self, query, **args):
+        response = self.client.get('/words/search', query_string={'q': query, **args})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def test_match_query_quotes_terms(self):
+        self.assertEqual(match_query('to ea'), '"to"* "ea"*')
+        self.assertEqual(match_query('a"b OR'), '"a""b"* "OR"*')
+        self.assertEqual(match_query('   '), '')
+
+    def test_prefix_matching(self):
+        data = self.search('tab')
+        self.assertTrue(data['words'])
+        self.assertTrue(all(word['romaji'].startswith('tab') for word in data['words']))
+        self.assertIn('食べる', [word['kanji'] for word in data['words']])
+
+        data = self.search('to ea')
+        self.assertEqual([word['english'] for word in data['words']], ['to eat'])
+
+    def test_index_follows_word_changes(self):
+        with self.app.app_context():
+            cursor = self.app.db.cursor()
+            cursor.execute("INSERT INTO words (kanji, romaji, english, parts) VALUES ('猫', 'neko', 'cat', '[]')")
+            word_id = cursor.lastrowid
+            self.app.db.commit()
+        self.assertEqual([word['id'] for word in self.search('nek')['words']], [word_id])
+
+        with self.app.app_context():
+            cursor = self.app.db.cursor()
+            cursor.execute("UPDATE words SET romaji = 'neeko' WHERE id = ?", (word_id,))
+            self.app.db.commit()
+        self.assertEqual(self.search('nek')['words'], [])
+        self.assertEqual([word['id'] for word in self.search('neek')['words']], [word_id])
+
+        with self.app.app_context():
+            cursor = self.app.db.cursor()
+            cursor.execute('DELETE FROM words WHERE id = ?', (word_id,))
+            self.app.db.commit()
+        self.assertEqual(self.search('neek')['words'], [])
+
+    def test_keyset_pages(self):
+        with self.app.app_context():
+            cursor = self.app.db.cursor()
+            cursor.executemany(
+                "INSERT INTO words (kanji, romaji, english, parts) VALUES (?, ?, 'test word', '[]')",
+                [(f'試{i}', f'shiken{i}') for i in range(120)]
+            )
+            self.app.db.commit()
+        seen = []
+        data = self.search('shiken')
+        while True:
+            seen.extend(word['id'] for word in data['words'])
+            if not data['next_cursor']:
+                break
+            data = self.search('shiken', cursor=data['next_cursor'])
+        self.assertEqual(len(seen), 120)
+        self.assertEqual(len(set(seen)), 120)
+
+    def test_requires_query(self):
+        self.assertEqual(self.client.get('/words/search').status_code, 400)
+        self.assertEqual(self.client.get('/words/search?q=ta&cursor=bogus').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
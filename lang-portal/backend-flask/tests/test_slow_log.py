@@ -0,0 +1,95 @@
+import json
+import os
+import unittest
+from lib.metrics import Metrics
+from lib.slow_log import SlowQueryLog, normalize, rank, read_entries, redact
+from routes.words import load as load_words
+from tests.support import AppTestCase
+
+class TestSlowQueryLog(AppTestCase):
+    routes = (load_words,)
+
+    def setup_app(self, app):
+        self.path = os.path.join(self.tmp.name, 'slow.jsonl')
+        Metrics().init_app(app)
+        # Every statement counts as slow
+        app.metrics.slow_log = SlowQueryLog(self.path, threshold_ms=0)
+
+    def tearDown(self):
+        self.app.metrics.slow_log.close()
+        super().tearDown()
+
+    def test_logged_statement(self):
+        self.client.get('/words/search?q=taberu')
+        self.app.metrics.slow_log.close()
+        with open(self.path, encoding='utf-8') as file:
+            entries = [json.loads(line) for line in file]
+
+        search = [entry for entry in entries if 'words_fts MATCH' in entry['sql']]
+        self.assertEqual(len(search), 1)
+        entry = search[0]
+        self.assertEqual(entry['route'], '/words/search')
+        self.assertGreaterEqual(entry['duration_ms'], 0)
+        self.assertNotIn('\n', entry['sql'])
+        # The search term is redacted, the page size is not
+        self.assertIn('<str:', entry['params'][0])
+        self.assertNotIn('taberu', json.dumps(entry['params']))
+        self.assertTrue(any('words_fts' in step for step in entry['plan']))
+
+    def test_explain_never_uses_a_released_connection(self):
+        # GET /words returns its connection to the pool before the response is logged
+        slow_log = self.app.metrics.slow_log
+        pool = self.app.db.pool
+        record = slow_log.record
+        used = []
+
+        def checked_record(conn, *args):
+            used.append(any(conn is idle for idle, _ in list(pool._idle.queue)))
+            return record(conn, *args)
+
+        slow_log.record = checked_record
+        self.assertEqual(self.client.get('/words?sort_by=english').status_code, 200)
+        self.assertTrue(used)
+        self.assertFalse(any(used))
+        self.assertEqual(pool.stats()['in_use'], 0)
+
+        slow_log.close()
+        entries = list(read_entries(self.path))
+        self.assertTrue(all(entry['plan'] for entry in entries if entry['sql'].startswith('SELECT')))
+
+    def test_threshold(self):
+        self.app.metrics.slow_log.threshold = 60.0
+        self.client.get('/words')
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_rank(self):
+        for page in (1, 2, 3):
+            self.client.get(f'/words?page={page}&sort_by=english')
+        self.client.get('/words/1')
+        self.app.metrics.slow_log.close()
+
+        ranked = rank(read_entries(self.path), top=50)
+        shapes = {shape['sql']: shape for shape in ranked}
+        self.assertEqual(len(shapes), len(ranked))
+        words = [shape for shape in ranked if shape['sql'].startswith('SELECT w.id, w.kanji') and 'ORDER BY w.english' in shape['sql']]
+        self.assertEqual(len(words), 1)
+        self.assertEqual(words[0]['count'], 3)
+        self.assertEqual(words[0]['routes'], ['/words'])
+        self.assertEqual([shape['total_ms'] for shape in ranked], sorted((shape['total_ms'] for shape in ranked), reverse=True))
+
+    def test_read_rotated(self):
+        for i, name in enumerate(['slow.jsonl.2', 'slow.jsonl.1', 'slow.jsonl']):
+            with open(os.path.join(self.tmp.name, name), 'w', encoding='utf-8') as file:
+                file.write(json.dumps({'sql': f'SELECT {i}', 'duration_ms': i}) + '\n')
+        self.assertEqual([entry['duration_ms'] for entry in read_entries(self.path)], [0, 1, 2])
+
+    def test_normalize_and_redact(self):
+        self.assertEqual(
+            normalize("SELECT *\n  FROM words WHERE id IN (?, ?, ?) AND english = 'to eat' LIMIT 10"),
+            'SELECT * FROM words WHERE id IN (?) AND english = ? LIMIT ?'
+        )
+        self.assertEqual(redact((1, 'secret', None, b'ab')), [1, '<str:6>', None, '<blob:2>'])
+        self.assertEqual(redact({'q': 'x'}), {'q': '<str:1>'})
+
+if __name__ == '__main__':
+    unittest.main()
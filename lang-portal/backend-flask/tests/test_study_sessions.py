@@ -9,6 +9,11 @@ class TestStudySessionsRoutes(unittest.TestCase):
         
         # Mock the database cursor
         class MockDB:
+            in_transaction = False
+
+            def get(self):
+                # Stands in for the request's connection too
+                return self
             def cursor(self):
                 return MockCursor()
             def commit(self):
@@ -36,6 +41,10 @@ class TestStudySessionsRoutes(unittest.TestCase):
                         'created_at': '2024-01-01 00:00:00'
                     }
                 return None
+
+            def fetchall(self):
+                # validate_reviews: the session and word 1 exist
+                return [{'session_found': 1, 'position': 0, 'word_found': 1, 'answered_at': None}]
                 
             def lastrowid(self):
                 return 1
@@ -0,0 +1,74 @@
+import json
+import threading
+import unittest
+from routes.groups import load as load_groups
+from tests.support import AppTestCase
+
+class TestWordImport(AppTestCase):
+    routes = (load_groups,)
+
+    def post_ndjson(self, group_id, words):
+        body = ''.join(json.dumps(word, ensure_ascii=False) + '\n' for word in words)
+        return self.client.post(f'/groups/{group_id}/words:import', data=body, content_type='application/x-ndjson')
+
+    def test_ndjson_import_in_batches(self):
+        words = [{'kanji': f'語{i}', 'romaji': f'go{i}', 'english': f'word {i}', 'parts': []} for i in range(2500)]
+        response = self.post_ndjson(1, words)
+        self.assertEqual(response.status_code, 201)
+        data = response.get_json()
+        self.assertEqual((data['received'], data['inserted'], data['linked']), (2500, 2500, 2500))
+        self.assertEqual(data['words_count'], 60 + 2500)
+        self.assertEqual(self.query('SELECT words_count FROM groups WHERE id = 1'), [(2560,)])
+
+    def test_concurrent_imports_do_not_duplicate_words(self):
+        words = [{'kanji': f'語{i}', 'romaji': f'go{i}', 'english': f'word {i}', 'parts': []} for i in range(3000)]
+        barrier = threading.Barrier(2)
+        statuses = []
+
+        def run(group_id):
+            barrier.wait()
+            statuses.append(self.post_ndjson(group_id, words).status_code)
+
+        threads = [threading.Thread(target=run, args=(group_id,)) for group_id in (1, 2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(statuses, [201, 201])
+        self.assertEqual(self.query("SELECT COUNT(*), COUNT(DISTINCT kanji || '/' || romaji) FROM words WHERE romaji LIKE 'go%'"), [(3000, 3000)])
+        self.assertEqual(self.query('SELECT words_count FROM groups ORDER BY id'), [(3060,), (3064,)])
+
+    def test_json_array_upserts_existing_words(self):
+        words = [
+            {'kanji': '払う', 'romaji': 'harau', 'english': 'to pay (for)', 'parts': []},  # In group 1
+            {'kanji': '猫', 'romaji': 'neko', 'english': 'cat'},
+            {'kanji': '猫', 'romaji': 'neko', 'english': 'cat (animal)'}  # Repeated: last one wins
+        ]
+        response = self.client.post('/groups/2/words:import', json=words)
+        self.assertEqual(response.status_code, 201)
+        data = response.get_json()
+        self.assertEqual((data['inserted'], data['updated'], data['linked']), (1, 1, 2))
+        self.assertEqual(data['words_count'], 64 + 2)
+
+        self.assertEqual(self.query("SELECT english FROM words WHERE romaji IN ('harau', 'neko') ORDER BY romaji"),
+                         [('to pay (for)',), ('cat (animal)',)])
+        harau = self.query("SELECT group_id FROM word_groups JOIN words ON id = word_id WHERE romaji = 'harau' ORDER BY group_id")
+        self.assertEqual(harau, [(1,), (2,)])
+
+        # Importing the same words again changes nothing
+        data = self.client.post('/groups/2/words:import', json=words[1:]).get_json()
+        self.assertEqual((data['inserted'], data['updated'], data['linked'], data['words_count']), (0, 0, 0, 66))
+
+    def test_invalid_bodies(self):
+        response = self.post_ndjson(1, [{'kanji': '猫', 'romaji': 'neko'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('english', response.get_json()['error'])
+
+        response = self.client.post('/groups/1/words:import', data='[{"kanji": "猫"', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM words WHERE romaji = 'neko'"), [(0,)])
+
+        self.assertEqual(self.post_ndjson(99, []).status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
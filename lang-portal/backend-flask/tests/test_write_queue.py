@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from lib.profiles import apply_profile
+from lib.write_queue import QueueFull, WriteBehindQueue, WriteTimeout
+from routes.study_sessions import load as load_study_sessions
+from tests.support import AppTestCase
+
+class TestWriteBehindQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tmp.name, 'queue.db')
+        conn = sqlite3.connect(self.database)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, value TEXT NOT NULL)')
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def count(self):
+        conn = sqlite3.connect(self.database)
+        try:
+            return conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+        finally:
+            conn.close()
+
+    def insert(self, value):
+        def write(cursor):
+            cursor.execute('INSERT INTO items (value) VALUES (?)', (value,))
+            return cursor.lastrowid
+        return write
+
+    def test_group_commit(self):
+        queue = WriteBehindQueue(self.database, max_delay_ms=50, max_batch=100)
+        try:
+            futures = [queue.submit(self.insert(str(i))) for i in range(50)]
+            ids = [future.result(timeout=5) for future in futures]
+            self.assertEqual(sorted(ids), list(range(1, 51)))
+            self.assertEqual(self.count(), 50)
+            stats = queue.stats()
+            self.assertEqual(stats['committed'], 50)
+            self.assertLess(stats['commits'], 50)
+            self.assertEqual(stats['depth'], 0)
+            self.assertGreater(stats['commit_seconds_max'], 0)
+        finally:
+            queue.close()
+
+    def test_failed_write_does_not_undo_its_batch(self):
+        queue = WriteBehindQueue(self.database, max_delay_ms=50)
+        try:
+            ok = queue.submit(self.insert('a'))
+            bad = queue.submit(self.insert(None))  # NOT NULL violation
+            also_ok = queue.submit(self.insert('b'))
+            self.assertEqual(ok.result(timeout=5), 1)
+            self.assertEqual(also_ok.result(timeout=5), 2)
+            with self.assertRaises(sqlite3.IntegrityError):
+                bad.result(timeout=5)
+            self.assertEqual(self.count(), 2)
+            self.assertEqual(queue.stats()['failed'], 1)
+        finally:
+            queue.close()
+
+    def test_backpressure(self):
+        queue = WriteBehindQueue(self.database, max_delay_ms=0, max_batch=1, max_pending=2)
+        started, release = threading.Event(), threading.Event()
+
+        def blocking(cursor):
+            started.set()
+            release.wait(5)
+
+        try:
+            queue.submit(blocking)
+            started.wait(5)  # The writer is now busy and the queue is empty
+            queue.submit(self.insert('a'))
+            queue.submit(self.insert('b'))
+            with self.assertRaises(QueueFull):
+                queue.submit(self.insert('c'))
+            self.assertEqual(queue.stats()['rejected'], 1)
+        finally:
+            release.set()
+            queue.close()
+        self.assertEqual(self.count(), 2)
+
+    def test_writer_commits_durably_under_any_profile(self):
+        queue = WriteBehindQueue(self.database, on_connect=lambda conn: apply_profile(conn, 'throughput'))
+        try:
+            synchronous = queue.run(lambda cursor: cursor.execute('PRAGMA synchronous').fetchone()[0])
+            self.assertEqual(synchronous, 2)  # FULL
+        finally:
+            queue.close()
+
+    def test_timed_out_writes_are_cancelled_or_reported_running(self):
+        queue = WriteBehindQueue(self.database, max_delay_ms=0, max_batch=1, ack_timeout=0.1)
+        started, release = threading.Event(), threading.Event()
+
+        def blocking(cursor):
+            started.set()
+            release.wait(5)
+            cursor.execute("INSERT INTO items (value) VALUES ('slow')")
+
+        try:
+            result = {}
+
+            def run_blocking():
+                try:
+                    queue.run(blocking)
+                except WriteTimeout as e:
+                    result['error'] = e
+
+            thread = threading.Thread(target=run_blocking)
+            thread.start()
+            started.wait(5)
+            # Still queued behind the blocked write: cancelled, never stored
+            with self.assertRaises(WriteTimeout) as queued:
+                queue.run(self.insert('queued'))
+            self.assertFalse(queued.exception.applied)
+            self.assertEqual(queued.exception.status, 503)
+            thread.join(5)
+            # Already running when its caller gave up: it may still commit
+            self.assertTrue(result['error'].applied)
+            self.assertEqual(result['error'].status, 504)
+        finally:
+            release.set()
+            queue.close()
+        conn = sqlite3.connect(self.database)
+        try:
+            self.assertEqual(conn.execute('SELECT value FROM items').fetchall(), [('slow',)])
+        finally:
+            conn.close()
+
+class TestWriteBehindRoutes(AppTestCase):
+    routes = (load_study_sessions,)
+
+    def setup_app(self, app):
+        app.write_queue = WriteBehindQueue(self.database, on_connect=app.db.configure)
+
+    def tearDown(self):
+        self.app.write_queue.close()
+        super().tearDown()
+
+    def test_writes_go_through_the_queue(self):
+        response = self.client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1})
+        self.assertEqual(response.status_code, 201)
+        session_id = response.get_json()['id']
+        response = self.client.post(f'/api/study-sessions/{session_id}/review', json={'word_id': 1, 'correct': True})
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(f'/api/study-sessions/{session_id}/reviews', json=[{'word_id': 2, 'correct': False}])
+        self.assertEqual(response.status_code, 201)
+
+        detail = self.client.get(f'/api/study-sessions/{session_id}').get_json()
+        self.assertEqual(detail['session']['review_items_count'], 2)
+        self.assertEqual(self.app.write_queue.stats()['committed'], 3)
+
+if __name__ == '__main__':
+    unittest.main()